@@ -1,10 +1,22 @@
 import streamlit as st
 import os
+import time
+import hashlib
 import pandas as pd
-import tempfile
 
-from src import cleaning, validation, anomalies, visualize, reporting, io_utils, predictive
-from src.main import load_config
+from src import cleaning, validation, anomalies, visualize, reporting, io_utils, predictive, writers, profiler
+from src.explorer import Explorer, ALL_ROWS, PAGE_SIZE
+from src.main import load_config, stage_keys
+from src.cache import StageCache, stage_key, file_digest
+from src.dates import DateExport
+from src.schema import Schema
+from src.jobs import JobExecutor, QueueFull, QUEUED, RUNNING, DONE, CANCELED
+
+APP_STAGES = ["load", "cleaning", "profile", "validation", "anomalies", "explorer", "visuals", "insights", "report",
+              "export"]
+STAGE_ICONS = {"pending": "▫️", "running": "⏳", "done": "✅", "cached": "♻️", "skipped": "➖",
+               "failed": "❌", "canceled": "✖️"}
+POLL_SECONDS = 1.0
 
 
 st.set_page_config(page_title="DataSage", layout="wide")
@@ -18,68 +30,271 @@ st.sidebar.header("⚙️ Settings")
 enable_insights = st.sidebar.checkbox("Enable Predictive Insights", value=True)
 report_type = st.sidebar.radio("Report Type", ["HTML", "PDF", "Both"], index=2)
 num_clusters = st.sidebar.slider("Number of Clusters (KMeans)", min_value=2, max_value=6, value=3)
+auto_clusters = st.sidebar.checkbox("Choose number of clusters automatically", value=False)
+output_format = st.sidebar.selectbox("Cleaned File Format", list(writers.WRITERS), index=0)
 
 
-uploaded_file = st.file_uploader("📂 Upload Excel file", type=["xlsx", "xls"])
+@st.cache_resource
+def get_stage_cache():
+    """One StageCache per server process, so its memory tier survives reruns."""
+    return StageCache.from_config(load_config("config/config.yaml"))
 
-if uploaded_file:
-    # Save uploaded file temporarily
-    tmp_dir = tempfile.mkdtemp()
-    file_path = os.path.join(tmp_dir, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    st.success(f"✅ Uploaded: {uploaded_file.name}")
 
-    # Load config
-    config = load_config("config/config.yaml")
+@st.cache_resource
+def get_job_executor():
+    """One bounded job executor per server process, shared by every session."""
+    return JobExecutor.from_config(load_config("config/config.yaml"))
 
-    # Load and process
-    df = io_utils.load_excel(file_path)
 
-    # Show raw data preview
-    st.subheader("🔎 Raw Data Preview")
-    st.dataframe(df.head())
+def export_files(write, paths: list) -> dict:
+    """Run `write` and return the files it produced as file name -> bytes (cacheable)."""
+    write()
+    files = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                files[os.path.basename(path)] = f.read()
+    return files
+
+
+def write_cached_files(files: dict, directory: str):
+    for name, data in files.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+
+
+def run_analysis(job, file_path: str, options: dict, config: dict) -> dict:
+    """
+    The whole pipeline for one upload, run as a background job (no Streamlit
+    calls in here). Every stage reports progress on `job`; a cancel request
+    stops the job before the next stage starts.
+    """
+    work_dir = job.work_dir
+    n_clusters = options["n_clusters"]
+
+    # Stage results are cached on the upload's content hash + each stage's settings,
+    # so a widget change only recomputes the stages downstream of it
+    stage_cache = get_stage_cache()
+    keys = stage_keys(file_digest(file_path), config, n_clusters=n_clusters)
+
+    def cached(stage, func, *args, **kwargs):
+        if stage_cache is None:
+            with job.stage(stage):
+                return func(*args, **kwargs)
+        with job.stage(stage, cached=keys[stage] in stage_cache):
+            return stage_cache.get_or_compute(keys[stage], func, *args, **kwargs)
+
+    # Load and process
+    schema = Schema.from_config(config)
+    with job.stage("load"):
+        df = io_utils.load_excel(file_path, schema=schema)
 
     # --- Cleaning ---
-    df_clean = cleaning.clean_data(df, config.get("cleaning", {}))
+    df_clean = cached("cleaning", cleaning.clean_data, df, config)
+
+    # Save cleaned file on a background thread while the analysis runs
+    # (the file bytes are cached alongside the cleaned frame)
+    cleaned_name = f"cleaned_{os.path.splitext(job.name)[0]}{writers.get_writer(options['output_format']).extension}"
+    cleaned_path = os.path.join(work_dir, cleaned_name)
+    keys["export"] = stage_key("export", keys["cleaning"], cleaned_name)
+    export_job = None
+    if stage_cache is not None and keys["export"] in stage_cache:
+        write_cached_files(stage_cache.get(keys["export"]), work_dir)
+    else:
+        export_job = writers.export_in_background(df_clean, work_dir, [options["output_format"]],
+                                                  basename=os.path.splitext(cleaned_name)[0],
+                                                  dates=DateExport.from_config(config), schema=schema)
+
+    # --- Column profile (one pass; read by anomalies, visuals, summary and report) ---
+    profile = cached("profile", profiler.profile_frame, df_clean)
 
     # --- Validation ---
-    issues = validation.validate_data(df_clean, config.get("validation", []))
+    issues = cached("validation", validation.validate_data, df_clean, validation.rules_from_config(config))
 
     # --- Anomalies ---
-    anomalies_found = anomalies.detect_anomalies(df_clean)
+    anomalies_found = cached("anomalies", anomalies.detect_anomalies, df_clean, config=config, profile=profile)
+
+    # --- Explorer (cleaned rows + flags in a memory-mapped file, paged on demand) ---
+    explorer_dir = None
+    if (config.get("explorer") or {}).get("enabled", True):
+        with job.stage("explorer"):
+            explorer_dir = os.path.join(work_dir, "explorer")
+            Explorer.build(df_clean, explorer_dir, issues, anomalies_found)
+    else:
+        job.skip("explorer")
 
     # --- Visualizations ---
-    tmp_fig_dir = os.path.join(tmp_dir, "figures")
-    figs = visualize.generate_visuals(df_clean, tmp_fig_dir)
+    figs = cached("visuals", visualize.generate_visuals, df_clean, os.path.join(work_dir, "figures"),
+                  workers=visualize.chart_workers(config), profile=profile)
 
     # --- Predictive Insights (optional) ---
     insights = {}
-    if enable_insights:
-        insights = predictive.run_predictive_models(df_clean)
-        # Inject custom cluster number if enough numeric cols
-        if "clustering" in insights:
-            insights["clustering"]["summary"] = f"Identified {num_clusters} clusters (custom) in the dataset"
-
-    # Save cleaned file
-    cleaned_path = os.path.join(tmp_dir, f"cleaned_{uploaded_file.name}")
-    df_clean.to_excel(cleaned_path, index=False)
+    if options["enable_insights"]:
+        insights = cached("insights", predictive.run_predictive_models, df_clean,
+                          n_clusters=n_clusters, config=config)
+    else:
+        job.skip("insights")
 
     # --- Summary ---
     summary = {
         "Original Rows": df.shape[0],
         "Original Columns": df.shape[1],
-        "Cleaned Rows": df_clean.shape[0],
-        "Columns After Cleaning": df_clean.shape[1],
+        "Cleaned Rows": profile.rows,
+        "Columns After Cleaning": len(profile.columns),
+        "Missing Cells After Cleaning": profile.null_cells,
         "Validation Issues Found": sum(len(v) for v in issues.values()),
         "Columns With Issues": len(issues),
-        "Anomalies Detected": len(anomalies_found),
-        "Output File": f"cleaned_{uploaded_file.name}",
+        "Anomalies Detected": sum(len(rows) for rows in anomalies_found.values()),
+        "Output File": cleaned_name,
+    }
+
+    # --- Reports (HTML now, PDF rendered in the background) ---
+    # Images are inlined here: the HTML is offered as a single-file download
+    report_config = {**config, "reporting": {**(config.get("reporting") or {}), "images": "inline", "pdf": False}}
+    report_path = os.path.join(work_dir, "report.html")
+    keys["report"] = stage_key("report", keys["validation"], keys["anomalies"], keys["visuals"],
+                               keys["insights"] if options["enable_insights"] else None, summary)
+    write_cached_files(cached(
+        "report", export_files,
+        lambda: reporting.generate_report(issues, anomalies_found, figs, summary, insights, report_path,
+                                          config=report_config, profile=profile),
+        [report_path]), work_dir)
+    pdf_job = None
+    if options["report_type"] in ["PDF", "Both"]:
+        pdf_job = reporting.get_report_service(config).submit_pdf(report_path, report_path.replace(".html", ".pdf"))
+
+    # --- Wait for the cleaned file ---
+    with job.stage("export", cached=export_job is None):
+        if export_job is not None:
+            export_job.result()
+            if stage_cache is not None:
+                stage_cache.put(keys["export"], export_files(lambda: None, [cleaned_path]))
+
+    return {"preview": df.head(), "summary": summary, "insights": insights, "figs": figs,
+            "cleaned_path": cleaned_path, "report_path": report_path, "pdf_job": pdf_job,
+            "explorer_dir": explorer_dir}
+
+
+def show_progress(job):
+    """Per-stage progress of a queued or running job, with a cancel button."""
+    if job.status == QUEUED:
+        st.info(f"⏳ Waiting for a free worker ({get_job_executor().running()} analyses running)…")
+    st.progress(job.progress, text=f"Running: {job.current_stage}" if job.current_stage else "Starting…")
+    st.caption("  ·  ".join(f"{STAGE_ICONS[state]} {stage}" for stage, state in job.stages.items()))
+    if st.button("✖ Cancel analysis"):
+        job.cancel()
+        st.rerun()
+
+
+@st.cache_resource(max_entries=16)
+def open_explorer(directory: str) -> Explorer:
+    return Explorer(directory)
+
+
+def parse_bound(text: str, kind: str):
+    """Range bound typed by the user: a number, or a date for date columns; blank = open."""
+    text = text.strip()
+    if not text:
+        return None
+    return pd.Timestamp(text) if kind == "date" else float(text)
+
+
+def show_explorer(explorer: Explorer, page_size: int):
+    """Flag, filter and sort on the server; only the visible page is sent to the browser."""
+    flag_labels = {ALL_ROWS: ALL_ROWS, **{f"{name} ({len(rows)})": name for name, rows in explorer.flags.items()}}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        flag = flag_labels[st.selectbox("Rows", list(flag_labels))]
+    with col2:
+        sort = st.selectbox("Sort by", ["(file order)"] + explorer.columns)
+        descending = st.checkbox("Descending")
+    with col3:
+        column = st.selectbox("Filter column", ["(none)"] + explorer.columns)
+
+    values, low, high = None, None, None
+    if column != "(none)":
+        kind = explorer.kinds[explorer.columns.index(column)]
+        if kind == "text":
+            labels, counts, _ = explorer.value_codes(column)
+            top = sorted(range(len(labels)), key=counts.__getitem__, reverse=True)[:1000]
+            values = st.multiselect(f"Values of {column}", [labels[i] for i in top])
+        else:
+            low_col, high_col = st.columns(2)
+            try:
+                low = parse_bound(low_col.text_input(f"{column} from"), kind)
+                high = parse_bound(high_col.text_input(f"{column} to"), kind)
+            except ValueError as e:
+                st.warning(f"⚠️ Invalid bound: {e}")
+
+    positions = explorer.select(flag, None if column == "(none)" else column, values, low, high,
+                                None if sort == "(file order)" else sort, descending)
+    pages = max(1, -(-len(positions) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) - 1
+    st.dataframe(explorer.page(positions, page, page_size))
+    start = page * page_size
+    st.caption(f"Rows {min(start + 1, len(positions))}–{min(start + page_size, len(positions))} "
+               f"of {len(positions)} ({explorer.rows} in the cleaned file)")
+
+
+def download(label: str, path: str, file_name: str):
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            st.download_button(label, data=f, file_name=file_name)
+
+
+uploaded_file = st.file_uploader("📂 Upload Excel file", type=["xlsx", "xls"])
+
+if uploaded_file:
+    config = load_config("config/config.yaml")
+    options = {
+        "enable_insights": enable_insights,
+        "report_type": report_type,
+        "n_clusters": "auto" if auto_clusters else num_clusters,
+        "output_format": output_format,
     }
 
-    # --- Reports (HTML + PDF) ---
-    report_path = os.path.join(tmp_dir, "report.html")
-    reporting.generate_report(issues, anomalies_found, figs, summary, insights, report_path)
+    # One job per (upload, settings) per session; a new upload or setting replaces it
+    executor = get_job_executor()
+    request = (hashlib.sha256(uploaded_file.getbuffer()).hexdigest(), tuple(sorted(options.items())))
+    job = executor.get(st.session_state.get("job_id"))
+    if job is None or st.session_state.get("job_request") != request:
+        if job is not None:
+            job.cancel()
+        try:
+            job = executor.create(uploaded_file.name, APP_STAGES)
+        except QueueFull as e:
+            st.warning(f"⏳ The server is busy: {e}")
+            st.stop()
+        file_path = os.path.join(job.work_dir, uploaded_file.name)
+        with open(file_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        executor.submit(job, run_analysis, file_path, options, config)
+        st.session_state.job_id, st.session_state.job_request = job.id, request
+    st.success(f"✅ Uploaded: {uploaded_file.name}")
+
+    if job.status in (QUEUED, RUNNING):
+        show_progress(job)
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+    if job.status == CANCELED:
+        st.warning("✖️ Analysis canceled.")
+        if st.button("🔄 Run again"):
+            st.session_state.pop("job_request", None)
+            st.rerun()
+        st.stop()
+    if job.status != DONE:
+        st.error(f"❌ Analysis failed: {job.error}")
+        st.stop()
+
+    result = job.result
+    summary, insights, figs = result["summary"], result["insights"], result["figs"]
+
+    # Show raw data preview
+    st.subheader("🔎 Raw Data Preview")
+    st.dataframe(result["preview"])
 
     # --- Processing Summary Section (NEW) ---
     st.subheader("📋 Processing Summary")
@@ -97,20 +312,30 @@ if uploaded_file:
 
     st.caption(f"Output File: {summary['Output File']}")
 
-    # --- Outputs Section ---
+    # --- Data Explorer ---
+    explorer_dir = result["explorer_dir"]
+    if explorer_dir is not None and os.path.exists(explorer_dir):
+        st.subheader("🧭 Data Explorer")
+        show_explorer(open_explorer(explorer_dir), (config.get("explorer") or {}).get("page_size", PAGE_SIZE))
+
+    # --- Outputs Section (served from the job's work folder until it expires) ---
     st.subheader("✅ Outputs")
-    with open(cleaned_path, "rb") as f:
-        st.download_button("⬇ Download Cleaned Excel", data=f, file_name=f"cleaned_{uploaded_file.name}")
+    if not os.path.exists(job.work_dir):
+        st.info("⌛ These files have expired; upload the file again to regenerate them.")
+    download("⬇ Download Cleaned File", result["cleaned_path"], summary["Output File"])
 
     if report_type in ["HTML", "Both"]:
-        with open(report_path, "rb") as f:
-            st.download_button("⬇ Download Report (HTML)", data=f, file_name="report.html")
-
-    if report_type in ["PDF", "Both"]:
-        pdf_path = report_path.replace(".html", ".pdf")
-        if os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as f:
-                st.download_button("⬇ Download Report (PDF)", data=f, file_name="report.pdf")
+        download("⬇ Download Report (HTML)", result["report_path"], "report.html")
+
+    pdf_job = result["pdf_job"]
+    if pdf_job is not None:
+        if not pdf_job.done():
+            st.info("⏳ The PDF report is still rendering in the background.")
+            st.button("🔄 Check PDF again")
+        elif pdf_job.exception() is None:
+            download("⬇ Download Report (PDF)", pdf_job.result(), "report.pdf")
+        else:
+            st.warning(f"⚠️ PDF conversion failed: {pdf_job.exception()}")
 
     # --- Predictive Insights Section ---
     if enable_insights:
@@ -0,0 +1,211 @@
+"""
+Offline benchmark harness for the pipeline stages.
+
+    python -m benchmarks.run --schemas subscriptions sales --rows 10k 100k 1M
+    python -m benchmarks.run --rows 10k --save-baseline     # record benchmarks/baseline.json
+
+Every stage is timed (best of --repeat runs, wall and CPU) and then run once
+more under tracemalloc for its peak Python/NumPy allocation. Results are
+written as JSON to benchmarks/results/ and compared against the baseline:
+a stage regresses when it is slower / larger than the baseline by more than
+--threshold (relative) and --min-delta-s / --min-delta-mb (absolute).
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from src import cleaning, validation, anomalies, visualize, predictive, io_utils, writers
+from src.dates import DateExport
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, ".data")          # generated workbooks, reused between runs
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+EXCEL_MAX_ROWS = 1_048_575                            # data rows that fit on one sheet
+
+STAGES = ["load", "clean", "validate", "anomalies", "visuals", "insights", "export"]
+EXCEL_STAGES = {"load", "export"}
+
+
+def parse_rows(text: str) -> int:
+    """'10k' -> 10_000, '2.5M' -> 2_500_000."""
+    match = re.fullmatch(r"([\d.]+)([kKmM]?)", text.replace("_", ""))
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid row count '{text}'")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def _workbook(df: pd.DataFrame, name: str) -> str:
+    """Write the synthetic frame as .xlsx once; later runs reuse the file."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"{name}.xlsx")
+    if not os.path.exists(path):
+        print(f"🧪 Writing benchmark workbook {path}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            io_utils.save_excel_chunks([df], path)
+    return path
+
+
+def _stage_calls(df: pd.DataFrame, config: dict, workbook: str, work_dir: str) -> dict:
+    """Stage name -> zero-argument callable. Stages after cleaning get the cleaned frame."""
+    clean = {}
+
+    def cleaned():
+        if "df" not in clean:
+            with contextlib.redirect_stdout(io.StringIO()):
+                clean["df"] = cleaning.clean_data(df, config)
+        return clean["df"]
+
+    return {
+        "load": lambda: io_utils.load_excel(workbook, cache=False),
+        "clean": lambda: cleaning.clean_data(df, config),
+        "validate": lambda: validation.validate_data(cleaned(), validation.rules_from_config(config)),
+        "anomalies": lambda: anomalies.detect_anomalies(cleaned(), config=config),
+        # one worker so tracemalloc sees the rendering too
+        "visuals": lambda: visualize.generate_visuals(cleaned(), os.path.join(work_dir, "figures"), workers=1),
+        "insights": lambda: predictive.run_predictive_models(cleaned(), config=config),
+        "export": lambda: writers.export(cleaned(), work_dir, ["xlsx"], dates=DateExport.from_config(config)),
+    }
+
+
+def measure_stage(func, repeat: int = 1, memory: bool = True) -> dict:
+    """Best-of-`repeat` wall/CPU seconds, plus the tracemalloc peak of one extra run."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        func()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    result = {"wall_s": round(min(walls), 4), "cpu_s": round(min(cpus), 4)}
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_case(schema: str, rows: int, stages: list, null_rate: float, duplicate_rate: float,
+             outlier_rate: float, repeat: int, memory: bool, verbose: bool) -> dict:
+    print(f"🏁 {schema} · {rows:,} rows")
+    df = synthetic.generate(schema, rows, null_rate, duplicate_rate, outlier_rate)
+    case = {"schema": schema, "rows": rows, "null_rate": null_rate, "duplicate_rate": duplicate_rate,
+            "outlier_rate": outlier_rate, "stages": {}}
+
+    excel_ok = rows <= EXCEL_MAX_ROWS
+    workbook = None
+    if excel_ok and "load" in stages:
+        workbook = _workbook(df, f"{schema}_{rows}_{null_rate}_{duplicate_rate}_{outlier_rate}")
+
+    with tempfile.TemporaryDirectory(prefix="datasage_bench_") as work_dir:
+        calls = _stage_calls(df, synthetic.CONFIGS[schema], workbook, work_dir)
+        for stage in stages:
+            if stage in EXCEL_STAGES and not excel_ok:
+                case["stages"][stage] = {"skipped": f"more than {EXCEL_MAX_ROWS:,} rows do not fit in a sheet"}
+                continue
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                case["stages"][stage] = measure_stage(calls[stage], repeat, memory)
+            timing = case["stages"][stage]
+            peak = f" · peak {timing['peak_mb']:.1f} MB" if "peak_mb" in timing else ""
+            print(f"   ⏱️ {stage:<10} wall {timing['wall_s']:.3f}s · CPU {timing['cpu_s']:.3f}s{peak}")
+    return case
+
+
+def _environment() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_s: float, min_delta_mb: float) -> list:
+    """Regressions of `results` against `baseline` as (schema, rows, stage, metric, base, new) tuples."""
+    base_cases = {(c["schema"], c["rows"]): c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        base = base_cases.get((case["schema"], case["rows"]))
+        if base is None:
+            continue
+        for stage, timing in case["stages"].items():
+            old = base["stages"].get(stage, {})
+            for metric, min_delta in (("wall_s", min_delta_s), ("peak_mb", min_delta_mb)):
+                if metric not in timing or metric not in old:
+                    continue
+                new_value, old_value = timing[metric], old[metric]
+                if new_value > old_value * (1 + threshold) and new_value - old_value > min_delta:
+                    regressions.append((case["schema"], case["rows"], stage, metric, old_value, new_value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DataSage pipeline benchmarks (synthetic data, offline)")
+    parser.add_argument("--schemas", nargs="+", default=list(synthetic.SCHEMAS), choices=list(synthetic.SCHEMAS))
+    parser.add_argument("--rows", nargs="+", type=parse_rows, default=[10_000, 100_000],
+                        help="Row counts, e.g. 10k 100k 1M 10M (load/export are skipped above one sheet)")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--null-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-rate", type=float, default=0.01)
+    parser.add_argument("--outlier-rate", type=float, default=0.001)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--output", default=None, help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown / growth")
+    parser.add_argument("--min-delta-s", type=float, default=0.05)
+    parser.add_argument("--min-delta-mb", type=float, default=5.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args(argv)
+
+    results = {"environment": _environment(), "cases": []}
+    for schema in args.schemas:
+        for rows in args.rows:
+            results["cases"].append(run_case(schema, rows, args.stages, args.null_rate, args.duplicate_rate,
+                                             args.outlier_rate, args.repeat, not args.no_memory, args.verbose))
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ No baseline to compare against (use --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_s, args.min_delta_mb)
+    for schema, rows, stage, metric, old, new in regressions:
+        print(f"❌ Regression: {schema} {rows:,} rows · {stage} {metric} {old} -> {new} (+{(new / old - 1):.0%})")
+    if not regressions:
+        print("✅ No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
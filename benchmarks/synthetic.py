@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+# Pools the generators draw categorical values from
+FIRST_NAMES = np.array(["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+                        "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica"],
+                       dtype=object)
+LAST_NAMES = np.array(["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+                       "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas"],
+                      dtype=object)
+PRODUCTS = np.array(["Laptop", "Monitor", "Keyboard", "Mouse", "Printer", "Tablet", "Headphones",
+                     "Webcam", "Router", "Speaker", "Charger", "Docking Station"], dtype=object)
+
+
+def _pick(rng, pool: np.ndarray, n: int) -> np.ndarray:
+    return pool[rng.integers(len(pool), size=n)]
+
+
+def _format_days(days: np.ndarray, start: str, fmt: str) -> np.ndarray:
+    """Day offsets from `start` -> date strings, formatted once per distinct day."""
+    uniques, codes = np.unique(days, return_inverse=True)
+    labels = (pd.Timestamp(start) + pd.to_timedelta(uniques, unit="D")).strftime(fmt)
+    return np.asarray(labels, dtype=object)[codes]
+
+
+def subscriptions(n: int, rng) -> pd.DataFrame:
+    """Shaped like sample_data/Subscription-Cohort-Analysis-Data.xlsx."""
+    created = rng.integers(0, 730, size=n)
+    canceled = _format_days(created + rng.integers(1, 365, size=n), "2022-09-01", "%Y-%m-%d")
+    canceled[rng.random(n) < 0.4] = None  # still active
+    return pd.DataFrame({
+        "customer_id": rng.integers(100_000_000, 200_000_000, size=n),
+        "created_date": _format_days(created, "2022-09-01", "%Y-%m-%d"),
+        "canceled_date": canceled,
+        "subscription_cost": rng.choice([29, 39, 49], size=n, p=[0.2, 0.7, 0.1]),
+        "subscription_interval": rng.choice(np.array(["month", "year"], dtype=object), size=n, p=[0.9, 0.1]),
+        "was_subscription_paid": rng.choice(np.array(["Yes", "No"], dtype=object), size=n, p=[0.8, 0.2]),
+    })
+
+
+def sales(n: int, rng) -> pd.DataFrame:
+    """Shaped like the Supermarket Sales sample and its config.yaml example."""
+    order_day = rng.integers(0, 1095, size=n)
+    price = np.round(rng.uniform(0.5, 200, size=n), 2)
+    quantity = rng.integers(1, 50, size=n)
+    tax = np.round(price * quantity * 0.1, 2)
+    return pd.DataFrame({
+        "Order No": np.arange(100_000, 100_000 + n),
+        "Order Date": _format_days(order_day, "2021-01-01", "%d-%m-%Y"),
+        "Customer Name": _pick(rng, FIRST_NAMES, n) + " " + _pick(rng, LAST_NAMES, n),
+        "Ship Date": _format_days(order_day + rng.integers(1, 10, size=n), "2021-01-01", "%d-%m-%Y"),
+        "Retail Price (USD)": price,
+        "Order Quantity": quantity,
+        "Tax (USD)": tax,
+        "Total (USD)": np.round(price * quantity + tax, 2),
+    })
+
+
+def inventory(n: int, rng) -> pd.DataFrame:
+    """Shaped like sample_data/Inventory-Records-Sample-Data.xlsx and the active config.yaml."""
+    opening = rng.integers(0, 500, size=n)
+    purchased = rng.integers(0, 300, size=n)
+    sold = np.minimum(rng.integers(0, 400, size=n), opening + purchased)
+    in_stock = opening + purchased - sold
+    unit_cost = np.round(rng.uniform(5, 2000, size=n), 2)
+    ids = np.char.add("P", np.char.zfill((np.arange(n) + 101).astype(str), 3)).astype(object)
+    return pd.DataFrame({
+        "Product ID": ids,
+        "Product Name": _pick(rng, PRODUCTS, n),
+        "Opening Stock": opening,
+        "Purchase/Stock in": purchased,
+        "Number of Units Sold": sold,
+        "Hand-In-Stock": in_stock,
+        "Cost Price Per Unit (USD)": unit_cost,
+        "Cost Price Total (USD)": np.round(in_stock * unit_cost, 2),
+    })
+
+
+SCHEMAS = {"subscriptions": subscriptions, "sales": sales, "inventory": inventory}
+
+
+def generate(schema: str, rows: int, null_rate: float = 0.02, duplicate_rate: float = 0.01,
+             outlier_rate: float = 0.001, seed: int = 42) -> pd.DataFrame:
+    """
+    Synthetic frame for `schema` with `rows` rows. `null_rate` of the cells are
+    blanked, `duplicate_rate` of the rows are copies of other rows and
+    `outlier_rate` of the numeric cells are scaled by 10-100x.
+    """
+    if schema not in SCHEMAS:
+        raise ValueError(f"Unknown schema '{schema}', expected one of {list(SCHEMAS)}")
+    rng = np.random.default_rng(seed)
+    df = SCHEMAS[schema](rows, rng)
+
+    for col in df.columns:
+        values = df[col]
+        if outlier_rate and values.dtype.kind in "iuf":
+            hit = rng.random(rows) < outlier_rate
+            if hit.any():
+                values = values.astype(float)
+                values[hit] *= rng.uniform(10, 100, size=hit.sum())
+        if null_rate:
+            hit = rng.random(rows) < null_rate
+            if hit.any():
+                values = values.astype(float) if values.dtype.kind in "iub" else values.copy()
+                values[hit] = np.nan if values.dtype.kind == "f" else None
+        df[col] = values
+
+    if duplicate_rate:
+        targets = np.flatnonzero(rng.random(rows) < duplicate_rate)
+        sources = rng.integers(rows, size=len(targets))
+        for col in df.columns:
+            values = df[col].to_numpy(copy=True)
+            values[targets] = values[sources]
+            df[col] = values
+    return df
+
+
+# Pipeline config for each schema, mirroring the examples in config/config.yaml
+# (no canonical mapping cache, so repeats time cold lookups and nothing is written to the CWD)
+_CLEANING = {"drop_duplicates": True, "dropna_threshold": 0.5, "canonicalization": {"cache_dir": None}}
+
+CONFIGS = {
+    "subscriptions": {
+        **_CLEANING,
+        "fillna": {"canceled_date": "Not Canceled", "subscription_interval": "Unknown",
+                   "was_subscription_paid": "Unknown"},
+        "date_columns": [{"name": "created_date", "format": "%Y-%m-%d"},
+                         {"name": "canceled_date", "format": "%Y-%m-%d"}],
+        "validation_rules": [
+            {"column": "customer_id", "unique": True},
+            {"column": "subscription_cost", "min": 0, "max": 1000},
+            {"column": "subscription_interval", "allowed_values": ["month", "year", "Unknown"]},
+            {"column": "was_subscription_paid", "allowed_values": ["Yes", "No", "Unknown"]},
+        ],
+    },
+    "sales": {
+        **_CLEANING,
+        "date_columns": [{"name": "Order Date", "format": "%d-%m-%Y"},
+                         {"name": "Ship Date", "format": "%d-%m-%Y"}],
+        "columns": {
+            "Order No": {"unique": True, "required": True},
+            "Order Date": {"required": True, "checks": ["not_null"]},
+            "Customer Name": {"required": True, "checks": ["not_null", {"regex": "^[A-Za-z ]+$"}]},
+            "Retail Price (USD)": {"required": True, "checks": [{"min": 0.01}, "not_null"]},
+            "Order Quantity": {"required": True, "checks": [{"min": 1}, {"max": 1000}]},
+            "Tax (USD)": {"required": True, "checks": [{"min": 0.0}]},
+        },
+        "anomalies": {"numeric_columns": ["Retail Price (USD)", "Order Quantity", "Tax (USD)", "Total (USD)"],
+                      "method": "zscore", "threshold": 3.0},
+    },
+    "inventory": {
+        **_CLEANING,
+        "columns": {
+            "Product ID": {"required": True, "checks": ["not_null", {"regex": "^P[0-9]{3}$"}]},
+            "Product Name": {"required": True, "checks": ["not_null"]},
+            "Opening Stock": {"required": True, "checks": [{"min": 0}, {"max": 1000}]},
+            "Purchase/Stock in": {"required": True, "checks": [{"min": 0}, {"max": 1000}]},
+            "Number of Units Sold": {"required": True, "checks": [{"min": 0}, {"max": 1000}]},
+            "Hand-In-Stock": {"required": True, "checks": [{"min": 0}]},
+            "Cost Price Per Unit (USD)": {"required": True, "checks": [{"min": 1}, {"max": 10000}]},
+        },
+        "anomalies": {"numeric_columns": ["Opening Stock", "Purchase/Stock in", "Number of Units Sold",
+                                          "Hand-In-Stock", "Cost Price Per Unit (USD)",
+                                          "Cost Price Total (USD)"],
+                      "method": "zscore", "threshold": 3.0},
+    },
+}
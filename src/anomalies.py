@@ -1,28 +1,204 @@
+import copy
 import pandas as pd
 import numpy as np
-from scipy import stats
+from src.sketches import QuantileSketch, Moments
+from src.instrument import instrumented
 
 
-def detect_anomalies(df: pd.DataFrame, z_thresh: float = 3.0) -> dict:
+class ZScoreDetector(Moments):
     """
-    Detect anomalies in numeric columns using Z-score method.
-    Returns a dictionary with column name -> list of anomalies.
+    Z-score detector on Welford's online mean/variance (`sketches.Moments`).
+    Chunks are folded in with Chan et al.'s parallel update, so detectors
+    fitted on different partitions can be merged exactly.
     """
-    print("📊 Starting anomaly detection...")
-    anomalies = {}
-
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    for col in numeric_cols:
-        try:
-            z_scores = np.abs(stats.zscore(df[col].dropna()))
-            outliers = df[col][(z_scores > z_thresh)]
-            if not outliers.empty:
-                anomalies[col] = outliers.tolist()
-                print(f"⚠️ Found {len(outliers)} anomalies in '{col}'")
-        except Exception as e:
-            print(f"⚠️ Could not compute anomalies for '{col}': {e}")
 
+    name = "zscore"
+    default_threshold = 3.0
+
+    def __init__(self, threshold: float = None):
+        super().__init__()
+        self.threshold = self.default_threshold if threshold is None else threshold
+
+    def flag(self, values: np.ndarray) -> np.ndarray:
+        if not self.std:
+            return np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            return np.abs(values - self.mean) / self.std > self.threshold
+
+
+class MADDetector:
+    """
+    Robust z-score on median and median absolute deviation, both read from a
+    mergeable quantile sketch: 0.6745 * |x - median| / MAD > threshold.
+    """
+
+    name = "mad"
+    default_threshold = 3.5
+
+    def __init__(self, threshold: float = None):
+        self.threshold = self.default_threshold if threshold is None else threshold
+        self.sketch = QuantileSketch()
+
+    def update(self, values: np.ndarray):
+        self.sketch.update(values)
+
+    def merge(self, other: "MADDetector"):
+        self.sketch.merge(other.sketch)
+
+    def _median_mad(self):
+        median = self.sketch.quantile(0.5)
+        return median, self.sketch.deviation_quantile(median, 0.5)
+
+    def flag(self, values: np.ndarray) -> np.ndarray:
+        median, mad = self._median_mad()
+        if not mad:
+            return np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            return 0.6745 * np.abs(values - median) / mad > self.threshold
+
+
+class IQRDetector:
+    """Tukey fences from a mergeable quantile sketch: outside [Q1 - t*IQR, Q3 + t*IQR]."""
+
+    name = "iqr"
+    default_threshold = 1.5
+
+    def __init__(self, threshold: float = None):
+        self.threshold = self.default_threshold if threshold is None else threshold
+        self.sketch = QuantileSketch()
+
+    def update(self, values: np.ndarray):
+        self.sketch.update(values)
+
+    def merge(self, other: "IQRDetector"):
+        self.sketch.merge(other.sketch)
+
+    def flag(self, values: np.ndarray) -> np.ndarray:
+        if not self.sketch.n:
+            return np.zeros(len(values), dtype=bool)
+        q1, q3 = self.sketch.quantiles([0.25, 0.75])
+        iqr = q3 - q1
+        with np.errstate(invalid="ignore"):
+            return (values < q1 - self.threshold * iqr) | (values > q3 + self.threshold * iqr)
+
+
+DETECTORS = {cls.name: cls for cls in (ZScoreDetector, MADDetector, IQRDetector)}
+
+
+def _anomaly_settings(config: dict, z_thresh: float):
+    """(method, threshold, numeric_columns) from the `anomalies:` config section."""
+    cfg = (config or {}).get("anomalies", {}) or {}
+    method = cfg.get("method", "zscore")
+    if method not in DETECTORS:
+        raise ValueError(f"Unknown anomaly method '{method}', expected one of {list(DETECTORS)}")
+    threshold = cfg.get("threshold", z_thresh if method == "zscore" else None)
+    return method, threshold, cfg.get("numeric_columns")
+
+
+def _numeric_columns(df: pd.DataFrame, wanted) -> list:
+    numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+    if wanted:
+        return [c for c in wanted if c in numeric_cols]
+    return numeric_cols
+
+
+def _values(series: pd.Series) -> np.ndarray:
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+def fit_detectors(chunks, method: str = "zscore", threshold: float = None, columns=None) -> dict:
+    """Fit one detector per numeric column over an iterable of chunks (one pass)."""
+    detectors = {}
+    for chunk in chunks:
+        for col in _numeric_columns(chunk, columns):
+            if col not in detectors:
+                detectors[col] = DETECTORS[method](threshold)
+            detectors[col].update(_values(chunk[col]))
+    return detectors
+
+
+def detectors_from_profile(profile, method: str = "zscore", threshold: float = None, columns=None) -> dict:
+    """Detectors built from a `profiler.DataProfile`'s moments / quantile sketches, without a fitting pass."""
+    numeric = profile.numeric_columns
+    detectors = {}
+    for col in ([c for c in columns if c in numeric] if columns else numeric):
+        detector = DETECTORS[method](threshold)
+        if isinstance(detector, ZScoreDetector):
+            detector.merge(profile[col].moments)
+        else:
+            detector.sketch = copy.deepcopy(profile[col].sketch)
+        detectors[col] = detector
+    return detectors
+
+
+def merge_detectors(parts: list) -> dict:
+    """Merge per-partition `fit_detectors` results into one detector per column."""
+    merged = {}
+    for detectors in parts:
+        for col, detector in detectors.items():
+            if col in merged:
+                merged[col].merge(detector)
+            else:
+                merged[col] = detector
+    return merged
+
+
+def flag_rows(df: pd.DataFrame, detectors: dict) -> dict:
+    """Column -> NumPy array of row labels flagged by that column's detector."""
+    flagged = {}
+    for col, detector in detectors.items():
+        if col in df.columns:
+            rows = df.index.to_numpy()[detector.flag(_values(df[col]))]
+            if len(rows):
+                flagged[col] = rows
+    return flagged
+
+
+def _log_anomalies(anomalies: dict):
+    for col, rows in anomalies.items():
+        print(f"⚠️ Found {len(rows)} anomalies in '{col}'")
     if not anomalies:
         print("✅ No anomalies detected")
 
+
+def _fit(chunks, method: str, threshold: float, columns, profile) -> dict:
+    if profile is not None:
+        return detectors_from_profile(profile, method, threshold, columns)
+    return fit_detectors(chunks, method, threshold, columns)
+
+
+@instrumented("anomalies")
+def detect_anomalies(df: pd.DataFrame, z_thresh: float = 3.0, config: dict = None, profile=None) -> dict:
+    """
+    Detect anomalies in numeric columns with the detector chosen by the
+    `anomalies:` config section (method: zscore | mad | iqr, threshold,
+    numeric_columns). Returns a dictionary with column name -> NumPy array
+    of the anomalous rows' index labels. With a `profiler.DataProfile` of
+    `df`, the detectors come from its statistics instead of a fitting pass.
+    """
+    print("📊 Starting anomaly detection...")
+    method, threshold, columns = _anomaly_settings(config, z_thresh)
+    anomalies = flag_rows(df, _fit([df], method, threshold, columns, profile))
+    _log_anomalies(anomalies)
+    return anomalies
+
+
+@instrumented("anomalies")
+def detect_anomalies_chunks(chunks, z_thresh: float = 3.0, config: dict = None, profile=None) -> dict:
+    """
+    Anomaly detection over a re-iterable sequence of chunks (e.g. an
+    `io_utils.ChunkSpool`): pass 1 fits the detectors, pass 2 flags rows.
+    Same result as `detect_anomalies` (up to sketch accuracy for mad/iqr).
+    With a `profiler.DataProfile` of the chunks, pass 1 is skipped.
+    """
+    print("📊 Starting chunked anomaly detection...")
+    method, threshold, columns = _anomaly_settings(config, z_thresh)
+    detectors = _fit(chunks, method, threshold, columns, profile)
+
+    parts = {}
+    for chunk in chunks:
+        for col, rows in flag_rows(chunk, detectors).items():
+            parts.setdefault(col, []).append(rows)
+    anomalies = {col: np.concatenate(rows) for col, rows in parts.items()}
+    _log_anomalies(anomalies)
     return anomalies
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(".datasage_cache", "workbooks")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+DEFAULT_STAGE_DIR = os.path.join(".datasage_cache", "stages")
+DEFAULT_STAGE_MAX_BYTES = 1024 ** 3  # 1 GB
+DEFAULT_MEMORY_ITEMS = 32
+
+_digest_memo = {}
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content (memoized on path, size and mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _digest_memo:
+        return _digest_memo[memo_key]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    _digest_memo[memo_key] = h.hexdigest()
+    return _digest_memo[memo_key]
+
+
+class WorkbookCache:
+    """
+    Content-addressed cache of parsed workbooks.
+
+    Entries are keyed on the file's SHA-256 plus the read options (sheet, dtype)
+    and stored as uncompressed Feather files, which are memory-mapped on load.
+    Frames Arrow cannot store (e.g. mixed-type object columns) fall back to pickle.
+    Least recently used entries are evicted once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build the cache from the `cache:` config section; returns None if disabled."""
+        cfg = (config or {}).get("cache", {}) or {}
+        if not cfg.get("enabled", True):
+            return None
+        max_bytes = int(cfg.get("max_mb", DEFAULT_MAX_BYTES / 1024 ** 2) * 1024 ** 2)
+        return cls(cfg.get("dir", DEFAULT_CACHE_DIR), max_bytes)
+
+    def key(self, path: str, sheet_name=0, dtype=None) -> str:
+        options = json.dumps({"sheet": sheet_name, "dtype": dtype}, sort_keys=True, default=str)
+        return hashlib.sha256(f"{file_digest(path)}|{options}".encode()).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".feather", base + ".pkl"
+
+    def get(self, key: str):
+        """Return the cached DataFrame for `key`, or None on a miss."""
+        feather_path, pickle_path = self._paths(key)
+        try:
+            if os.path.exists(feather_path):
+                import pyarrow.feather as feather
+                table = feather.read_table(feather_path, memory_map=True)
+                df = table.to_pandas()
+                path = feather_path
+            elif os.path.exists(pickle_path):
+                df = pd.read_pickle(pickle_path)
+                path = pickle_path
+            else:
+                return None
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable cache entry {key[:12]}: {e}")
+            return None
+        os.utime(path)  # mark as recently used
+        return df
+
+    def get_table(self, key: str):
+        """Return the memory-mapped Arrow table for `key` (Feather entries only), or None."""
+        feather_path, _ = self._paths(key)
+        if not os.path.exists(feather_path):
+            return None
+        import pyarrow.feather as feather
+        os.utime(feather_path)
+        return feather.read_table(feather_path, memory_map=True)
+
+    def put(self, key: str, df: pd.DataFrame):
+        feather_path, pickle_path = self._paths(key)
+        arrow_friendly = (
+            df.index.equals(pd.RangeIndex(len(df)))
+            and all(isinstance(c, str) for c in df.columns)
+            and df.columns.is_unique
+        )
+        try:
+            if not arrow_friendly:
+                raise ValueError("index or column labels need pickle")
+            df.to_feather(feather_path + ".tmp", compression="uncompressed")
+            os.replace(feather_path + ".tmp", feather_path)
+        except Exception:
+            # Arrow can't represent this frame as-is; keep the exact frame instead
+            if os.path.exists(feather_path + ".tmp"):
+                os.remove(feather_path + ".tmp")
+            df.to_pickle(pickle_path + ".tmp")
+            os.replace(pickle_path + ".tmp", pickle_path)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith((".feather", ".pkl")):
+                path = os.path.join(self.directory, name)
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+
+def stage_key(stage: str, *parts) -> str:
+    """
+    Cache key for a stage result: the stage name plus everything it depends on
+    (an upstream key or file digest, the config slice it reads, its parameters).
+    Parts are JSON-encoded with sorted keys, so equal settings give equal keys.
+    """
+    payload = json.dumps([stage, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StageCache:
+    """
+    Two-tier cache of pipeline stage results.
+
+    A bounded in-process LRU (`memory_items` entries) sits in front of pickle
+    files under `directory`, which are evicted least recently used first once
+    they exceed `max_bytes`. Keys come from `stage_key`; chaining each stage's
+    key from its upstream stage's key means a changed setting only misses for
+    the stages downstream of it.
+    """
+
+    def __init__(self, directory: str = DEFAULT_STAGE_DIR, max_bytes: int = DEFAULT_STAGE_MAX_BYTES,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()   # shared by the app's background jobs
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build the cache from the `cache:` config section (`stages_dir`, `stages_max_mb`,
+        `memory_items`); returns None if caching is disabled."""
+        cfg = (config or {}).get("cache", {}) or {}
+        if not cfg.get("enabled", True):
+            return None
+        max_bytes = int(cfg.get("stages_max_mb", DEFAULT_STAGE_MAX_BYTES / 1024 ** 2) * 1024 ** 2)
+        return cls(cfg.get("stages_dir", DEFAULT_STAGE_DIR), max_bytes,
+                   cfg.get("memory_items", DEFAULT_MEMORY_ITEMS))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pkl")
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str, default=None):
+        """Return the cached result for `key` (memory first, then disk), or `default`."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not self.directory or not os.path.exists(self._path(key)):
+            return default
+        try:
+            with open(self._path(key), "rb") as f:
+                value = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable stage cache entry {key[:12]}: {e}")
+            return default
+        os.utime(self._path(key))  # mark as recently used
+        self._remember(key, value)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or bool(self.directory) and os.path.exists(self._path(key))
+
+    def put(self, key: str, value):
+        self._remember(key, value)
+        if not self.directory:
+            return
+        tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            # Unpicklable results stay in the memory tier only
+            print(f"⚠️ Stage result {key[:12]} kept in memory only: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def get_or_compute(self, key: str, func, *args, **kwargs):
+        """Return the cached result for `key`, computing and storing func(*args, **kwargs) on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = func(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        """Drop least recently used files until the disk tier fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:  # evicted by another job meanwhile
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
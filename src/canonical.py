@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from collections import Counter
+
+DEFAULT_THRESHOLD = 0.8    # min Dice similarity of character trigrams for a fuzzy match
+NGRAM = 3
+# Common spellings of yes/no, used for columns whose canonical values include them
+DEFAULT_SYNONYMS = {"yes": ["y", "true", "t", "1"], "no": ["n", "false", "f", "0"]}
+_VERSION = 1               # bump when `normalize` or matching changes (invalidates cached mappings)
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"[\s_]+")
+
+
+def normalize(value) -> str:
+    """Case-, accent-, punctuation- and whitespace-insensitive form: ' Yes!' -> 'yes'."""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _ngrams(text: str) -> Counter:
+    padded = f"#{text}#"
+    return Counter(padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 1)))
+
+
+class Vocabulary:
+    """
+    The canonical values of one column and how raw values reach them: exact
+    match after `normalize`, configured synonyms (and yes/no defaults), then
+    the most similar canonical spelling or synonym by character-trigram Dice
+    similarity, if at least `threshold`. The trigrams of the vocabulary are
+    kept in an inverted index, so a lookup only scores entries that share a
+    trigram with the raw value.
+    """
+
+    def __init__(self, values: list, synonyms: dict = None, threshold: float = DEFAULT_THRESHOLD):
+        self.values = list(values)
+        self.threshold = threshold
+        self.synonyms = {str(k): [str(s) for s in (v if isinstance(v, (list, tuple)) else [v])]
+                         for k, v in (synonyms or {}).items()}
+        by_normal = {normalize(v): v for v in self.values}
+        self.exact = dict(by_normal)
+        for target, variants in DEFAULT_SYNONYMS.items():
+            if target in by_normal:
+                for variant in variants:
+                    self.exact.setdefault(variant, by_normal[target])
+        for target, variants in self.synonyms.items():
+            canonical = by_normal.get(normalize(target))
+            if canonical is None:
+                print(f"⚠️ Synonyms given for '{target}', which is not a canonical value {self.values}")
+                continue
+            for variant in variants:
+                self.exact[normalize(variant)] = canonical
+
+        self.entries = [(text, canonical, _ngrams(text)) for text, canonical in self.exact.items()]
+        self.index = {}
+        for i, (_, _, grams) in enumerate(self.entries):
+            for gram in grams:
+                self.index.setdefault(gram, []).append(i)
+
+    def key(self) -> str:
+        """Digest of everything that decides a mapping (names the cached mapping file)."""
+        spec = json.dumps([_VERSION, self.values, self.synonyms, self.threshold], default=str, sort_keys=True)
+        return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:16]
+
+    def match(self, value):
+        """Canonical value for one raw value, or None."""
+        text = normalize(value)
+        if text in self.exact:
+            return self.exact[text]
+        grams = _ngrams(text)
+        shared = Counter()
+        for gram, count in grams.items():
+            for i in self.index.get(gram, ()):
+                shared[i] += min(count, self.entries[i][2][gram])
+        if not shared:
+            return None
+        size = sum(grams.values())
+        score, i = max((2 * n / (size + sum(self.entries[i][2].values())), i) for i, n in shared.items())
+        return self.entries[i][1] if score >= self.threshold else None
+
+
+class Canonicalizer:
+    """
+    Maps text columns to canonical values, once per distinct raw value. The
+    columns come from `allowed_values` rules (validation_rules / columns:)
+    and `canonicalization.columns` (which may also give `values`, `synonyms`
+    and a `threshold`). Raw value -> canonical mappings are remembered for
+    the run and, only when `canonicalization.cache_dir` is set, kept on disk
+    per vocabulary, so later runs only look up values they have not seen.
+    """
+
+    def __init__(self, vocabularies: dict, cache_dir: str = None):
+        self.vocabularies = vocabularies
+        self.cache_dir = cache_dir
+        self._mappings = {}
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Canonicalizer for the configured columns; None when disabled or nothing to do."""
+        config = config or {}
+        cfg = config.get("canonicalization") or {}
+        if not cfg.get("enabled", True):
+            return None
+        allowed = {}
+        for rule in list(config.get("validation") or []) + list(config.get("validation_rules") or []):
+            if isinstance(rule, dict) and rule.get("column") is not None and rule.get("allowed_values"):
+                allowed[rule["column"]] = rule["allowed_values"]
+        for col, spec in (config.get("columns") or {}).items():
+            if isinstance(spec, dict) and spec.get("allowed_values"):
+                allowed[col] = spec["allowed_values"]
+        threshold = cfg.get("threshold", DEFAULT_THRESHOLD)
+        vocabularies = {}
+        for col in list(allowed) + [c for c in (cfg.get("columns") or {}) if c not in allowed]:
+            spec = (cfg.get("columns") or {}).get(col) or {}
+            values = spec.get("values") or allowed.get(col)
+            if not values:
+                print(f"⚠️ No canonical values for '{col}' (set canonicalization.columns.{col}.values)")
+                continue
+            vocabularies[col] = Vocabulary(values, spec.get("synonyms"), spec.get("threshold", threshold))
+        if not vocabularies:
+            return None
+        return cls(vocabularies, cfg.get("cache_dir"))
+
+    def __contains__(self, col) -> bool:
+        return col in self.vocabularies
+
+    def _path(self, vocabulary: Vocabulary) -> str:
+        return os.path.join(self.cache_dir, vocabulary.key() + ".json")
+
+    def _mapping(self, col) -> dict:
+        vocabulary = self.vocabularies[col]
+        key = vocabulary.key()
+        if key not in self._mappings:
+            mapping = {}
+            if self.cache_dir and os.path.exists(self._path(vocabulary)):
+                try:
+                    with open(self._path(vocabulary), encoding="utf-8") as f:
+                        mapping = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Ignoring unreadable canonical mapping for '{col}': {e}")
+            self._mappings[key] = mapping
+        return self._mappings[key]
+
+    def map_values(self, col, uniques) -> list:
+        """Canonical value (or None when nothing matches) for each distinct raw value of `col`."""
+        vocabulary = self.vocabularies[col]
+        mapping = self._mapping(col)
+        keys = [None if v is None or v != v else str(v) for v in uniques]   # v != v: NaN
+        new = {k for k in keys if k is not None and k not in mapping}
+        for key in new:
+            mapping[key] = vocabulary.match(key)
+        if new and self.cache_dir:
+            self._save(vocabulary, mapping)
+        return [None if k is None else mapping[k] for k in keys]
+
+    def categories(self, col) -> list:
+        return list(self.vocabularies[col].values)
+
+    def _save(self, vocabulary: Vocabulary, mapping: dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(vocabulary)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(mapping, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not save canonical mapping {path}: {e}")
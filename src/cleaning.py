@@ -1,80 +1,303 @@
 import pandas as pd
 import numpy as np
+from src import io_utils, fingerprint, dates, canonical
+from src.sketches import RowSample
+from src.instrument import instrumented
 
-def load_data(filepath):
-    """Load Excel file into a pandas DataFrame."""
+def load_data(filepath, chunksize=None):
+    """Load Excel file into a pandas DataFrame (or an iterator of chunks if `chunksize` is set)."""
+    if chunksize:
+        return io_utils.load_excel(filepath, chunksize=chunksize)
     print(f"📥 Loading file: {filepath}")
     df = pd.read_excel(filepath)
     print(f"✅ Loaded {len(df)} rows and {len(df.columns)} columns")
     return df
 
+
+def _is_numeric(series: pd.Series) -> bool:
+    return series.dtype.kind in "iuf"
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype))
+
+
+_TEXT_TRANSFORMS = {"lower": str.lower, "upper": str.upper, "title": str.title}
+
+
+class CleaningPlan:
+    """
+    Cleaning config compiled once into a plan that runs in a single pass per column.
+
+    Row filters (duplicates, sparse rows) are combined into one keep-mask and
+    applied once per column. Each column is then filled and standardized in
+    one go; text and date transforms run on the column's distinct values only
+    (factorize -> transform uniques -> take). Date columns become datetime64
+    (see `dates.parse_dates`) and are only formatted as text on export.
+    Columns with canonical values (`allowed_values`, `canonicalization:`) are
+    mapped to them value by value (see `canonical.Canonicalizer`) and kept
+    as categoricals. `report` records how many rows and cells every step touched.
+    """
+
+    STEPS = ["drop_duplicates", "drop_sparse_rows", "fill_missing", "canonicalize", "standardize_text",
+             "standardize_dates"]
+    # Top-level config keys the plan reads (the slice a cleaning cache key depends on)
+    CONFIG_KEYS = ("drop_duplicates", "dropna_threshold", "fill_missing", "fillna",
+                   "text_standardization", "date_format", "date_columns", "columns", "schema",
+                   "canonicalization", "validation", "validation_rules")
+
+    def __init__(self, config: dict):
+        config = config or {}
+        fill_cfg = config.get("fill_missing", {}) or {}
+        # drop_duplicates: true (whole row) | [key columns] | {based_on: [...], normalize: true}
+        dedupe = config.get("drop_duplicates", True)
+        if isinstance(dedupe, dict):
+            self.duplicate_keys = dedupe.get("based_on")
+            self.normalize_keys = dedupe.get("normalize", False)
+        else:
+            self.duplicate_keys = list(dedupe) if isinstance(dedupe, (list, tuple)) else None
+            self.normalize_keys = False
+        self.drop_duplicates = bool(dedupe)
+        # `dropna_threshold` = max share of missing cells per row; otherwise
+        # `fill_missing.threshold` = min share of non-missing cells per row
+        self.max_missing_ratio = config.get("dropna_threshold")
+        self.min_present_ratio = fill_cfg.get("threshold", 0.3)
+        self.strategy = fill_cfg.get("strategy", "median")
+        self.fill_overrides = config.get("fillna", {}) or {}
+        self.text_fn = _TEXT_TRANSFORMS.get(config.get("text_standardization", "title"))
+        self.canonical = canonical.Canonicalizer.from_config(config)
+
+        # Default date format (global fallback) + column-specific input formats if defined
+        self.date_format = config.get("date_format", dates.DEFAULT_FORMAT)
+        self.date_formats = dates.column_formats(config)
+        self.report = {step: {"rows": 0, "cells": 0} for step in self.STEPS}
+
+    def is_date_column(self, col) -> bool:
+        return col in self.date_formats or "date" in str(col).lower()
+
+    def row_threshold(self, n_cols: int) -> int:
+        """Minimum number of non-missing cells a row needs to be kept."""
+        if self.max_missing_ratio is not None:
+            return n_cols - int(self.max_missing_ratio * n_cols)
+        return int(self.min_present_ratio * n_cols)
+
+    def row_mask(self, df: pd.DataFrame, duplicated: np.ndarray = None) -> np.ndarray:
+        """Boolean keep-mask for duplicate and sparse rows, without building any subset."""
+        keep = np.ones(len(df), dtype=bool)
+        if self.drop_duplicates:
+            if duplicated is None:
+                duplicated = fingerprint.duplicated(df, self.duplicate_keys, self.normalize_keys)
+            keep &= ~duplicated
+            self._count("drop_duplicates", int(duplicated.sum()), int(duplicated.sum()) * df.shape[1])
+
+        sparse = df.notna().sum(axis=1).to_numpy() < self.row_threshold(df.shape[1])
+        sparse &= keep
+        keep &= ~sparse
+        self._count("drop_sparse_rows", int(sparse.sum()), int(sparse.sum()) * df.shape[1])
+        return keep
+
+    def fill_value(self, col, values: pd.Series):
+        if col in self.fill_overrides:
+            return self.fill_overrides[col]
+        if _is_numeric(values):
+            return values.mean() if self.strategy == "mean" else values.median()
+        return "Unknown"
+
+    def apply(self, df: pd.DataFrame, keep: np.ndarray = None, fill_values: dict = None,
+              verbose: bool = True) -> pd.DataFrame:
+        """Clean `df` (restricted to `keep` rows) column by column into a new frame."""
+        fill_values = fill_values or {}
+        index = df.index if keep is None else df.index[keep]
+        touched = {step: np.zeros(len(index), dtype=bool) for step in self.STEPS[2:]}
+        columns = []
+        for i, col in enumerate(df.columns):
+            series = df.iloc[:, i]
+            owned = keep is not None
+            if owned:
+                series = series[keep]  # the one copy of this column
+            columns.append(self._clean_column(col, series, owned, fill_values, touched, verbose))
+
+        out = pd.concat(columns, axis=1, copy=False) if columns else pd.DataFrame(index=index)
+        out.columns = df.columns
+        for step, rows in touched.items():
+            self._count(step, int(rows.sum()), 0)
+        return out
+
+    def _clean_column(self, col, series: pd.Series, owned: bool, fill_values: dict, touched: dict, verbose: bool):
+        if self.is_date_column(col):
+            return self._clean_date_column(col, series, touched, verbose)
+        na = series.isna().to_numpy()
+        n_missing = int(na.sum())
+
+        # Numeric columns: fill in place when this column is already our own copy
+        if _is_numeric(series):
+            if n_missing:
+                value = fill_values.get(col)
+                if value is None:
+                    value = self.fill_value(col, series)
+                values = series.to_numpy(copy=not owned)
+                values[na] = value
+                series = pd.Series(values, index=series.index, name=col)
+                self._count("fill_missing", 0, n_missing)
+                touched["fill_missing"] |= na
+                if verbose:
+                    print(f"📊 Filled NaNs in numeric column '{col}' with {self.strategy} ({value:.2f})")
+            return series
+
+        text = _is_text(series)
+        if not (n_missing or text):
+            return series
+
+        # Everything else works on distinct values: factorize -> transform uniques -> take
+        codes, uniques = pd.factorize(series)
+        uniques = np.asarray(uniques, dtype=object)
+        if n_missing:
+            value = fill_values.get(col, self.fill_value(col, series))
+            uniques = np.append(uniques, value)
+            codes = np.where(codes == -1, len(uniques) - 1, codes)
+            self._count("fill_missing", 0, n_missing)
+            touched["fill_missing"] |= na
+            if verbose:
+                print(f"📝 Filled NaNs in text column '{col}' with '{value}'")
+
+        if text and self.canonical is not None and col in self.canonical:
+            return self._canonicalize(col, series, codes, uniques, touched)
+
+        new_uniques = uniques
+        if text and self.text_fn is not None:
+            new_uniques = np.array([self.text_fn(v) if isinstance(v, str) else v for v in uniques], dtype=object)
+            self._count_changes("standardize_text", uniques, new_uniques, codes, touched)
+
+        if isinstance(series.dtype, pd.CategoricalDtype):  # stay categorical (typed loads, see schema.py)
+            inverse, categories = pd.factorize(new_uniques)
+            values = pd.Categorical.from_codes(inverse.take(codes), categories=categories)
+            return pd.Series(values, index=series.index, name=col)
+        return pd.Series(new_uniques.take(codes), index=series.index, name=col)
+
+    def _canonicalize(self, col, series: pd.Series, codes: np.ndarray, uniques: np.ndarray, touched: dict):
+        """Map each distinct value to its canonical value (unmatched ones get the text transform) -> categorical."""
+        mapped = self.canonical.map_values(col, uniques)
+        matched = np.array([m is not None for m in mapped], dtype=bool)
+        canonical_uniques = np.array([m if m is not None else v for v, m in zip(uniques, mapped)], dtype=object)
+        self._count_changes("canonicalize", uniques, canonical_uniques, codes, touched)
+        new_uniques = canonical_uniques
+        if self.text_fn is not None and not matched.all():
+            new_uniques = np.array([v if ok or not isinstance(v, str) else self.text_fn(v)
+                                    for v, ok in zip(canonical_uniques, matched)], dtype=object)
+            self._count_changes("standardize_text", canonical_uniques, new_uniques, codes, touched)
+
+        # Canonical values first (stable across chunks), then whatever did not match
+        categories = pd.Index(list(dict.fromkeys(self.canonical.categories(col) + list(new_uniques[~matched]))))
+        values = pd.Categorical.from_codes(categories.get_indexer(new_uniques).take(codes), categories=categories)
+        return pd.Series(values, index=series.index, name=col)
+
+    def _clean_date_column(self, col, series: pd.Series, touched: dict, verbose: bool) -> pd.Series:
+        """Parse to datetime64; missing and unparseable cells stay NaT (written as the fill label on export)."""
+        formats = self.date_formats.get(col, [self.date_format])
+        parsed, unmatched, examples = dates.parse_dates(series, formats)
+        if series.dtype.kind != "M":
+            converted = ~np.isnat(parsed.to_numpy())
+            touched["standardize_dates"] |= converted
+            self._count("standardize_dates", 0, int(converted.sum()))
+        if unmatched:
+            print(f"⚠️ {unmatched} values in '{col}' matched none of the date formats {formats} "
+                  f"(e.g. {examples}); left missing")
+        if verbose:
+            print(f"📅 Parsed '{col}' as dates ({', '.join(formats)})")
+        return parsed
+
+    def _count_changes(self, step: str, before: np.ndarray, after: np.ndarray, codes: np.ndarray, touched: dict):
+        changed = np.array([not (a is b or a == b) for a, b in zip(before, after)], dtype=bool)
+        rows = changed[codes]
+        touched[step] |= rows
+        self._count(step, 0, int(rows.sum()))
+
+    def _count(self, step: str, rows: int, cells: int):
+        self.report[step]["rows"] += rows
+        self.report[step]["cells"] += cells
+
+    def run(self, df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+        """Row filters + per-column cleaning on a whole frame."""
+        keep = self.row_mask(df)
+        if verbose:
+            print(f"🔁 Removed {self.report['drop_duplicates']['rows']} duplicate rows")
+            print(f"⚖️ Dropped {self.report['drop_sparse_rows']['rows']} rows with too many missing values")
+        return self.apply(df, keep if not keep.all() else None, verbose=verbose)
+
+    def print_report(self):
+        for step, counts in self.report.items():
+            print(f"   • {step}: {counts['rows']} rows, {counts['cells']} cells")
+
+
+def compile_plan(config: dict) -> CleaningPlan:
+    """Compile cleaning config into a reusable `CleaningPlan`."""
+    return CleaningPlan(config)
+
+
+def config_slice(config: dict) -> dict:
+    """The part of `config` that affects cleaning."""
+    return {k: (config or {}).get(k) for k in CleaningPlan.CONFIG_KEYS}
+
+
+@instrumented("cleaning")
 def clean_data(df: pd.DataFrame, config: dict) -> pd.DataFrame:
     """Clean the dataset based on config rules."""
     print("🧹 Starting data cleaning...")
+    plan = compile_plan(config)
+    df = plan.run(df)
+    df.attrs["cleaning_report"] = plan.report
+    print("✅ Cleaning complete")
+    plan.print_report()
+    return df
 
-    # Drop duplicates
-    if config.get("drop_duplicates", True):
-        before = len(df)
-        df = df.drop_duplicates()
-        after = len(df)
-        print(f"🔁 Removed {before - after} duplicate rows")
-
-    # Handle missing values
-    fill_cfg = config.get("fill_missing", {})
-    strategy = fill_cfg.get("strategy", "median")
-    threshold = fill_cfg.get("threshold", 0.3)
-
-    # Drop rows if too many missing values
-    row_threshold = int(threshold * df.shape[1])
-    before = len(df)
-    df = df.dropna(thresh=row_threshold)
-    after = len(df)
-    print(f"⚖️ Dropped {before - after} rows with too many missing values")
-
-    # Fill remaining missing values
-    for col in df.columns:
-        if df[col].isna().any():
-            if df[col].dtype in [np.float64, np.int64]:
-                if strategy == "mean":
-                    value = df[col].mean()
-                else:  # default to median
-                    value = df[col].median()
-                df[col] = df[col].fillna(value)
-                print(f"📊 Filled NaNs in numeric column '{col}' with {strategy} ({value:.2f})")
-            else:
-                df[col] = df[col].fillna("Unknown")
-                print(f"📝 Filled NaNs in text column '{col}' with 'Unknown'")
-
-    # Standardize text columns
-    text_std = config.get("text_standardization", "title")
-    for col in df.select_dtypes(include=["object"]).columns:
-        if text_std == "lower":
-            df[col] = df[col].str.lower()
-        elif text_std == "upper":
-            df[col] = df[col].str.upper()
-        elif text_std == "title":
-            df[col] = df[col].str.title()
-
-    # Fix date columns
-    # Default date format (global fallback)
-    default_date_fmt = config.get("date_format", "%Y-%m-%d")
-
-    # Get column-specific date configs if defined
-    date_columns_config = config.get("date_columns", [])
-
-    # Convert date columns
-    for col in df.columns:
-        if "date" in col.lower():
-            # Look up specific format for this column if defined
-            col_config = next((c for c in date_columns_config if c.get("name") == col), {})
-            date_fmt = col_config.get("format", default_date_fmt)
-
-            try:
-                df[col] = pd.to_datetime(df[col], errors="coerce", format=date_fmt).dt.strftime(default_date_fmt)
-                print(f"📅 Standardized '{col}' to format {default_date_fmt}")
-            except Exception as e:
-                print(f"⚠️ Could not standardize '{col}': {e}")
 
+def clean_chunks(chunks, config: dict, sample_size: int = 100_000):
+    """
+    Clean an iterable of DataFrame chunks with bounded memory and yield cleaned chunks.
 
-    print("✅ Cleaning complete")
-    return df
+    Pass 1 drops duplicate rows (across chunk boundaries, via 64-bit row hashes)
+    and sparse rows, spools the survivors to disk and gathers fill statistics:
+    the mean exactly, the median from a uniform row sample of `sample_size` rows.
+    Pass 2 runs the compiled `CleaningPlan` chunk by chunk.
+    """
+    print("🧹 Starting chunked data cleaning...")
+    plan = compile_plan(config)
+
+    seen = fingerprint.SortedShards()
+    sums, counts = {}, {}
+    sample = RowSample(sample_size)
+
+    with io_utils.ChunkSpool() as spool:
+        for chunk in chunks:
+            duplicated = None
+            if plan.drop_duplicates:
+                hashes = fingerprint.row_fingerprints(chunk, plan.duplicate_keys, plan.normalize_keys)
+                duplicated = pd.Series(hashes).duplicated().to_numpy() | seen.contains(hashes)
+                seen.add(hashes[~duplicated])
+
+            chunk = chunk[plan.row_mask(chunk, duplicated)]
+            if chunk.empty:
+                continue
+
+            numeric = chunk[[c for c in chunk.columns if _is_numeric(chunk[c])]]
+            for col in numeric.columns:
+                sums[col] = sums.get(col, 0.0) + numeric[col].sum()
+                counts[col] = counts.get(col, 0) + int(numeric[col].count())
+            if plan.strategy != "mean":
+                sample.update(numeric)
+            spool.append(chunk)
+
+        print(f"🔁 Removed {plan.report['drop_duplicates']['rows']} duplicate rows")
+        print(f"⚖️ Dropped {plan.report['drop_sparse_rows']['rows']} rows with too many missing values")
+
+        if plan.strategy == "mean":
+            fill_values = {c: sums[c] / counts[c] for c in sums if counts[c]}
+        else:
+            fill_values = sample.result().median(numeric_only=True).dropna().to_dict()
+        fill_values.update(plan.fill_overrides)
+
+        for chunk in spool:
+            yield plan.apply(chunk, fill_values=fill_values, verbose=False)
+
+    print(f"✅ Chunked cleaning complete ({spool.rows} rows)")
+    plan.print_report()
@@ -0,0 +1,306 @@
+"""
+Long-running local worker daemon: heavy libraries are imported once and
+configs parsed once, so each job starts straight away.
+
+    python -m src.daemon serve --port 8765 --workers 2 --ttl-minutes 60
+    python -m src.daemon submit --input sample_data/sample.xlsx --outdir outputs
+    python -m src.daemon status <job id>
+    python -m src.daemon stop
+
+Endpoints (JSON, 127.0.0.1 only by default):
+    POST /jobs          {"input": [...], "outdir": ..., "config": ..., "chunksize": ..., "format": [...]}
+                        ?wait=1 answers once the job has finished
+    GET  /jobs/<id>     job status and per-file entries (as in run_index.json);
+                        finished jobs are forgotten after --ttl-minutes
+    GET  /health        uptime, warm modules, job counts
+    POST /shutdown
+
+Only the standard library is imported at module level, so `submit` pays no
+pandas / scikit-learn import cost.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import functools
+import importlib
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_TTL_S = 3600       # finished jobs stay queryable this long
+
+# Imported before the worker pool starts; forked workers inherit them
+WARM_MODULES = [
+    "pandas", "numpy", "yaml", "openpyxl", "pyarrow", "pyarrow.parquet", "matplotlib",
+    "matplotlib.pyplot", "seaborn", "sklearn.cluster", "sklearn.linear_model", "sklearn.metrics",
+    "jinja2", "pdfkit", "src.main",
+]
+
+
+def warm_up(modules=WARM_MODULES) -> list:
+    """Import the heavy libraries now; returns the modules that imported."""
+    import matplotlib
+    matplotlib.use("Agg")
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError as e:
+            print(f"⚠️ Could not preload {name}: {e}")
+    return loaded
+
+
+class Daemon:
+    """Job table + worker pool behind the HTTP handler; finished jobs expire after `ttl_s`."""
+
+    def __init__(self, config_path: str, workers: int = None, ttl_s: float = DEFAULT_TTL_S):
+        self.config_path = config_path
+        self.workers = workers or os.cpu_count() or 1
+        self.ttl_s = ttl_s
+        self.started = time.time()
+        self.warm = warm_up()
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.jobs = {}
+        self.finished = {}   # job id -> time its last file finished
+        self.lock = threading.Lock()
+        self._configs = {}
+
+    def config(self, path: str = None) -> dict:
+        """Parsed config, re-read only when the file changes."""
+        from src.main import load_config
+        path = os.path.abspath(path or self.config_path)
+        mtime = os.path.getmtime(path)
+        cached = self._configs.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_config(path))
+            self._configs[path] = cached
+        return cached[1]
+
+    def submit(self, request: dict) -> dict:
+        from src import main
+        self.cleanup()
+        inputs = request.get("input")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not inputs:
+            raise ValueError("'input' is required")
+        paths = main.expand_inputs(inputs)
+        if not paths:
+            raise FileNotFoundError(f"No Excel workbooks matched {inputs}")
+
+        config = dict(self.config(request.get("config")))
+        if request.get("format"):
+            formats = request["format"]
+            config["output"] = {**(config.get("output") or {}),
+                                "formats": [formats] if isinstance(formats, str) else formats}
+        if self.workers > 1:  # jobs share the pool, so each file's stages and charts run in its worker
+            config["scheduler"] = {**(config.get("scheduler") or {}), "max_workers": 1}
+            config["visuals"] = {**(config.get("visuals") or {}), "workers": 1}
+        outdir = os.path.abspath(request.get("outdir") or "outputs")
+        out_dirs = main._batch_output_dirs(paths, outdir) if len(paths) > 1 else {paths[0]: outdir}
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {"id": job_id, "status": "running", "submitted": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "inputs": paths, "outdir": outdir, "files": []}
+        futures = [self.pool.submit(main._batch_job, os.path.abspath(path), out_dirs[path], config,
+                                    request.get("chunksize")) for path in paths]
+        with self.lock:
+            self.jobs[job_id] = (job, futures)
+        for future in futures:
+            future.add_done_callback(functools.partial(self._done, job_id, futures))
+        return job
+
+    def _done(self, job_id: str, futures: list, _future=None):
+        if all(f.done() for f in futures):
+            with self.lock:
+                self.finished.setdefault(job_id, time.time())
+
+    def status(self, job_id: str, wait: bool = False) -> dict:
+        """Job entry, refreshed once all its files are done; KeyError for unknown (or expired) jobs."""
+        with self.lock:
+            job, futures = self.jobs[job_id]
+        if wait:
+            for future in futures:
+                future.exception()
+        if job["status"] == "running" and all(f.done() for f in futures):
+            job["files"] = [_entry(f) for f in futures]
+            job["status"] = "ok" if all(e["status"] == "ok" for e in job["files"]) else "failed"
+            job["wall_s"] = round(max(e.get("wall_s") or 0 for e in job["files"]), 3)
+        return job
+
+    def cleanup(self) -> int:
+        """Forget jobs that finished more than `ttl_s` ago; returns how many."""
+        now = time.time()
+        with self.lock:
+            expired = [job_id for job_id, finished in self.finished.items() if now - finished > self.ttl_s]
+            for job_id in expired:
+                del self.jobs[job_id], self.finished[job_id]
+        return len(expired)
+
+    def health(self) -> dict:
+        self.cleanup()
+        with self.lock:
+            job_ids = list(self.jobs)
+        statuses = []
+        for job_id in job_ids:
+            try:
+                statuses.append(self.status(job_id)["status"])
+            except KeyError:  # expired meanwhile
+                pass
+        return {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                "workers": self.workers, "warm_modules": self.warm,
+                "jobs": {s: statuses.count(s) for s in sorted(set(statuses))}}
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _entry(future) -> dict:
+    try:
+        return future.result()
+    except Exception as e:  # e.g. the worker process died
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+
+def _handler(daemon: Daemon, server_ref: list):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: dict):
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                return self._send(200, daemon.health())
+            if url.path.startswith("/jobs/"):
+                job_id = url.path.rsplit("/", 1)[-1]
+                wait = parse_qs(url.query).get("wait", ["0"])[0] == "1"
+                try:
+                    job = daemon.status(job_id, wait)
+                except KeyError:
+                    return self._send(404, {"error": f"Unknown job '{job_id}'"})
+                return self._send(200, job)
+            self._send(404, {"error": f"Unknown path '{url.path}'"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/shutdown":
+                self._send(200, {"status": "stopping"})
+                threading.Thread(target=server_ref[0].shutdown, daemon=True).start()
+                return
+            if url.path != "/jobs":
+                return self._send(404, {"error": f"Unknown path '{url.path}'"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                job = daemon.submit(request)
+            except (ValueError, OSError) as e:
+                return self._send(400, {"error": f"{type(e).__name__}: {e}"})
+            wait = parse_qs(url.query).get("wait", ["0"])[0] == "1"
+            self._send(200 if wait else 202, daemon.status(job["id"], wait))
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, config_path: str = "config/config.yaml",
+          workers: int = None, ttl_s: float = DEFAULT_TTL_S):
+    """Warm up, then answer job requests until /shutdown or Ctrl+C."""
+    start = time.perf_counter()
+    daemon = Daemon(config_path, workers, ttl_s)
+    daemon.config()  # parse (and validate) the default config up front
+    server_ref = []
+    server = ThreadingHTTPServer((host, port), _handler(daemon, server_ref))
+    server_ref.append(server)
+    print(f"🔥 Warm in {time.perf_counter() - start:.1f}s ({len(daemon.warm)} modules, {daemon.workers} workers)")
+    print(f"🛰️ DataSage daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        print("👋 Daemon stopped")
+
+
+def _call(url: str, method: str = "GET", payload: dict = None, timeout: float = None) -> dict:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}") | {"http_status": e.code}
+
+
+def submit(inputs: list, outdir: str = "outputs", config_path: str = None, chunksize: int = None,
+           formats: list = None, wait: bool = True, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> dict:
+    """Send a job to a running daemon; with `wait` the call returns once the job is done."""
+    payload = {"input": [os.path.abspath(p) for p in inputs], "outdir": os.path.abspath(outdir),
+               "config": os.path.abspath(config_path) if config_path else None,
+               "chunksize": chunksize, "format": formats}
+    return _call(f"http://{host}:{port}/jobs" + ("?wait=1" if wait else ""), "POST", payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DataSage warm worker daemon")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = commands.add_parser("serve", help="Start the daemon")
+    serve_cmd.add_argument("--config", default="config/config.yaml", help="Default config for jobs")
+    serve_cmd.add_argument("--workers", type=int, default=None, help="Jobs run at once (default: CPU count)")
+    serve_cmd.add_argument("--ttl-minutes", type=float, default=DEFAULT_TTL_S / 60,
+                           help="Forget finished jobs after this long")
+
+    submit_cmd = commands.add_parser("submit", help="Run a job on the daemon")
+    submit_cmd.add_argument("--input", required=True, nargs="+", help="Excel file(s), directories or globs")
+    submit_cmd.add_argument("--outdir", default="outputs")
+    submit_cmd.add_argument("--config", default=None, help="Config for this job (default: the daemon's)")
+    submit_cmd.add_argument("--chunksize", type=int, default=None)
+    submit_cmd.add_argument("--format", nargs="+", default=None)
+    submit_cmd.add_argument("--no-wait", action="store_true", help="Return the job id immediately")
+
+    status_cmd = commands.add_parser("status", help="Show a job, or the daemon's health")
+    status_cmd.add_argument("job_id", nargs="?")
+    commands.add_parser("stop", help="Stop the daemon")
+
+    args = parser.parse_args(argv)
+    base = f"http://{args.host}:{args.port}"
+    if args.command == "serve":
+        serve(args.host, args.port, args.config, args.workers, args.ttl_minutes * 60)
+        return 0
+    try:
+        if args.command == "submit":
+            result = submit(args.input, args.outdir, args.config, args.chunksize, args.format,
+                            wait=not args.no_wait, host=args.host, port=args.port)
+        elif args.command == "status":
+            result = _call(f"{base}/jobs/{args.job_id}" if args.job_id else f"{base}/health")
+        else:
+            result = _call(f"{base}/shutdown", "POST", {})
+    except urllib.error.URLError as e:
+        print(f"❌ No daemon at {base} ({e.reason}); start one with: python -m src.daemon serve")
+        return 2
+    print(json.dumps(result, indent=2, default=str))
+    return 0 if result.get("status") in ("ok", "running", "stopping") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
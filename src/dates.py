@@ -0,0 +1,136 @@
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+DEFAULT_FORMAT = "%Y-%m-%d"
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")   # day 0 of Excel's serial date numbers
+EXCEL_MAX_SERIAL = 2_958_465               # 9999-12-31
+MAX_CACHED_VALUES = 500_000                # per format list; the mapping is dropped when it grows past this
+
+# formats tuple -> {raw value: datetime64[ns]}; shared by chunks, columns and runs in this process
+_mappings = {}
+_MISS = object()
+
+
+def _as_list(formats) -> list:
+    if not formats:
+        return []
+    return [formats] if isinstance(formats, str) else list(formats)
+
+
+def _mapping(formats: tuple) -> dict:
+    mapping = _mappings.setdefault(formats, {})
+    if len(mapping) > MAX_CACHED_VALUES:
+        mapping.clear()
+    return mapping
+
+
+def _parse_new(values: list, formats: tuple) -> np.ndarray:
+    """Parse raw values not seen before: datetimes pass through, then each format in
+    order on what is still unparsed, then numbers as Excel serial days."""
+    out = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    todo = []
+    for i, value in enumerate(values):
+        if isinstance(value, (dt.date, np.datetime64)):
+            out[i] = pd.Timestamp(value).to_datetime64()
+        else:
+            todo.append(i)
+
+    for fmt in formats:
+        if not todo:
+            break
+        text = pd.Series([str(values[i]).strip() for i in todo], dtype=object)
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        hit = ~np.isnat(parsed)
+        out[np.asarray(todo)[hit]] = parsed[hit]
+        todo = [i for i, ok in zip(todo, hit) if not ok]
+
+    for i in todo:
+        value = values[i]
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, bool) and 0 < value <= EXCEL_MAX_SERIAL:
+            out[i] = (EXCEL_EPOCH + pd.to_timedelta(float(value), unit="D")).to_datetime64()
+    return out
+
+
+def parse_values(uniques, formats) -> np.ndarray:
+    """datetime64[ns] for each (distinct) raw value; results are cached per format list."""
+    formats = tuple(_as_list(formats) or [DEFAULT_FORMAT])
+    mapping = _mapping(formats)
+    out = np.full(len(uniques), np.datetime64("NaT"), dtype="datetime64[ns]")
+    misses, positions = [], []
+    for i, value in enumerate(uniques):
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+            continue
+        hit = mapping.get(value, _MISS)
+        if hit is _MISS:
+            misses.append(value)
+            positions.append(i)
+        else:
+            out[i] = hit
+    if misses:
+        parsed = _parse_new(misses, formats)
+        out[positions] = parsed
+        mapping.update(zip(misses, parsed))
+    return out
+
+
+def parse_dates(series: pd.Series, formats) -> tuple:
+    """
+    (datetime64[ns] Series, number of non-missing cells that matched no format,
+    a few of those raw values). Each distinct value is parsed once.
+    """
+    if series.dtype.kind == "M":
+        return series, 0, []
+    codes, uniques = pd.factorize(series)
+    uniques = np.asarray(uniques, dtype=object)
+    parsed = parse_values(uniques, formats)
+    values = np.append(parsed, np.datetime64("NaT")).take(codes)
+    failed = np.isnat(parsed)
+    bad_cells = int(failed[codes[codes >= 0]].sum())
+    return pd.Series(values, index=series.index, name=series.name), bad_cells, list(uniques[failed][:5])
+
+
+def column_formats(config: dict) -> dict:
+    """Column -> list of input formats, from `date_columns` and `columns: {col: {type: date, format}}`."""
+    config = config or {}
+    default = config.get("date_format", DEFAULT_FORMAT)
+    formats = {}
+    for spec in config.get("date_columns") or []:
+        if isinstance(spec, dict) and "name" in spec:
+            formats[spec["name"]] = _as_list(spec.get("format")) or [default]
+        elif isinstance(spec, str):
+            formats[spec] = [default]
+    for col, spec in (config.get("columns") or {}).items():
+        if isinstance(spec, dict) and spec.get("type") in ("date", "datetime"):
+            formats.setdefault(col, _as_list(spec.get("format")) or [default])
+    return formats
+
+
+class DateExport:
+    """
+    How datetime64 columns are written to text outputs (xlsx, csv): formatted
+    with `date_format`, missing dates written as the column's fill label
+    (`fillna` override, else "Unknown"). Each distinct date is formatted once.
+    """
+
+    def __init__(self, fmt: str = DEFAULT_FORMAT, fills: dict = None, default_fill="Unknown"):
+        self.fmt = fmt
+        self.fills = fills or {}
+        self.default_fill = default_fill
+
+    @classmethod
+    def from_config(cls, config: dict):
+        config = config or {}
+        return cls(config.get("date_format", DEFAULT_FORMAT), config.get("fillna") or {})
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        date_cols = [c for c in chunk.columns if chunk[c].dtype.kind == "M"]
+        if not date_cols:
+            return chunk
+        chunk = chunk.copy(deep=False)
+        for col in date_cols:
+            codes, uniques = pd.factorize(chunk[col])
+            labels = np.append(np.asarray(uniques.strftime(self.fmt), dtype=object),
+                               self.fills.get(col, self.default_fill))
+            chunk[col] = labels.take(codes)
+        return chunk
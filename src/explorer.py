@@ -0,0 +1,190 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from src import writers
+from src.validation import rule_rows, flagged_rows
+
+PAGE_SIZE = 100
+ROW_COLUMN = "__row__"     # the cleaned frame's row labels, stored as the first column
+ALL_ROWS = "All rows"
+
+
+def _flagged(index: pd.Index, labels) -> np.ndarray:
+    return np.flatnonzero(index.isin(labels))
+
+
+def row_flags(df: pd.DataFrame, validation=None, anomalies=None) -> dict:
+    """
+    Flag name -> positions of the flagged rows: any validation issue, each
+    violated rule, any anomaly and each column's anomalies.
+    """
+    flags = {}
+    mask = getattr(validation, "mask", None)
+    if mask is not None and len(mask) == len(df):
+        flags["Validation issues"] = np.flatnonzero(flagged_rows(mask))
+        for rule in validation.rules:
+            if validation.counts.get(rule.name):
+                flags[f"Rule: {rule.name}"] = np.flatnonzero(rule_rows(mask, rule.bit))
+    if anomalies:
+        per_column = {col: _flagged(df.index, rows) for col, rows in anomalies.items() if len(rows)}
+        if per_column:
+            flags["Anomalies"] = np.unique(np.concatenate(list(per_column.values())))
+            flags.update({f"Anomaly: {col}": rows for col, rows in per_column.items()})
+    return flags
+
+
+class Explorer:
+    """
+    Server-side pages of a cleaned result. The frame lives in an uncompressed
+    Feather file under `directory`, memory-mapped, so a page reads only its
+    own rows. Row flags (validation / anomalies) are stored as row positions.
+    Per column, a sort order is built on first use and kept next to the file
+    as .npy: range filters on numeric and date columns are binary searches
+    in it, and text columns get value codes for value filters. A query is
+    then NumPy work on positions, and only the visible page becomes a DataFrame.
+    """
+
+    def __init__(self, directory: str):
+        import pyarrow.feather as feather
+        self.directory = directory
+        self.table = feather.read_table(os.path.join(directory, "data.feather"), memory_map=True)
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.columns = meta["columns"]
+        self.kinds = meta["kinds"]
+        self.rows = self.table.num_rows
+        flags = np.load(os.path.join(directory, "flags.npz"))
+        self.flags = {name: flags[f"f{i}"] for i, name in enumerate(meta["flags"])}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, directory: str, validation=None, anomalies=None) -> "Explorer":
+        """Store `df` and its row flags under `directory` and open it."""
+        os.makedirs(directory, exist_ok=True)
+        stored = df.copy(deep=False)
+        stored.columns = [f"c{i}" for i in range(df.shape[1])]
+        stored.insert(0, ROW_COLUMN, df.index)
+        writers.FeatherWriter().write(stored, os.path.join(directory, "data.feather"))
+        flags = row_flags(df, validation, anomalies)
+        np.savez(os.path.join(directory, "flags.npz"), **{f"f{i}": rows for i, rows in enumerate(flags.values())})
+        kinds = ["date" if df[c].dtype.kind == "M" else "number" if df[c].dtype.kind in "iuf" else "text"
+                 for c in df.columns]
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"columns": [str(c) for c in df.columns], "kinds": kinds, "flags": list(flags)}, f)
+        print(f"🧭 Explorer ready: {len(df)} rows, {len(flags)} row flags")
+        return cls(directory)
+
+    def _column(self, col: str):
+        return self.table.column(f"c{self.columns.index(col)}")
+
+    def _cached(self, name: str, compute) -> np.ndarray:
+        path = os.path.join(self.directory, name + ".npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        value = compute()
+        np.save(path + ".tmp.npy", value)
+        os.replace(path + ".tmp.npy", path)
+        return value
+
+    def _keys(self, col: str) -> np.ndarray:
+        """Numeric / date column as float64, missing as NaN."""
+        values = self._column(col).to_pandas()
+        if self.kinds[self.columns.index(col)] == "date":
+            values = pd.to_datetime(values)
+            keys = values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+            keys[values.isna().to_numpy()] = np.nan
+            return keys
+        return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def sort_index(self, col: str) -> np.ndarray:
+        """Row positions in ascending order of `col`, missing values last."""
+        i = self.columns.index(col)
+        if self.kinds[i] == "text":
+            return self._cached(f"order_{i}", lambda: self._text_order(col))
+        return self._cached(f"order_{i}", lambda: np.argsort(self._keys(col), kind="stable"))
+
+    def _text_order(self, col: str) -> np.ndarray:
+        """Sort once per distinct value, then order the rows by their value's rank."""
+        labels, _, codes = self.value_codes(col)
+        rank = np.empty(len(labels) + 1, dtype=np.int64)
+        rank[np.argsort(np.array(labels, dtype=object), kind="stable")] = np.arange(len(labels))
+        rank[-1] = len(labels)  # code -1 (missing) sorts last
+        return np.argsort(rank[codes], kind="stable")
+
+    def sorted_keys(self, col: str) -> np.ndarray:
+        """Numeric / date keys in `sort_index` order (for range searches)."""
+        i = self.columns.index(col)
+        return self._cached(f"keys_{i}", lambda: self._keys(col)[self.sort_index(col)])
+
+    def value_codes(self, col: str) -> tuple:
+        """(distinct values, their row counts, per-row code with -1 for missing) of a text column."""
+        i = self.columns.index(col)
+        path = os.path.join(self.directory, f"values_{i}.json")
+        if not os.path.exists(path):
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            column = self._column(col).combine_chunks()
+            if pa.types.is_dictionary(column.type):
+                column = column.dictionary_decode()
+            encoded = column.dictionary_encode()
+            codes = pc.fill_null(encoded.indices, -1).to_numpy().astype(np.int32)
+            labels = [str(v) for v in encoded.dictionary.to_pylist()]
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+            self._cached(f"codes_{i}", lambda: codes)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"labels": labels, "counts": counts.tolist()}, f)
+        with open(path, encoding="utf-8") as f:
+            values = json.load(f)
+        return values["labels"], values["counts"], self._cached(f"codes_{i}", None)
+
+    def select(self, flag: str = None, column: str = None, values=None, low=None, high=None,
+               sort: str = None, descending: bool = False) -> np.ndarray:
+        """
+        Positions of the rows to show, in display order: rows with `flag`, then
+        `values` of a text `column` or `low` <= `column` <= `high` for numeric
+        and date columns (bounds may be None), ordered by `sort`.
+        """
+        keep = None
+        if flag and flag != ALL_ROWS:
+            keep = np.zeros(self.rows, dtype=bool)
+            keep[self.flags[flag]] = True
+        if column is not None and (values or low is not None or high is not None):
+            match = np.zeros(self.rows, dtype=bool)
+            if self.kinds[self.columns.index(column)] == "text":
+                labels, _, codes = self.value_codes(column)
+                wanted = [labels.index(v) for v in values or () if v in labels]
+                match = np.isin(codes, wanted)
+            else:
+                keys = self.sorted_keys(column)
+                valid = int(np.count_nonzero(~np.isnan(keys)))
+                start = 0 if low is None else int(np.searchsorted(keys[:valid], self._bound(column, low), "left"))
+                end = valid if high is None else int(np.searchsorted(keys[:valid], self._bound(column, high), "right"))
+                match[self.sort_index(column)[start:end]] = True
+            keep = match if keep is None else keep & match
+
+        if sort is None:
+            return np.arange(self.rows) if keep is None else np.flatnonzero(keep)
+        order = self.sort_index(sort)
+        if descending:
+            valid = self.rows - self._missing(sort)
+            order = np.concatenate([order[:valid][::-1], order[valid:]])
+        return np.asarray(order) if keep is None else order[keep[order]]
+
+    def _bound(self, col: str, value) -> float:
+        if self.kinds[self.columns.index(col)] == "date":
+            return float(pd.Timestamp(value).value)
+        return float(value)
+
+    def _missing(self, col: str) -> int:
+        if self.kinds[self.columns.index(col)] == "text":
+            return self.rows - sum(self.value_codes(col)[1])
+        return int(np.isnan(self.sorted_keys(col)).sum())
+
+    def page(self, positions: np.ndarray, page: int = 0, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+        """Rows `page * page_size` onwards of `positions`, read from the memory-mapped file."""
+        take = np.asarray(positions[page * page_size:(page + 1) * page_size], dtype=np.int64)
+        df = self.table.take(take).to_pandas()
+        df = df.set_index(ROW_COLUMN)
+        df.index.name = None
+        df.columns = self.columns
+        return df
@@ -0,0 +1,207 @@
+import re
+import difflib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+COMPARISONS = ("==", "=", "≈", "~=", "!=", "<=", ">=", "<", ">")
+ARITHMETIC = ("+", "-", "*", "/")
+EQUAL_RTOL = 1e-9              # `=` on floats ignores rounding noise of this relative size
+DEFAULT_TOLERANCE = 0.01       # `≈` without an explicit tolerance
+NS_PER_DAY = 86_400 * 10 ** 9  # dates are compared as (fractional) days
+MAX_COMPILED = 256             # parsed expressions kept for reuse across chunks and runs
+
+_NUMBER = re.compile(r"\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?")
+_OPERATORS = sorted(COMPARISONS + ARITHMETIC + ("(", ")"), key=len, reverse=True)
+_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+_OPERAND = re.compile(r"[^+\-*/()<>=!≈~]+")   # text up to the next operator: an unknown name
+MAX_LISTED_COLUMNS = 30    # columns quoted in an unknown-column error
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _tokenize(text: str, columns) -> list:
+    """
+    Tokens of `text`: ("col", name), ("num", value) and ("op", symbol).
+    Column names may contain spaces, units and operator characters
+    ("Cost Price Per Unit (USD)", "Purchase/Stock in"), so at each position the
+    longest known column name wins before numbers and operators are tried.
+    """
+    names = sorted({str(c) for c in columns}, key=len, reverse=True)
+    by_name = {str(c): c for c in columns}
+    tokens, i = [], 0
+    while i < len(text):
+        if text[i].isspace():
+            i += 1
+            continue
+        name = next((n for n in names if text.startswith(n, i) and not _inside_word(text, i, i + len(n))), None)
+        if name is not None:
+            tokens.append(("col", by_name[name]))
+            i += len(name)
+            continue
+        number = _NUMBER.match(text, i)
+        if number and not _inside_word(text, i, number.end()):
+            tokens.append(("num", float(number.group())))
+            i = number.end()
+            continue
+        op = next((o for o in _OPERATORS if text.startswith(o, i)), None)
+        if op is None:
+            raise ExpressionError(_unknown(text, i, [str(c) for c in columns]))
+        tokens.append(("op", op))
+        i += len(op)
+    return tokens
+
+
+def _unknown(text: str, i: int, names: list) -> str:
+    """Error message for the unmatched name (or symbol) at text[i], with the available columns."""
+    name = _OPERAND.match(text, i)
+    name = name.group().strip() if name else ""
+    if not name:
+        return f"Unknown symbol '{text[i]}' in '{text}'"
+    close = difflib.get_close_matches(name, names, n=1)
+    hint = f" (did you mean '{close[0]}'?)" if close else ""
+    listed = ", ".join(f"'{n}'" for n in names[:MAX_LISTED_COLUMNS])
+    more = f" (+{len(names) - MAX_LISTED_COLUMNS} more)" if len(names) > MAX_LISTED_COLUMNS else ""
+    return f"Unknown column '{name}' in '{text}'{hint}; available columns: {listed}{more}"
+
+
+def _inside_word(text: str, start: int, end: int) -> bool:
+    """True if text[start:end] is glued to letters/digits on either side (a longer name)."""
+    return (start > 0 and text[start - 1].isalnum() and text[start].isalnum()) or \
+           (end < len(text) and text[end].isalnum() and text[end - 1].isalnum())
+
+
+def _to_postfix(tokens: list) -> list:
+    """Shunting-yard: infix arithmetic tokens -> postfix program (unary minus becomes "neg")."""
+    out, stack, expect_operand = [], [], True
+    for kind, value in tokens:
+        if kind in ("col", "num"):
+            if not expect_operand:
+                raise ExpressionError(f"Missing operator before {value!r}")
+            out.append((kind, value))
+            expect_operand = False
+        elif value == "(":
+            if not expect_operand:
+                raise ExpressionError("Missing operator before '('")
+            stack.append(value)
+        elif value == ")":
+            while stack and stack[-1] != "(":
+                out.append(("op", stack.pop()))
+            if not stack:
+                raise ExpressionError("Unbalanced ')'")
+            stack.pop()
+            expect_operand = False
+        elif expect_operand and value in ("-", "+"):
+            if value == "-":
+                stack.append("neg")
+        elif expect_operand:
+            raise ExpressionError(f"Missing operand before '{value}'")
+        else:
+            while stack and stack[-1] != "(" and (stack[-1] == "neg" or _PRECEDENCE[stack[-1]] >= _PRECEDENCE[value]):
+                out.append(("op", stack.pop()))
+            stack.append(value)
+            expect_operand = True
+    if expect_operand:
+        raise ExpressionError("Expression ends with an operator")
+    while stack:
+        op = stack.pop()
+        if op == "(":
+            raise ExpressionError("Unbalanced '('")
+        out.append(("op", op))
+    return out
+
+
+def _as_float(series: pd.Series) -> np.ndarray:
+    """float64 view of a column: numbers widened (no int8 overflow), dates as days, text coerced."""
+    if series.dtype.kind == "M":
+        values = series.to_numpy(dtype="datetime64[ns]")
+        out = values.astype(np.int64).astype(np.float64) / NS_PER_DAY
+        out[np.isnat(values)] = np.nan
+        return out
+    if series.dtype.kind not in "iufb":
+        series = pd.to_numeric(series, errors="coerce")
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class Expression:
+    """
+    A compiled cross-column check such as
+    "Hand-In-Stock = Opening Stock + Purchase/Stock in - Number of Units Sold" or
+    "Total (USD) ≈ Retail Price (USD) * Order Quantity + Tax (USD)".
+
+    Both sides are compiled once into postfix programs over whole columns, so
+    evaluation is a few NumPy operations per term for a frame or a chunk.
+    Values are widened to float64 and dates become days, so date columns can
+    be compared or offset by day counts. `=` allows float rounding noise,
+    `≈` allows `tolerance`. Rows with a missing operand are not violations.
+    """
+
+    def __init__(self, text: str, columns, tolerance: float = None):
+        self.text = text
+        tokens = _tokenize(text, columns)
+        positions = [i for i, (kind, value) in enumerate(tokens) if kind == "op" and value in COMPARISONS]
+        if len(positions) != 1:
+            raise ExpressionError(f"Expected exactly one comparison ({', '.join(COMPARISONS)}) in '{text}'")
+        at = positions[0]
+        self.comparison = tokens[at][1]
+        self.left = _to_postfix(tokens[:at])
+        self.right = _to_postfix(tokens[at + 1:])
+        self.columns = list(dict.fromkeys(v for k, v in tokens if k == "col"))
+        approx = self.comparison in ("≈", "~=")
+        self.tolerance = (DEFAULT_TOLERANCE if tolerance is None else float(tolerance)) if approx else tolerance
+
+    @staticmethod
+    def _run(program: list, arrays: dict, n: int) -> np.ndarray:
+        stack = []
+        for kind, value in program:
+            if kind == "col":
+                stack.append(arrays[value])
+            elif kind == "num":
+                stack.append(np.full(n, value))
+            elif value == "neg":
+                stack.append(-stack.pop())
+            else:
+                b, a = stack.pop(), stack.pop()
+                stack.append(a + b if value == "+" else a - b if value == "-" else a * b if value == "*" else a / b)
+        return stack[0]
+
+    def violations(self, df: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of rows where the check fails."""
+        n = len(df)
+        arrays = {col: _as_float(df[col]) for col in self.columns}
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            left = self._run(self.left, arrays, n)
+            right = self._run(self.right, arrays, n)
+            known = ~(np.isnan(left) | np.isnan(right))
+            op = self.comparison
+            if op in ("=", "=="):
+                tol = self.tolerance or 0
+                ok = np.abs(left - right) <= np.maximum(tol, EQUAL_RTOL * np.maximum(np.abs(left), np.abs(right)))
+            elif op in ("≈", "~="):
+                ok = np.abs(left - right) <= self.tolerance
+            elif op == "!=":
+                ok = left != right
+            elif op == "<":
+                ok = left < right
+            elif op == "<=":
+                ok = left <= right
+            elif op == ">":
+                ok = left > right
+            else:
+                ok = left >= right
+        return known & ~ok
+
+    def __repr__(self):
+        return f"Expression({self.text!r})"
+
+
+@lru_cache(maxsize=MAX_COMPILED)
+def _compile(text: str, columns: tuple, tolerance) -> Expression:
+    return Expression(text, columns, tolerance)
+
+
+def compile_expression(text: str, columns, tolerance: float = None) -> Expression:
+    """`Expression` for `text` against these columns; the MAX_COMPILED most recent are reused."""
+    return _compile(text, tuple(columns), tolerance)
@@ -0,0 +1,224 @@
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+import numpy as np
+import pandas as pd
+
+DEFAULT_INDEX_DIR = os.path.join(".datasage_cache", "fingerprints")
+NORMALIZE_DECIMALS = 6   # normalized keys round numbers to this many decimals
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(value):
+    """Near-duplicate form of a text value: NFKC, case-folded, punctuation dropped, spaces collapsed."""
+    if not isinstance(value, str):
+        return value
+    value = unicodedata.normalize("NFKC", value).casefold()
+    return _SPACES.sub(" ", _PUNCTUATION.sub("", value)).strip()
+
+
+def _key_column(series: pd.Series, normalize: bool) -> pd.Series:
+    if series.dtype.kind in "iuf":
+        # int64 and float64 chunks of the same column must agree
+        values = series.astype("float64")
+        return values.round(NORMALIZE_DECIMALS) if normalize else values
+    if normalize:
+        codes, uniques = pd.factorize(series)
+        uniques = np.array([normalize_text(v) for v in uniques], dtype=object)
+        return pd.Series(np.append(uniques, None).take(codes), index=series.index)
+    return series
+
+
+def row_fingerprints(df: pd.DataFrame, columns=None, normalize: bool = False) -> np.ndarray:
+    """
+    One uint64 hash per row over `columns` (default: all), vectorized with
+    `pd.util.hash_pandas_object`. With `normalize`, text is compared by
+    `normalize_text` and numbers rounded, so near-duplicates hash alike.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    keys = pd.DataFrame({i: _key_column(df[c], normalize) for i, c in enumerate(columns)}, index=df.index)
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def duplicated(df: pd.DataFrame, columns=None, normalize: bool = False, keep="first") -> np.ndarray:
+    """`df.duplicated(subset=columns, keep=keep)` on row fingerprints."""
+    return pd.Series(row_fingerprints(df, columns, normalize)).duplicated(keep=keep).to_numpy()
+
+
+class SortedShards:
+    """
+    A growing set of uint64 keys kept as a few sorted arrays, each at least twice
+    the size of the next (a new shard is merged into the ones before it once it
+    catches up). Adding n keys in total costs O(n log n) and a lookup is one
+    binary search per shard, so streaming chunks never re-sort all keys seen so far.
+    """
+
+    def __init__(self):
+        self.shards = []
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Boolean mask of `keys` already in the set."""
+        found = np.zeros(len(keys), dtype=bool)
+        if not self.shards or not len(keys):
+            return found
+        order = np.argsort(keys)
+        needles = keys[order]          # ascending needles: searchsorted narrows as it goes
+        for shard in self.shards:
+            pos = np.searchsorted(shard, needles).clip(max=len(shard) - 1)
+            found[order] |= shard[pos] == needles
+        return found
+
+    def add(self, keys: np.ndarray):
+        """Add `keys` (callers pass keys not yet in the set)."""
+        keys = np.unique(np.asarray(keys, dtype=np.uint64))
+        if not len(keys):
+            return
+        self.shards.append(keys)
+        while len(self.shards) > 1 and len(self.shards[-2]) < 2 * len(self.shards[-1]):
+            last = self.shards.pop()
+            self.shards[-1] = np.sort(np.concatenate([self.shards[-1], last]))
+
+
+def value_hashes(values) -> np.ndarray:
+    """One uint64 hash per value (as in `row_fingerprints`: equal ints and floats hash alike)."""
+    return row_fingerprints(pd.DataFrame({0: values}))
+
+
+def key_columns(config: dict):
+    """Key columns from `validations.duplicates.based_on`, else `dataset.primary_key`; None = whole row."""
+    config = config or {}
+    dup_cfg = ((config.get("validations") or {}).get("duplicates") or {})
+    keys = dup_cfg.get("based_on") or (config.get("dataset") or {}).get("primary_key")
+    if isinstance(keys, str):
+        keys = [keys]
+    return list(keys) if keys else None
+
+
+def _settings(config: dict) -> dict:
+    cfg = (config or {}).get("fingerprints") or {}
+    return {
+        "enabled": cfg.get("enabled", False),
+        "dir": cfg.get("dir", DEFAULT_INDEX_DIR),
+        "normalize": cfg.get("normalize", False),
+        "columns": cfg.get("columns") or key_columns(config),
+    }
+
+
+class FingerprintIndex:
+    """
+    Persistent index of row fingerprints, one shard per source file.
+
+    Each shard is a sorted uint64 `.npy` array (memory-mapped on lookup) plus
+    a small JSON sidecar; lookups are binary searches, so earlier files are
+    never reloaded. Re-indexing a source replaces its shard, and sources only
+    ever write their own shard, so parallel batch workers do not collide.
+    Indexes for different key columns / normalization live in separate folders.
+    """
+
+    def __init__(self, directory: str, columns=None, normalize: bool = False):
+        self.columns = columns
+        self.normalize = normalize
+        scope = json.dumps({"columns": columns, "normalize": normalize}, sort_keys=True)
+        self.directory = os.path.join(directory, hashlib.sha256(scope.encode()).hexdigest()[:16])
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Index from the `fingerprints:` config section; None unless enabled."""
+        settings = _settings(config)
+        if not settings["enabled"]:
+            return None
+        return cls(settings["dir"], settings["columns"], settings["normalize"])
+
+    @staticmethod
+    def _shard_name(source: str) -> str:
+        return hashlib.sha256(os.path.abspath(source).encode()).hexdigest()[:24]
+
+    def shards(self) -> dict:
+        """Source path -> its sorted fingerprint array (memory-mapped)."""
+        shards = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            base = os.path.join(self.directory, name[:-5])
+            try:
+                with open(base + ".json", encoding="utf-8") as f:
+                    meta = json.load(f)
+                shards[meta["source"]] = np.load(base + ".npy", mmap_mode="r")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Skipping unreadable fingerprint shard {name}: {e}")
+        return shards
+
+    def lookup(self, hashes: np.ndarray, exclude: str = None, shards: dict = None) -> dict:
+        """
+        Source -> boolean mask of `hashes` already indexed from that source
+        (`exclude` skipped). Pass `shards` (from `shards()`) to reuse them
+        across lookups instead of re-reading the folder.
+        """
+        exclude = os.path.abspath(exclude) if exclude else None
+        found = {}
+        for source, indexed in (self.shards() if shards is None else shards).items():
+            if source == exclude or not len(indexed):
+                continue
+            pos = np.searchsorted(indexed, hashes).clip(max=len(indexed) - 1)
+            hit = np.asarray(indexed[pos]) == hashes
+            if hit.any():
+                found[source] = hit
+        return found
+
+    def add(self, source: str, hashes: np.ndarray):
+        """Store (or replace) the fingerprints of `source`."""
+        base = os.path.join(self.directory, self._shard_name(source))
+        np.save(base + ".tmp.npy", np.unique(hashes))
+        os.replace(base + ".tmp.npy", base + ".npy")
+        meta = {"source": os.path.abspath(source), "rows": int(len(hashes)), "columns": self.columns,
+                "normalize": self.normalize, "indexed": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+def cross_file_duplicates(frames, config: dict, source: str) -> dict:
+    """
+    Check the rows of `source` (a DataFrame or an iterable of chunks) against
+    the fingerprint index of earlier files, then index them. Returns
+    {"rows": row labels whose key was seen in another file, "sources": {file: count}},
+    or None when `fingerprints.enabled` is off.
+    """
+    index = FingerprintIndex.from_config(config)
+    if index is None:
+        return None
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+
+    hashes, rows, sources = [], [], {}
+    shards = index.shards()  # earlier files' shards, opened once for every chunk
+    for chunk in frames:
+        columns = index.columns
+        if columns and any(c not in chunk.columns for c in columns):
+            print(f"⚠️ Fingerprint key columns {columns} not all present; skipping cross-file check")
+            return None
+        chunk_hashes = row_fingerprints(chunk, columns, index.normalize)
+        seen = np.zeros(len(chunk), dtype=bool)
+        for other, hit in index.lookup(chunk_hashes, exclude=source, shards=shards).items():
+            sources[other] = sources.get(other, 0) + int(hit.sum())
+            seen |= hit
+        rows.append(chunk.index.to_numpy()[seen])
+        hashes.append(chunk_hashes)
+
+    index.add(source, np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64))
+    result = {"rows": np.concatenate(rows) if rows else np.empty(0), "sources": sources}
+    if len(result["rows"]):
+        print(f"🧬 {len(result['rows'])} rows repeat a key already seen in {len(sources)} other file(s)")
+    else:
+        print("🧬 No cross-file duplicates")
+    return result
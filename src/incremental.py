@@ -0,0 +1,306 @@
+import os
+import copy
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from src import cleaning, validation, anomalies, fingerprint
+from src.cache import stage_key
+from src.instrument import instrumented
+
+DEFAULT_STATE_DIR = os.path.join(".datasage_cache", "incremental")
+
+
+def _digest(hashes: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(hashes).tobytes()).hexdigest()
+
+
+def _in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """np.isin for a sorted haystack (binary search instead of a sort per call)."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[pos] == values
+
+
+def _merge_sorted(sorted_values: np.ndarray, new: np.ndarray) -> np.ndarray:
+    new = np.sort(new)
+    return np.insert(sorted_values, np.searchsorted(sorted_values, new), new)
+
+
+
+def _concat(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """`pd.concat` that keeps categorical columns categorical when the two sides' categories differ."""
+    out = pd.concat([old, new])
+    for col in old.columns:
+        if isinstance(old[col].dtype, pd.CategoricalDtype) and isinstance(new[col].dtype, pd.CategoricalDtype) \
+                and old[col].dtype != new[col].dtype:
+            values = union_categoricals([old[col].array, new[col].array])
+            out[col] = pd.Series(values, index=out.index, name=col)
+    return out
+
+class IncrementalState:
+    """
+    Persisted state of one workbook's pipeline, so a rerun after rows were
+    appended only cleans, validates and fits the new rows:
+
+      rows / digest:  raw rows processed so far and a hash of their row fingerprints
+                      (an edit above the old end of the sheet forces a rebuild)
+      seen:           sorted duplicate-key fingerprints of first occurrences (duplicate check;
+                      `drop_duplicates` key columns / normalize, else the whole row)
+      values:         numeric column -> sorted observed values (exact median fill)
+      filled:         numeric column -> positions in `cleaned` holding the fill value,
+                      re-patched when the fill value moves
+      mask / unique:  per-row validation bitmask and value counts of `unique` columns
+                      and `duplicate_key` fingerprints
+      detectors:      anomaly detectors fitted on observed (non-filled) values
+
+    The cleaned frame, validation result and anomalies match a full run; with
+    `fill_missing.strategy: mean` up to float rounding, mad/iqr up to sketch accuracy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.rows = 0
+        self.digest = _digest(np.empty(0, dtype=np.uint64))
+        self.columns = None
+        self.numeric = None
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.values = {}
+        self.fill_values = {}
+        self.filled = {}
+        self.report = None
+        self.cleaned = None
+        self.mask = None
+        self.unique = {}
+        self.key_hashes = {}
+        self.detectors = {}
+        # this run's changes: first new row of `cleaned` and re-patched fill cells
+        self.old_rows = 0
+        self.new_rows = 0
+        self.patches = {}
+
+    @classmethod
+    def load(cls, input_file: str, config: dict):
+        """State for `input_file` under the current config (a fresh one if none was saved)."""
+        cfg = (config or {}).get("incremental") or {}
+        key = stage_key("incremental", os.path.abspath(input_file), cleaning.config_slice(config),
+                        validation.rules_from_config(config), (config or {}).get("anomalies"))
+        path = os.path.join(cfg.get("state_dir", DEFAULT_STATE_DIR), key + ".pkl")
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+                state.path = path
+                return state
+            except Exception as e:
+                print(f"⚠️ Ignoring unreadable incremental state: {e}")
+        return cls(path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _numeric_columns(df: pd.DataFrame, plan: cleaning.CleaningPlan) -> list:
+        """Columns that get a numeric fill value (date columns are parsed instead)."""
+        return [c for c in df.columns if cleaning._is_numeric(df[c]) and not plan.is_date_column(c)]
+
+    def appended(self, df: pd.DataFrame, hashes: np.ndarray, plan: cleaning.CleaningPlan) -> bool:
+        """True if `df` is the previously processed rows plus (possibly zero) new rows."""
+        return (self.cleaned is not None and len(df) >= self.rows and list(df.columns) == self.columns
+                and self._numeric_columns(df, plan) == self.numeric and _digest(hashes[:self.rows]) == self.digest)
+
+    def _fill_values(self, plan: cleaning.CleaningPlan) -> dict:
+        fill_values = {}
+        for col, values in self.values.items():
+            if not len(values):
+                fill_values[col] = np.nan
+            else:
+                fill_values[col] = values.mean() if plan.strategy == "mean" else float(np.median(values))
+        fill_values.update(plan.fill_overrides)
+        return fill_values
+
+    def clean(self, df: pd.DataFrame, config: dict, verbose: bool = True) -> pd.DataFrame:
+        """Clean the rows appended since the last run and merge them into the cleaned frame."""
+        plan = cleaning.compile_plan(config)
+        hashes = fingerprint.row_fingerprints(df)
+        if not self.appended(df, hashes, plan):
+            if self.cleaned is not None:
+                print("🔄 Workbook changed above the previous end of the sheet; rebuilding incremental state")
+            self.reset()
+            self.columns = list(df.columns)
+            self.numeric = self._numeric_columns(df, plan)
+            self.values = {c: np.empty(0) for c in self.numeric}
+
+        start = self.rows
+        new, new_hashes = df.iloc[start:], hashes[start:]
+        self.new_rows = len(new)
+        print(f"➕ {len(new)} appended rows to process ({start} already processed)")
+
+        # Row filters on the new rows only; duplicates are checked against every earlier row
+        duplicated = None
+        if plan.drop_duplicates:
+            keys = new_hashes if plan.duplicate_keys is None and not plan.normalize_keys \
+                else fingerprint.row_fingerprints(new, plan.duplicate_keys, plan.normalize_keys)
+            duplicated = pd.Series(keys).duplicated().to_numpy() | _in_sorted(keys, self.seen)
+            self.seen = _merge_sorted(self.seen, np.unique(keys[~duplicated]))
+        keep = plan.row_mask(new, duplicated)
+
+        # Fill values over old + new observed values
+        for col in self.numeric:
+            observed = new[col].to_numpy(dtype=float, na_value=np.nan)[keep]
+            self.values[col] = _merge_sorted(self.values[col], observed[~np.isnan(observed)])
+        fill_values = self._fill_values(plan)
+
+        # Old rows holding a fill value that moved are patched in place
+        self.old_rows = 0 if self.cleaned is None else len(self.cleaned)
+        self.patches = {}
+        for col, positions in self.filled.items():
+            old, value = self.fill_values.get(col), fill_values.get(col)
+            if len(positions) and not (old == value or (pd.isna(old) and pd.isna(value))):
+                self.patches[col] = (positions, old, value)
+
+        new_clean = plan.apply(new, keep if not keep.all() else None, fill_values=fill_values, verbose=verbose)
+        for col in self.numeric:
+            na = new[col].isna().to_numpy()[keep]
+            self.filled[col] = np.concatenate([self.filled.get(col, np.empty(0, dtype=np.int64)),
+                                               np.flatnonzero(na) + self.old_rows])
+
+        if self.cleaned is None:
+            cleaned = new_clean
+        else:
+            old = self.cleaned
+            if self.patches:
+                old = old.copy(deep=False)
+                for col, (positions, _, value) in self.patches.items():
+                    values = old[col].to_numpy(copy=True)
+                    values[positions] = value
+                    old[col] = values
+                print(f"🩹 Re-filled {sum(len(p[0]) for p in self.patches.values())} earlier cells "
+                      f"whose fill value changed ({', '.join(map(str, self.patches))})")
+            cleaned = _concat(old, new_clean) if len(new_clean) else old
+
+        # Running cleaning report: previous counts + the new rows'
+        if self.report is not None:
+            for step, counts in self.report.items():
+                plan.report[step]["rows"] += counts["rows"]
+                plan.report[step]["cells"] += counts["cells"]
+
+        self.rows, self.digest = len(df), _digest(hashes)
+        self.fill_values = fill_values
+        self.report = plan.report
+        self.cleaned = cleaned
+        cleaned.attrs["cleaning_report"] = plan.report
+        print(f"✅ Incremental cleaning complete ({len(new_clean)} new rows, {len(cleaned)} total)")
+        plan.print_report()
+        return cleaned
+
+    def _changed_rows(self, n: int) -> np.ndarray:
+        """Positions in the cleaned frame that are new or were re-patched this run."""
+        rows = [np.arange(self.old_rows, n)] + [p for p, _, _ in self.patches.values()]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+
+    def _key_hashes(self, df_clean: pd.DataFrame, rule) -> tuple:
+        """(key fingerprints of every row, first row not counted yet); only new rows are hashed
+        unless a key column was re-patched."""
+        hashes = self.key_hashes.get(rule.bit)
+        if hashes is None or len(hashes) != self.old_rows or set(self.patches) & set(rule.key_columns):
+            hashes, start = validation.RuleSet.key_fingerprints(df_clean, rule), 0
+        else:
+            new = validation.RuleSet.key_fingerprints(df_clean.iloc[self.old_rows:], rule)
+            hashes, start = np.concatenate([hashes, new]), self.old_rows
+        self.key_hashes[rule.bit] = hashes
+        return pd.Series(hashes.view(np.int64)), start
+
+    def validate(self, df_clean: pd.DataFrame, rules: list) -> validation.ValidationResult:
+        """Re-evaluate the rules on new / re-patched rows; `unique` and `duplicate_key`
+        from merged value counts."""
+        ruleset = validation.RuleSet(rules)
+        rows = self._changed_rows(len(df_clean))
+        _, sub_mask = ruleset.evaluate(df_clean.iloc[rows])
+
+        mask = validation.new_mask(len(df_clean), len(ruleset.rules), ruleset.dtype)
+        if self.mask is not None and self.old_rows:
+            mask[:self.old_rows] = self.mask[:self.old_rows]
+        mask[rows] = sub_mask
+
+        for rule in ruleset.rules:
+            if rule.check == "unique" and rule.column in df_clean.columns:
+                series, start = df_clean[rule.column], self.old_rows
+            elif rule.check == "duplicate_key" and all(c in df_clean.columns for c in rule.key_columns):
+                series, start = self._key_hashes(df_clean, rule)
+            else:
+                continue
+            added = series.iloc[start:].value_counts(dropna=False)
+            counts = self.unique.get(rule.bit) if start else None
+            counts = added if counts is None else counts.add(added, fill_value=0)
+            affected = list(added.index)
+            if rule.check == "unique" and rule.column in self.patches:
+                positions, old, value = self.patches[rule.column]
+                counts = counts.add(pd.Series([-len(positions), len(positions)], index=[old, value]), fill_value=0)
+                affected += [old, value]
+            counts = counts[counts > 0].astype(np.int64)
+            self.unique[rule.bit] = counts
+
+            # rows holding a value whose count moved, plus the re-evaluated rows (their subset bit is stale)
+            pos = np.union1d(np.flatnonzero(series.isin(affected).to_numpy()), rows)
+            dup = counts.reindex(series.iloc[pos]).to_numpy() > 1
+            validation.set_rule_rows(mask, rule.bit, dup, pos)
+
+        self.mask = mask
+        counts = np.array([int(validation.rule_rows(mask, r.bit).sum()) for r in ruleset.rules], dtype=np.int64)
+        missing, required = ruleset.missing_columns(df_clean.columns)
+        result = validation.ValidationResult(ruleset.rules, counts, mask, df_clean.index, required)
+        validation._log_result(result, missing)
+        return result
+
+    def detect(self, df_clean: pd.DataFrame, config: dict = None, z_thresh: float = 3.0) -> dict:
+        """Merge the new rows into the fitted detectors, then flag every row."""
+        method, threshold, columns = anomalies._anomaly_settings(config, z_thresh)
+        scored = {}
+        for col in anomalies._numeric_columns(df_clean, columns):
+            start = self.old_rows if col in self.detectors else 0
+            if col not in self.detectors:
+                self.detectors[col] = anomalies.DETECTORS[method](threshold)
+            values = anomalies._values(df_clean[col].iloc[start:])
+            filled = self.filled.get(col, np.empty(0, dtype=np.int64))
+            observed = np.ones(len(values), dtype=bool)
+            observed[filled[filled >= start] - start] = False
+            self.detectors[col].update(values[observed])
+
+            # Fill values are part of the scored column, at their current value
+            detector = self.detectors[col]
+            if len(filled):
+                detector = copy.deepcopy(detector)
+                detector.update(np.full(len(filled), float(self.fill_values.get(col, np.nan))))
+            scored[col] = detector
+
+        found = anomalies.flag_rows(df_clean, scored)
+        anomalies._log_anomalies(found)
+        return found
+
+
+@instrumented("cleaning")
+def clean_increment(df: pd.DataFrame, config: dict, state: IncrementalState) -> pd.DataFrame:
+    print("🧹 Starting incremental data cleaning...")
+    return state.clean(df, config)
+
+
+@instrumented("validation")
+def validate_increment(df_clean: pd.DataFrame, rules: list, state: IncrementalState) -> validation.ValidationResult:
+    print("🔎 Starting incremental data validation...")
+    return state.validate(df_clean, rules)
+
+
+@instrumented("anomalies")
+def detect_increment(df_clean: pd.DataFrame, config: dict, state: IncrementalState) -> dict:
+    print("📊 Starting incremental anomaly detection...")
+    return state.detect(df_clean, config)
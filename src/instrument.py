@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import cProfile
+import functools
+import itertools
+import tracemalloc
+import pandas as pd
+
+# Settings live in the environment so stage worker processes pick them up
+METRICS_ENV = "DATASAGE_METRICS"           # JSON-lines file to append stage records to
+PROFILE_ENV = "DATASAGE_PROFILE_DIR"       # folder for per-stage cProfile dumps
+TRACEMALLOC_ENV = "DATASAGE_TRACEMALLOC"   # "1" = record allocation peaks
+CONTEXT_ENV = "DATASAGE_METRICS_CONTEXT"   # JSON object merged into every record
+
+_calls = itertools.count()
+
+
+def configure(metrics_path: str = None, profile_dir: str = None, trace_memory: bool = False):
+    """Turn instrumentation on or off for this process and the workers it starts."""
+    for key, value in ((METRICS_ENV, metrics_path), (PROFILE_ENV, profile_dir),
+                       (TRACEMALLOC_ENV, "1" if trace_memory else None)):
+        if value:
+            os.environ[key] = os.path.abspath(value) if key != TRACEMALLOC_ENV else value
+        else:
+            os.environ.pop(key, None)
+    if metrics_path:
+        os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def configure_from(config: dict, metrics_path: str = None, profile_dir: str = None, trace_memory: bool = None):
+    """`configure` from the `instrumentation:` config section; explicit arguments (CLI flags) win."""
+    cfg = (config or {}).get("instrumentation") or {}
+    configure(
+        metrics_path or cfg.get("metrics"),
+        profile_dir or cfg.get("profile_dir"),
+        cfg.get("trace_memory", False) if trace_memory is None else trace_memory,
+    )
+
+
+def set_context(**fields):
+    """Fields (e.g. the input file) added to every record until changed."""
+    os.environ[CONTEXT_ENV] = json.dumps(fields, default=str)
+
+
+def enabled() -> bool:
+    return bool(os.environ.get(METRICS_ENV) or os.environ.get(PROFILE_ENV))
+
+
+def _rows(obj):
+    return len(obj) if isinstance(obj, pd.DataFrame) else None
+
+
+def write_record(record: dict):
+    """Append one JSON line to the metrics sink (single write, so concurrent workers don't interleave)."""
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return
+    record = {**json.loads(os.environ.get(CONTEXT_ENV, "{}")), **record}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+def instrumented(stage: str):
+    """
+    Decorator for stage entry points. When instrumentation is configured, each call
+    appends {stage, wall_s, cpu_s, rows_in, rows_out, peak_alloc_mb, status, ...}
+    to the metrics sink and, with a profile dir, dumps a cProfile file per call.
+    Otherwise the function is called directly.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+
+            frame = args[0] if args else kwargs.get("df")
+            trace = os.environ.get(TRACEMALLOC_ENV) == "1"
+            started_tracing = trace and not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            elif trace:
+                tracemalloc.reset_peak()
+            profile_dir = os.environ.get(PROFILE_ENV)
+            profiler = cProfile.Profile() if profile_dir else None
+
+            record = {"stage": stage, "func": f"{func.__module__}.{func.__qualname__}", "pid": os.getpid(),
+                      "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "rows_in": _rows(frame)}
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                result = profiler.runcall(func, *args, **kwargs) if profiler else func(*args, **kwargs)
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+                raise
+            else:
+                record.update(status="ok", rows_out=_rows(result))
+                return result
+            finally:
+                record["wall_s"] = round(time.perf_counter() - wall, 4)
+                record["cpu_s"] = round(time.process_time() - cpu, 4)
+                if trace:
+                    record["peak_alloc_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+                    if started_tracing:
+                        tracemalloc.stop()
+                if profiler:
+                    path = os.path.join(profile_dir, f"{stage}-{os.getpid()}-{next(_calls)}.prof")
+                    profiler.dump_stats(path)
+                    record["profile"] = path
+                write_record(record)
+        return wrapper
+    return decorator
@@ -1,17 +1,184 @@
+import os
+import shutil
+import tempfile
 import pandas as pd
+from src.cache import WorkbookCache
+from src.writers import XlsxWriter
 
+DEFAULT_CHUNKSIZE = 50_000
 
-def load_excel(path: str) -> pd.DataFrame:
-    """Load an Excel file into a pandas DataFrame."""
+_default_cache = None
+
+
+def _resolve_cache(cache):
+    """`None` -> the shared default cache, `False` -> no caching, else the given cache."""
+    global _default_cache
+    if cache is False:
+        return None
+    if cache is None:
+        if _default_cache is None:
+            _default_cache = WorkbookCache()
+        return _default_cache
+    return cache
+
+
+def load_excel(path: str, chunksize: int = None, sheet_name=0, dtype=None, cache=None, schema=None):
+    """
+    Load an Excel file into a pandas DataFrame.
+    If `chunksize` is given, return an iterator of DataFrame chunks instead
+    (like `pd.read_csv(..., chunksize=...)`).
+
+    Parsed workbooks are kept in a content-addressed `WorkbookCache`, so loading
+    the same file again skips the XML parse. Pass `cache=False` to bypass it.
+    With a `schema.Schema`, columns get their declared types (and compact dtypes).
+    """
+    cache = _resolve_cache(cache)
+    if chunksize:
+        print(f"📥 Streaming file: {path} in chunks of {chunksize} rows")
+        chunks = iter_excel_chunks(path, chunksize, sheet_name=sheet_name, cache=cache)
+        # no compaction per chunk: downcast ints / categories would differ from chunk to chunk
+        return (schema.cast(chunk, compact=False) for chunk in chunks) if schema else chunks
     try:
-        df = pd.read_excel(path)
-        print(f"📥 Loaded file: {path} with {df.shape[0]} rows and {df.shape[1]} columns")
-        return df
+        key = cache.key(path, sheet_name, dtype) if cache else None
+        df = cache.get(key) if cache else None
+        if df is not None:
+            print(f"⚡ Loaded cached parse of {path} with {df.shape[0]} rows and {df.shape[1]} columns")
+        else:
+            df = pd.read_excel(path, sheet_name=sheet_name, dtype=dtype)
+            if cache:
+                cache.put(key, df)
+            print(f"📥 Loaded file: {path} with {df.shape[0]} rows and {df.shape[1]} columns")
+        return schema.apply(df) if schema else df
     except Exception as e:
         print(f"❌ Error loading Excel file: {e}")
         raise
 
 
+def _make_columns(header) -> list:
+    """Name header cells the way `pd.read_excel` does (Unnamed: i, dup.1, ...)."""
+    columns, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _rows_to_frame(rows: list, columns: list, start: int) -> pd.DataFrame:
+    width = len(columns)
+    rows = [tuple(r[:width]) + (None,) * (width - len(r)) for r in rows]
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df.infer_objects()
+
+
+def _iter_cached_chunks(table, chunksize: int):
+    """Slice a memory-mapped Arrow table into DataFrame chunks."""
+    for start in range(0, table.num_rows, chunksize):
+        chunk = table.slice(start, chunksize).to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        yield chunk
+
+
+def iter_excel_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE, sheet_name=0, cache=None):
+    """
+    Stream a worksheet as DataFrame chunks of about `chunksize` rows.
+
+    Rows come from openpyxl's read-only iterator, so only the current chunk is
+    held in memory. The index keeps counting across chunks, so row labels
+    match a full `pd.read_excel`. Trailing empty rows are dropped.
+    If `cache` already holds a Feather parse of the sheet, chunks are sliced
+    from the memory-mapped file instead.
+    """
+    table = cache.get_table(cache.key(path, sheet_name)) if cache else None
+    if table is not None:
+        yield from _iter_cached_chunks(table, chunksize)
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if isinstance(sheet_name, str) else wb.worksheets[sheet_name or 0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _make_columns(header)
+
+        block, blank_rows, start = [], 0, 0
+        for row in rows:
+            if all(v is None for v in row):
+                blank_rows += 1  # only emitted if a non-empty row follows
+                continue
+            if blank_rows:
+                block.extend([()] * blank_rows)
+                blank_rows = 0
+            block.append(row)
+            if len(block) >= chunksize:
+                yield _rows_to_frame(block, columns, start)
+                start += len(block)
+                block = []
+        if block:
+            yield _rows_to_frame(block, columns, start)
+    finally:
+        wb.close()
+
+
+class ChunkSpool:
+    """
+    Disk-backed, re-iterable sequence of DataFrame chunks.
+    Lets several stages (or several passes of one stage) walk the same data
+    while only one chunk is in memory at a time.
+    """
+
+    def __init__(self, directory: str = None):
+        self._owns_dir = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="datasage_spool_")
+        os.makedirs(self.directory, exist_ok=True)
+        self._paths = []
+        self.rows = 0
+        self.columns = None
+
+    def append(self, df: pd.DataFrame):
+        path = os.path.join(self.directory, f"chunk_{len(self._paths):06d}.pkl")
+        df.to_pickle(path)
+        self._paths.append(path)
+        self.rows += len(df)
+        if self.columns is None:
+            self.columns = list(df.columns)
+
+    def __iter__(self):
+        for path in self._paths:
+            yield pd.read_pickle(path)
+
+    def __len__(self):
+        return len(self._paths)
+
+    @property
+    def paths(self) -> list:
+        """The pickled chunk files, in order (e.g. for worker processes to read)."""
+        return list(self._paths)
+
+    def cleanup(self):
+        if self._owns_dir:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            for path in self._paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        self._paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
 def save_excel(df: pd.DataFrame, path: str):
     """Save a pandas DataFrame to an Excel file."""
     try:
@@ -20,3 +187,13 @@ def save_excel(df: pd.DataFrame, path: str):
     except Exception as e:
         print(f"❌ Error saving Excel file: {e}")
         raise
+
+
+def save_excel_chunks(chunks, path: str):
+    """Write DataFrame chunks to an Excel file with openpyxl's write-only mode."""
+    try:
+        XlsxWriter().write(chunks, path)
+        print(f"💾 Saved Excel file: {path}")
+    except Exception as e:
+        print(f"❌ Error saving Excel file: {e}")
+        raise
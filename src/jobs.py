@@ -0,0 +1,198 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORK_DIR = os.path.join(".datasage_cache", "app_jobs")
+QUEUED, RUNNING, DONE, FAILED, CANCELED = "queued", "running", "done", "failed", "canceled"
+FINISHED = (DONE, FAILED, CANCELED)
+
+
+class JobCanceled(Exception):
+    pass
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """
+    One background run: status, per-stage progress and the result. The job
+    function reports progress through `stage(name)`, which is also where a
+    cancel request takes effect (between stages; a running stage completes).
+    """
+
+    def __init__(self, name: str, stages: list, work_dir: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.stages = {stage: "pending" for stage in stages}
+        self.work_dir = work_dir
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        done = sum(s in ("done", "cached", "skipped") for s in self.stages.values())
+        return done / len(self.stages) if self.stages else 0.0
+
+    @property
+    def current_stage(self):
+        return next((name for name, s in self.stages.items() if s == "running"), None)
+
+    def stage(self, name: str, cached: bool = False):
+        """Context manager around one stage: checks for cancellation, then marks it running and done."""
+        return _StageProgress(self, name, cached)
+
+    def skip(self, name: str):
+        self.stages[name] = "skipped"
+
+    def checkpoint(self):
+        if self._cancel.is_set():
+            raise JobCanceled(self.id)
+
+    def cancel(self) -> bool:
+        """Ask the job to stop; a queued job never starts. False if it already finished."""
+        if self.status in FINISHED:
+            return False
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELED)
+        return True
+
+    def _finish(self, status: str, result=None, error: str = None):
+        self.status, self.result, self.error = status, result, error
+        self.finished = time.time()
+        for name, s in self.stages.items():
+            if s == "running":
+                self.stages[name] = status if status != DONE else "done"
+
+
+class _StageProgress:
+    def __init__(self, job: Job, name: str, cached: bool):
+        self.job, self.name, self.cached = job, name, cached
+
+    def __enter__(self):
+        self.job.checkpoint()
+        self.job.stages[self.name] = "running"
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.job.stages[self.name] = "cached" if self.cached else "done"
+        return False
+
+
+class WorkDir:
+    """A folder per job under `root`; folders of finished jobs older than `ttl_s` are removed."""
+
+    def __init__(self, root: str = DEFAULT_WORK_DIR, ttl_s: float = 3600):
+        self.root = os.path.abspath(root)
+        self.ttl_s = ttl_s
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, job_id: str) -> str:
+        path = os.path.join(self.root, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cleanup(self, keep=()) -> int:
+        """Remove expired job folders (except those in `keep`); returns how many."""
+        removed, now = 0, time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name in keep or not os.path.isdir(path):
+                continue
+            try:
+                if now - os.path.getmtime(path) > self.ttl_s:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class JobExecutor:
+    """
+    Bounded background executor shared by every app session: at most
+    `max_jobs` jobs run at once (the heavy pipeline work), at most
+    `max_queued` wait behind them (`submit` raises `QueueFull` beyond that).
+    Each job gets a managed work folder; finished jobs and their folders
+    expire after `ttl_s`.
+    """
+
+    def __init__(self, max_jobs: int = 2, max_queued: int = 8, work_dir: str = DEFAULT_WORK_DIR,
+                 ttl_s: float = 3600):
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.work = WorkDir(work_dir, ttl_s)
+        self.jobs = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Executor from the `app:` config section."""
+        cfg = (config or {}).get("app") or {}
+        return cls(cfg.get("max_jobs", 2), cfg.get("max_queued", 8), cfg.get("work_dir", DEFAULT_WORK_DIR),
+                   cfg.get("ttl_minutes", 60) * 60)
+
+    def create(self, name: str, stages: list) -> Job:
+        """A new queued job with its work folder (write inputs there, then `submit`)."""
+        self.cleanup()
+        with self._lock:
+            waiting = sum(job.status == QUEUED and job.future is not None for job in self.jobs.values())
+            if waiting >= self.max_queued:
+                raise QueueFull(f"{waiting} jobs are already waiting; try again shortly")
+            job = Job(name, stages, None)
+            job.work_dir = self.work.create(job.id)
+            self.jobs[job.id] = job
+        return job
+
+    def submit(self, job: Job, func, *args, **kwargs) -> Job:
+        """Run func(job, *args, **kwargs) in the background; its return value becomes `job.result`."""
+        job.future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job: Job, func, args, kwargs):
+        if job._cancel.is_set():
+            job._finish(CANCELED)
+            return
+        job.status = RUNNING
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCanceled:
+            job._finish(CANCELED)
+        except Exception as e:
+            job._finish(FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            job._finish(DONE, result)
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def running(self) -> int:
+        return sum(job.status == RUNNING for job in self.jobs.values())
+
+    def cleanup(self):
+        """Drop expired finished jobs and their folders."""
+        now = time.time()
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.status in FINISHED and now - job.finished > self.work.ttl_s:
+                    del self.jobs[job_id]
+            active = {job_id for job_id, job in self.jobs.items() if job.status not in FINISHED}
+        self.work.cleanup(keep=active)
+
+    def shutdown(self, wait: bool = True):
+        for job in list(self.jobs.values()):
+            job.cancel()
+        self._pool.shutdown(wait=wait)
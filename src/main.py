@@ -1,8 +1,18 @@
 import os
+import glob
+import json
+import time
 import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import yaml
 import pandas as pd
-from src import cleaning, validation, anomalies, visualize, reporting, predictive
+from src import cleaning, validation, anomalies, visualize, reporting, predictive, io_utils, scheduler, instrument, writers
+from src import incremental, fingerprint, profiler
+from src.sketches import RowSample
+from src.cache import WorkbookCache, StageCache, stage_key, file_digest
+from src.dates import DateExport
+from src.schema import Schema
 
 
 def load_config(config_path: str):
@@ -10,60 +20,425 @@ def load_config(config_path: str):
         return yaml.safe_load(f)
 
 
-def run_pipeline(input_file: str, output_dir: str, config_path: str):
+def _max_workers(config: dict):
+    """`scheduler.max_workers` from config (None = one worker per independent stage)."""
+    return (config.get("scheduler") or {}).get("max_workers")
+
+
+def _timing_summary(timings: dict) -> dict:
+    lines = scheduler.format_timings(timings)
+    for name, line in lines.items():
+        print(f"⏱️ {name}: {line}")
+    return {f"Stage '{name}'": line for name, line in lines.items()}
+
+
+def _profile_summary(profile: profiler.DataProfile) -> dict:
+    return {
+        "Cleaned Rows": profile.rows,
+        "Columns After Cleaning": len(profile.columns),
+        "Missing Cells After Cleaning": profile.null_cells,
+    }
+
+
+def stage_keys(input_digest: str, config: dict, n_clusters=None) -> dict:
+    """
+    Stage-cache keys for one input file. Cleaning depends on the file and the
+    cleaning settings; every later stage on the cleaning key plus its own
+    config slice, so changing e.g. `clustering:` only recomputes insights.
+    """
+    clean_key = stage_key("cleaning", input_digest, cleaning.config_slice(config))
+    return {
+        "cleaning": clean_key,
+        "validation": stage_key("validation", clean_key, validation.rules_from_config(config)),
+        "profile": stage_key("profile", clean_key),
+        "anomalies": stage_key("anomalies", clean_key, config.get("anomalies")),
+        "visuals": stage_key("visuals", clean_key),
+        "insights": stage_key("insights", clean_key, config.get("clustering"), config.get("regression"), n_clusters),
+    }
+
+
+def run_pipeline(input_file: str, output_dir: str, config_path: str = None, chunksize: int = None,
+                 config: dict = None) -> dict:
+    """Run the full pipeline on one workbook and return the report summary.
+    `config` (an already parsed config) takes precedence over `config_path`."""
     os.makedirs(output_dir, exist_ok=True)
 
     # Load config
-    config = load_config(config_path)
+    if config is None:
+        config = load_config(config_path)
+    instrument.set_context(input=input_file)
+
+    if (config.get("incremental") or {}).get("enabled"):
+        return run_pipeline_incremental(input_file, output_dir, config)
+
+    chunksize = chunksize or config.get("chunksize")
+    if chunksize:
+        return run_pipeline_chunked(input_file, output_dir, config, chunksize)
 
-    # Load data
-    df = pd.read_excel(input_file)
-    print(f"📥 Loading file: {input_file}")
-    print(f"✅ Loaded {df.shape[0]} rows and {df.shape[1]} columns")
+    # Load data (parsed workbooks are cached by content hash)
+    schema = Schema.from_config(config)
+    df = io_utils.load_excel(input_file, cache=WorkbookCache.from_config(config) or False, schema=schema)
+
+    # Stage results are cached on the input hash + the config slice each stage reads
+    stage_cache = StageCache.from_config(config)
+    keys = stage_keys(file_digest(input_file), config)
 
     # --- Cleaning ---
-    df_clean = cleaning.clean_data(df, config)
-    cleaned_file = os.path.join(output_dir, "cleaned.xlsx")
-    df_clean.to_excel(cleaned_file, index=False)
+    clean_stage = scheduler.Stage("cleaning", cleaning.clean_data, kwargs={"config": config},
+                                  cache_key=keys["cleaning"])
+    results, clean_timings = scheduler.run_stages([clean_stage], df, max_workers=1, cache=stage_cache)
+    df_clean = results["cleaning"]
+
+    # --- Export (background thread, overlapping the analysis stages) ---
+    export_job = writers.export_in_background(df_clean, output_dir, writers.output_formats(config),
+                                              dates=DateExport.from_config(config), schema=schema)
+
+    # --- Keys already seen in other files (persistent fingerprint index) ---
+    cross_file = fingerprint.cross_file_duplicates(df_clean, config, input_file)
+
+    # --- Profile, Validation, Anomalies, Visualizations, Predictive Insights ---
+    # Run concurrently on the cleaned frame; anomalies and visuals read the one-pass column profile
+    stages = [
+        scheduler.Stage("profile", profiler.profile_frame, cache_key=keys["profile"]),
+        scheduler.Stage("validation", validation.validate_data,
+                        kwargs={"rules": validation.rules_from_config(config)}, cache_key=keys["validation"]),
+        scheduler.Stage("anomalies", anomalies.detect_anomalies, deps=("profile",), kwargs={"config": config},
+                        cache_key=keys["anomalies"]),
+        scheduler.Stage("visuals", visualize.generate_visuals, deps=("profile",),
+                        kwargs={"output_dir": output_dir, "workers": visualize.chart_workers(config)},
+                        cache_key=keys["visuals"]),
+        scheduler.Stage("insights", predictive.run_predictive_models, kwargs={"config": config},
+                        cache_key=keys["insights"]),
+    ]
+    results, timings = scheduler.run_stages(stages, df_clean, max_workers=_max_workers(config), cache=stage_cache)
+    profile = results["profile"]
+    validation_issues = results["validation"]
+    anomalies_found = results["anomalies"]
+    figures = results["visuals"]
+    insights = results["insights"]
+    if timings["visuals"].get("cached"):
+        visualize.write_figures(figures, output_dir)
+    cleaned_files, timings["export"] = export_job.result()
+
+    # --- Summary for Report ---
+    summary = {
+        "Original Rows": df.shape[0],
+        "Original Columns": df.shape[1],
+        **_profile_summary(profile),
+        "Validation Issues Found": sum(len(v) for v in validation_issues.values()),
+        "Columns With Issues": len(validation_issues),
+        "Anomalies Detected": sum(len(rows) for rows in anomalies_found.values()),
+        "Output File": ", ".join(os.path.basename(p) for p in cleaned_files),
+    }
+    if cross_file is not None:
+        summary["Cross-file Duplicates"] = len(cross_file["rows"])
+    summary.update(_timing_summary({**clean_timings, **timings}))
+
+    # --- Report ---
+    report_file = os.path.join(output_dir, "report.html")
+    reporting.generate_report(validation_issues, anomalies_found, figures, summary, insights, report_file,
+                              config=config, profile=profile)
+    return summary
+
+
+def run_pipeline_chunked(input_file: str, output_dir: str, config: dict, chunksize: int):
+    """
+    Bounded-memory variant of `run_pipeline`: the workbook is streamed in chunks,
+    cleaned chunks are spooled to disk and validation, anomaly detection and the
+    Excel export walk the spool. Visuals and predictive insights run on a uniform
+    row sample (`sample_rows` in config, default 100k rows); the clustering model
+    fitted on the sample then assigns every spooled row.
+    """
+    sample = RowSample(config.get("sample_rows", 100_000))
+    profile = profiler.DataProfile()
+    original_rows, original_cols = 0, 0
+
+    def counted(chunks):
+        nonlocal original_rows, original_cols
+        for chunk in chunks:
+            original_rows += len(chunk)
+            original_cols = chunk.shape[1]
+            yield chunk
 
-    # --- Validation ---
-    validation_issues = validation.validate_data(df_clean, config.get("validation", []))
+    schema = Schema.from_config(config)
+    with io_utils.ChunkSpool() as cleaned:
+        # --- Load + Cleaning ---
+        raw_chunks = io_utils.load_excel(input_file, chunksize=chunksize,
+                                         cache=WorkbookCache.from_config(config) or False, schema=schema)
+        for chunk in cleaning.clean_chunks(counted(raw_chunks), config):
+            cleaned.append(chunk)
+            sample.update(chunk)
+            profile.update(chunk)
+        print(f"✅ Loaded {original_rows} rows and {original_cols} columns")
 
-    # --- Anomalies ---
-    anomalies_found = anomalies.detect_anomalies(df_clean)
+        # --- Export (background thread, overlapping the stages below) ---
+        export_job = writers.export_in_background(cleaned, output_dir, writers.output_formats(config),
+                                                  dates=DateExport.from_config(config), schema=schema)
+        cross_file = fingerprint.cross_file_duplicates(cleaned, config, input_file)
 
-    # --- Visualizations ---
-    figures = visualize.generate_visuals(df_clean, output_dir)  # ✅ Pass output_dir here
+        # --- Validation, Anomalies (walk the spool), Visualizations (column profile gathered while
+        # cleaning), Predictive Insights (on the row sample) ---
+        df_sample = sample.result()
+        rules = validation.rules_from_config(config)
+        stages = [
+            scheduler.Stage("validation", validation.validate_chunks,
+                            kwargs={"chunks": cleaned, "rules": rules}, takes_frame=False),
+            scheduler.Stage("anomalies", anomalies.detect_anomalies_chunks,
+                            kwargs={"chunks": cleaned, "config": config, "profile": profile}, takes_frame=False),
+            scheduler.Stage("visuals", visualize.generate_visuals,
+                            kwargs={"df": None, "output_dir": output_dir, "profile": profile,
+                                    "workers": visualize.chart_workers(config)}, takes_frame=False),
+            scheduler.Stage("insights", predictive.run_predictive_models,
+                            kwargs={"df": df_sample, "config": config, "chunks": cleaned}, takes_frame=False),
+        ]
+        results, timings = scheduler.run_stages(stages, max_workers=_max_workers(config))
+        cleaned_files, timings["export"] = export_job.result()
+        validation_issues = results["validation"]
+        anomalies_found = results["anomalies"]
+        figures = results["visuals"]
+        insights = results["insights"]
 
-        # --- Predictive Insights ---
-    insights = predictive.run_predictive_models(df_clean)
+
+    # --- Summary for Report ---
+    summary = {
+        "Original Rows": original_rows,
+        "Original Columns": original_cols,
+        **_profile_summary(profile),
+        "Validation Issues Found": sum(len(v) for v in validation_issues.values()),
+        "Columns With Issues": len(validation_issues),
+        "Anomalies Detected": sum(len(rows) for rows in anomalies_found.values()),
+        "Output File": ", ".join(os.path.basename(p) for p in cleaned_files),
+    }
+    if cross_file is not None:
+        summary["Cross-file Duplicates"] = len(cross_file["rows"])
+    summary.update(_timing_summary(timings))
+
+    # --- Report ---
+    report_file = os.path.join(output_dir, "report.html")
+    reporting.generate_report(validation_issues, anomalies_found, figures, summary, insights, report_file,
+                              config=config, profile=profile)
+    return summary
+
+
+def run_pipeline_incremental(input_file: str, output_dir: str, config: dict):
+    """
+    `run_pipeline` for workbooks that grow by appended rows. Row fingerprints
+    tell which rows are new since the last run; only those are cleaned and
+    validated, and fill values, anomaly detectors and uniqueness counts are
+    merged into the state saved by the previous run (see `incremental.IncrementalState`).
+    Visuals and insights run on the full cleaned frame as usual.
+    """
+    schema = Schema.from_config(config)
+    df = io_utils.load_excel(input_file, cache=WorkbookCache.from_config(config) or False, schema=schema)
+    state = incremental.IncrementalState.load(input_file, config)
+
+    # --- Cleaning, Validation, Anomalies (new rows only) ---
+    timings = {}
+    df_clean, timings["cleaning"] = scheduler.measure(incremental.clean_increment, df, config, state)
+    export_job = writers.export_in_background(df_clean, output_dir, writers.output_formats(config),
+                                              dates=DateExport.from_config(config), schema=schema)
+    validation_issues, timings["validation"] = scheduler.measure(
+        incremental.validate_increment, df_clean, validation.rules_from_config(config), state)
+    anomalies_found, timings["anomalies"] = scheduler.measure(incremental.detect_increment, df_clean, config, state)
+    state.save()
+    cross_file = fingerprint.cross_file_duplicates(df_clean, config, input_file)
+
+    # --- Visualizations, Predictive Insights (full cleaned frame) ---
+    stage_cache = StageCache.from_config(config)
+    keys = stage_keys(file_digest(input_file), config)
+    stages = [
+        scheduler.Stage("profile", profiler.profile_frame, cache_key=keys["profile"]),
+        scheduler.Stage("visuals", visualize.generate_visuals, deps=("profile",),
+                        kwargs={"output_dir": output_dir, "workers": visualize.chart_workers(config)},
+                        cache_key=keys["visuals"]),
+        scheduler.Stage("insights", predictive.run_predictive_models, kwargs={"config": config},
+                        cache_key=keys["insights"]),
+    ]
+    results, stage_timings = scheduler.run_stages(stages, df_clean, max_workers=_max_workers(config),
+                                                  cache=stage_cache)
+    timings.update(stage_timings)
+    profile = results["profile"]
+    figures = results["visuals"]
+    insights = results["insights"]
+    if timings["visuals"].get("cached"):
+        visualize.write_figures(figures, output_dir)
+    cleaned_files, timings["export"] = export_job.result()
 
     # --- Summary for Report ---
     summary = {
         "Original Rows": df.shape[0],
         "Original Columns": df.shape[1],
-        "Cleaned Rows": df_clean.shape[0],
-        "Columns After Cleaning": df_clean.shape[1],
+        "Appended Rows": state.new_rows,
+        **_profile_summary(profile),
         "Validation Issues Found": sum(len(v) for v in validation_issues.values()),
         "Columns With Issues": len(validation_issues),
-        "Anomalies Detected": len(anomalies_found),
-        "Output File": os.path.basename(cleaned_file),
+        "Anomalies Detected": sum(len(rows) for rows in anomalies_found.values()),
+        "Output File": ", ".join(os.path.basename(p) for p in cleaned_files),
     }
+    if cross_file is not None:
+        summary["Cross-file Duplicates"] = len(cross_file["rows"])
+    summary.update(_timing_summary(timings))
 
     # --- Report ---
     report_file = os.path.join(output_dir, "report.html")
-    reporting.generate_report(validation_issues, anomalies_found, figures, summary, insights, report_file)
+    reporting.generate_report(validation_issues, anomalies_found, figures, summary, insights, report_file,
+                              config=config, profile=profile)
+    return summary
+
+
+# ---------- Batch mode ----------
 
+EXCEL_PATTERNS = ("*.xlsx", "*.xls")
+
+
+def expand_inputs(inputs: list) -> list:
+    """Files, directories (their *.xlsx / *.xls files) and glob patterns -> sorted unique workbook paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in EXCEL_PATTERNS:
+                paths.extend(glob.glob(os.path.join(item, pattern)))
+        elif glob.has_magic(item):
+            paths.extend(glob.glob(item, recursive=True))
+        else:
+            paths.append(item)
+    # skip Excel's "~$name.xlsx" lock files
+    paths = [p for p in paths if not os.path.basename(p).startswith("~$")]
+    return sorted(set(os.path.normpath(p) for p in paths))
+
+
+def _batch_output_dirs(paths: list, output_dir: str) -> dict:
+    """One output folder per workbook, named after the file (suffixed on name clashes)."""
+    dirs, used = {}, set()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        candidate, n = name, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{name}_{n}"
+        used.add(candidate)
+        dirs[path] = os.path.join(output_dir, candidate)
+    return dirs
+
+
+def _batch_job(input_file: str, output_dir: str, config: dict, chunksize: int = None) -> dict:
+    """Run one workbook; failures are caught and reported in the returned entry."""
+    entry = {"input": input_file, "output_dir": output_dir}
+    start = time.perf_counter()
+    try:
+        summary = run_pipeline(input_file, output_dir, chunksize=chunksize, config=config)
+        outputs = {
+            "cleaned": [os.path.join(output_dir, name) for name in summary["Output File"].split(", ")],
+            "report_html": os.path.join(output_dir, "report.html"),
+            "report_pdf": os.path.join(output_dir, "report.pdf"),
+        }
+        entry.update(status="ok", summary=summary,
+                     outputs={k: p for k, p in outputs.items() if not isinstance(p, str) or os.path.exists(p)})
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    entry["wall_s"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def run_batch(inputs: list, output_dir: str, config_path: str, workers: int = None,
+              chunksize: int = None, config: dict = None) -> dict:
+    """
+    Run the pipeline over many workbooks (files, directories or globs). The config
+    is parsed once and workbooks are spread over `workers` processes (default: CPU
+    count); with several workers each file's stages run in its own process
+    (`scheduler.max_workers` = 1) so the machine isn't oversubscribed.
+    A failing workbook is recorded and the batch continues. Writes and returns
+    `run_index.json` in `output_dir`: per-file status, summary, timings and outputs.
+    """
+    if config is None:
+        config = load_config(config_path)
+    paths = expand_inputs(inputs)
+    if not paths:
+        raise FileNotFoundError(f"No Excel workbooks matched {inputs}")
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        config = {**config, "scheduler": {**(config.get("scheduler") or {}), "max_workers": 1}}
+    out_dirs = _batch_output_dirs(paths, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📦 Batch: {len(paths)} workbooks on {workers} worker(s)")
+
+    started = time.time()
+    entries = {}
+    if workers <= 1:
+        for path in paths:
+            entries[path] = _batch_job(path, out_dirs[path], config, chunksize)
+            _log_batch_entry(entries[path])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_batch_job, path, out_dirs[path], config, chunksize): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    entries[path] = future.result()
+                except Exception as e:  # e.g. the worker process died
+                    entries[path] = {"input": path, "output_dir": out_dirs[path], "status": "failed",
+                                     "error": f"{type(e).__name__}: {e}"}
+                _log_batch_entry(entries[path])
+
+    files = [entries[path] for path in paths]
+    index = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "wall_s": round(time.time() - started, 3),
+        "config": os.path.abspath(config_path),
+        "workers": workers,
+        "succeeded": sum(f["status"] == "ok" for f in files),
+        "failed": sum(f["status"] != "ok" for f in files),
+        "files": files,
+    }
+    index_path = os.path.join(output_dir, "run_index.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, default=str)
+    print(f"✅ Batch done: {index['succeeded']} succeeded, {index['failed']} failed · index saved to {index_path}")
+    return index
+
+
+def _log_batch_entry(entry: dict):
+    if entry["status"] == "ok":
+        print(f"✅ {entry['input']} -> {entry['output_dir']} ({entry['wall_s']:.1f}s)")
+    else:
+        print(f"❌ {entry['input']} failed: {entry['error']}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Excel Data Cleaner Bot")
-    parser.add_argument("--input", required=True, help="Path to input Excel file")
+    parser.add_argument("--input", required=True, nargs="+",
+                        help="Input Excel file(s); directories and glob patterns run in batch mode")
     parser.add_argument("--outdir", default="outputs", help="Output directory")
     parser.add_argument("--config", default="config/config.yaml", help="Path to config.yaml")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the workbook in chunks of this many rows (bounded memory)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Batch mode: number of workbooks processed in parallel (default: CPU count)")
+    parser.add_argument("--format", nargs="+", choices=list(writers.WRITERS), default=None,
+                        help="Cleaned data output format(s), overriding output.formats in config")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process rows appended since the last run of the same workbook")
+    parser.add_argument("--metrics", default=None,
+                        help="Append per-stage metrics (JSON lines) to this file")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="Write a cProfile dump per stage call into DIR")
+    parser.add_argument("--trace-memory", action="store_true", default=None,
+                        help="Record per-stage allocation peaks with tracemalloc (slower)")
 
     args = parser.parse_args()
-    run_pipeline(args.input, args.outdir, args.config)
+    config = load_config(args.config)
+    if args.format:
+        config["output"] = {**(config.get("output") or {}), "formats": args.format}
+    if args.incremental:
+        config["incremental"] = {**(config.get("incremental") or {}), "enabled": True}
+    instrument.configure_from(config, args.metrics, args.profile, args.trace_memory)
+
+    single = len(args.input) == 1 and os.path.isfile(args.input[0])
+    if single and args.workers is None:
+        run_pipeline(args.input[0], args.outdir, chunksize=args.chunksize, config=config)
+    else:
+        run_batch(args.input, args.outdir, args.config, workers=args.workers, chunksize=args.chunksize,
+                  config=config)
 
 
 if __name__ == "__main__":
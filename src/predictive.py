@@ -1,77 +1,171 @@
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
 import base64
 import io
+from src import regression
+from src.instrument import instrumented
+
+# scikit-learn and matplotlib are imported inside the functions that use them,
+# so importing this module (e.g. via src.main) stays cheap
+
+CLUSTER_SAMPLE = 50_000    # rows KMeans is fitted on in "sample" mode
+PREDICT_CHUNK = 100_000    # rows assigned to clusters per predict call
+SILHOUETTE_SAMPLE = 5_000  # rows scored when choosing k automatically
+PLOT_POINTS = 5_000        # points drawn in the scatter plot
+CLUSTER_METHODS = ("sample", "minibatch")
 
 def _fig_to_base64():
     """Helper: Convert matplotlib figure to base64 string."""
+    import matplotlib.pyplot as plt
     buf = io.BytesIO()
     plt.savefig(buf, format="png", bbox_inches="tight")
     plt.close()
     buf.seek(0)
     return base64.b64encode(buf.read()).decode("utf-8")
 
-def run_predictive_models(df: pd.DataFrame) -> dict:
-    insights = {}
 
-    # --- Example 1: Salary prediction ---
-    if "Experience" in df.columns and "Salary" in df.columns:
-        valid = df.dropna(subset=["Experience", "Salary"])
-        if not valid.empty:
-            X = valid[["Experience"]]
-            y = valid["Salary"]
-
-            model = LinearRegression()
-            model.fit(X, y)
-            coef = model.coef_[0]
-            intercept = model.intercept_
-
-            formula = f"Salary = {coef:.2f} * Experience + {intercept:.2f}"
-            interpretation = (
-                f"Each additional year of experience increases salary by ≈ {coef:.2f} units. "
-                f"Base salary starts around {intercept:.2f} when experience is zero."
-            )
-
-            insights["salary_prediction"] = {
-                "formula": formula,
-                "interpretation": interpretation
-            }
-
-    # --- Example 2: Clustering ---
+# ---------- Clustering ----------
+
+def _clustering_settings(config: dict, n_clusters) -> dict:
+    """Settings from the `clustering:` config section; an explicit `n_clusters` wins."""
+    cfg = dict((config or {}).get("clustering") or {})
+    if n_clusters is not None:
+        cfg["n_clusters"] = n_clusters
+    cfg.setdefault("n_clusters", 3)
+    cfg.setdefault("method", "sample")
+    if cfg["method"] not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown clustering method '{cfg['method']}', expected one of {list(CLUSTER_METHODS)}")
+    return cfg
+
+
+def _sample_rows(X: np.ndarray, size: int, seed: int = 42) -> np.ndarray:
+    if len(X) <= size:
+        return X
+    rng = np.random.default_rng(seed)
+    return X[np.sort(rng.choice(len(X), size, replace=False))]
+
+
+def choose_k(X: np.ndarray, k_range=(2, 8), sample_size: int = SILHOUETTE_SAMPLE) -> int:
+    """Pick the k in `k_range` (inclusive) with the best silhouette score on a sample."""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    sample = _sample_rows(X, sample_size)
+    best_k, best_score = k_range[0], -1.0
+    for k in range(k_range[0], min(k_range[1], len(sample) - 1) + 1):
+        labels = KMeans(n_clusters=k, n_init="auto", random_state=42).fit_predict(sample)
+        if len(set(labels)) < 2:
+            continue
+        score = silhouette_score(sample, labels)
+        if score > best_score:
+            best_k, best_score = k, score
+    print(f"🔢 Selected k={best_k} (silhouette {best_score:.3f})")
+    return best_k
+
+
+def fit_clusters(X: np.ndarray, n_clusters: int = 3, method: str = "sample",
+                 sample_size: int = CLUSTER_SAMPLE, batch_size: int = 4096):
+    """
+    Fit KMeans without touching every row at once:
+      sample:    full KMeans on a uniform sample of at most `sample_size` rows
+                 (the whole data when it is smaller, i.e. plain KMeans)
+      minibatch: MiniBatchKMeans over all rows in batches of `batch_size`
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    if method == "minibatch":
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init="auto", random_state=42)
+        return model.fit(X)
+    model = KMeans(n_clusters=n_clusters, n_init="auto", random_state=42)
+    return model.fit(_sample_rows(X, sample_size))
+
+
+def predict_chunks(model, chunks, columns: list) -> np.ndarray:
+    """Cluster sizes for every complete row of an iterable of frames or arrays, `PREDICT_CHUNK` rows at a time."""
+    sizes = np.zeros(model.n_clusters, dtype=np.int64)
+    for chunk in chunks:
+        if isinstance(chunk, pd.DataFrame):
+            chunk = chunk[columns].dropna().to_numpy(dtype=float)
+        for start in range(0, len(chunk), PREDICT_CHUNK):
+            labels = model.predict(chunk[start:start + PREDICT_CHUNK])
+            sizes += np.bincount(labels, minlength=model.n_clusters)
+    return sizes
+
+
+def _cluster_plot(X: np.ndarray, model, columns: list, max_points: int = PLOT_POINTS) -> str:
+    import matplotlib.pyplot as plt
+    points = _sample_rows(X, max_points)
+    labels = model.predict(points)
+
+    plt.figure(figsize=(6, 5))
+    plt.scatter(
+        points[:, 0], points[:, 1],
+        c=labels, cmap="viridis", marker="o", alpha=0.7
+    )
+    plt.scatter(
+        model.cluster_centers_[:, 0], model.cluster_centers_[:, 1],
+        c="red", marker="x", s=200, linewidths=3, label="Centroids"
+    )
+    plt.xlabel(columns[0])
+    plt.ylabel(columns[1])
+    title = "KMeans Clustering (first 2 numeric features)"
+    if len(X) > max_points:
+        title += f"\n{len(points):,} of {len(X):,} points shown"
+    plt.title(title)
+    plt.legend()
+    return _fig_to_base64()
+
+
+def run_clustering(df: pd.DataFrame, n_clusters=None, config: dict = None, chunks=None):
+    """
+    Cluster the complete numeric rows of `df`. `n_clusters` may be an int or
+    "auto" (silhouette search over `clustering.k_range`). When `chunks` is given
+    (e.g. the spool of a chunked run, with `df` a sample of it) the model fitted
+    on `df` assigns every row of the chunks instead.
+    """
     numeric_df = df.select_dtypes(include="number").dropna()
-    if numeric_df.shape[1] >= 2:
-        kmeans = KMeans(n_clusters=3, n_init="auto", random_state=42)
-        clusters = kmeans.fit_predict(numeric_df)
-
-        cluster_info = f"Identified {len(set(clusters))} clusters in the dataset"
-        interpretation = (
-            "These clusters represent groups of employees/customers with similar numeric patterns. "
-            "For example, they may indicate low, medium, and high salary ranges or other natural groupings."
-        )
-
-        # --- Visualization ---
-        plt.figure(figsize=(6, 5))
-        plt.scatter(
-            numeric_df.iloc[:, 0], numeric_df.iloc[:, 1],
-            c=clusters, cmap="viridis", marker="o", alpha=0.7
-        )
-        plt.scatter(
-            kmeans.cluster_centers_[:, 0], kmeans.cluster_centers_[:, 1],
-            c="red", marker="x", s=200, linewidths=3, label="Centroids"
-        )
-        plt.xlabel(numeric_df.columns[0])
-        plt.ylabel(numeric_df.columns[1])
-        plt.title("KMeans Clustering (first 2 numeric features)")
-        plt.legend()
-
-        cluster_img = _fig_to_base64()
-
-        insights["clustering"] = {
-            "summary": cluster_info,
-            "interpretation": interpretation,
-            "image": cluster_img
-        }
+    if numeric_df.shape[1] < 2 or len(numeric_df) < 2:
+        return None
+    settings = _clustering_settings(config, n_clusters)
+    columns = list(numeric_df.columns)
+    X = numeric_df.to_numpy(dtype=float)
+
+    k = settings["n_clusters"]
+    if k == "auto":
+        k = choose_k(X, tuple(settings.get("k_range", (2, 8))))
+    k = min(int(k), len(X))
+    model = fit_clusters(X, k, settings["method"], settings.get("sample_size", CLUSTER_SAMPLE),
+                         settings.get("batch_size", 4096))
+    sizes = predict_chunks(model, chunks if chunks is not None else [X], columns)
+
+    cluster_info = (f"Identified {int((sizes > 0).sum())} clusters in the dataset "
+                    f"(sizes: {', '.join(f'{s:,}' for s in sizes)})")
+    interpretation = (
+        "These clusters represent groups of employees/customers with similar numeric patterns. "
+        "For example, they may indicate low, medium, and high salary ranges or other natural groupings."
+    )
+    return {
+        "summary": cluster_info,
+        "interpretation": interpretation,
+        "image": _cluster_plot(X, model, columns),
+        "n_clusters": k,
+        "sizes": sizes.tolist(),
+    }
+
+
+@instrumented("insights")
+def run_predictive_models(df: pd.DataFrame, n_clusters=None, config: dict = None, chunks=None) -> dict:
+    """
+    Regression insights (`regression.run_regressions`, configured under `regression:`)
+    and KMeans clustering (see `run_clustering` for the arguments). With `chunks`,
+    regressions stream every chunk; `df` is then a sample used for clustering.
+    """
+    insights = {}
+
+    # --- Regressions (one pass of accumulated normal equations) ---
+    insights.update(regression.run_regressions(df, config, chunks))
+
+    # --- Clustering ---
+    clustering = run_clustering(df, n_clusters, config, chunks)
+    if clustering:
+        insights["clustering"] = clustering
 
     return insights
@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+from src.sketches import Moments, QuantileSketch, HyperLogLog, TopK
+from src.instrument import instrumented
+
+TOP_K = 1000               # distinct values tracked per text column
+MAX_SEGMENTS = 200         # null counts are kept per row segment for the missing-values heatmap
+
+
+def _kind(series: pd.Series) -> str:
+    kind = series.dtype.kind
+    if kind in "iuf":
+        return "numeric"
+    if kind == "M":
+        return "datetime"
+    if kind == "O" or isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return "text"
+    return "other"
+
+
+def _values(series: pd.Series) -> np.ndarray:
+    if series.dtype.kind not in "iuf":
+        series = pd.to_numeric(series, errors="coerce")
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+def _hashes(series: pd.Series, kind: str) -> np.ndarray:
+    series = series.dropna()
+    if kind == "numeric":
+        series = series.astype("float64")  # int and float chunks of a column hash alike
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+class ColumnProfile:
+    """Mergeable statistics of one column; which ones depends on its kind."""
+
+    def __init__(self, name, kind: str):
+        self.name = name
+        self.kind = kind
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.moments = Moments() if kind == "numeric" else None
+        self.sketch = QuantileSketch() if kind == "numeric" else None
+        self.top = TopK(TOP_K) if kind == "text" else None
+
+    def update(self, series: pd.Series):
+        na = series.isna().to_numpy()
+        self.rows += len(series)
+        self.nulls += int(na.sum())
+        if self.kind == "numeric":
+            values = _values(series)
+            self.moments.update(values)
+            self.sketch.update(values)
+            values = values[~np.isnan(values)]
+            if len(values):
+                self._bounds(values.min(), values.max())
+        elif self.kind == "datetime" and not na.all():
+            self._bounds(series.min(), series.max())
+        if self.kind == "text":
+            self.top.update(series)
+        self.distinct.update(_hashes(series, self.kind))
+
+    def _bounds(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other: "ColumnProfile"):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        if other.min is not None:
+            self._bounds(other.min, other.max)
+        self.distinct.merge(other.distinct)
+        for part in ("moments", "sketch", "top"):
+            if getattr(self, part) is not None:
+                getattr(self, part).merge(getattr(other, part))
+
+    @property
+    def count(self) -> int:
+        return self.rows - self.nulls
+
+    @property
+    def distinct_count(self) -> int:
+        """Exact while the top-k summary never overflowed, else the HyperLogLog estimate."""
+        if self.top is not None and self.top.exact:
+            return len(self.top.counts)
+        return int(round(self.distinct.estimate())) if self.count else 0
+
+    def quantiles(self, qs) -> np.ndarray:
+        return self.sketch.quantiles(qs)
+
+    def summary(self) -> dict:
+        """One row of the report's column table."""
+        row = {"Column": self.name, "Type": self.kind, "Missing": self.nulls,
+               "Distinct": self.distinct_count if self.top is not None and self.top.exact
+               else f"≈{self.distinct_count}"}
+        if self.kind == "numeric" and self.count:
+            median = self.quantiles([0.5])[0]
+            row.update({"Mean": f"{self.moments.mean:.4g}", "Std": f"{self.moments.std:.4g}",
+                        "Min": f"{self.min:.4g}", "Median": f"{median:.4g}", "Max": f"{self.max:.4g}"})
+        elif self.kind == "datetime" and self.min is not None:
+            row.update({"Min": str(self.min.date()), "Max": str(self.max.date())})
+        elif self.kind == "text" and len(self.top.counts):
+            top = self.top.top(1)
+            row["Top"] = f"{top.index[0]} ({int(top.iloc[0])})"
+        return row
+
+
+class Comoments:
+    """
+    Pairwise-complete co-moments of the numeric columns, summed chunk by chunk:
+    for every pair, the rows where both are present, their sums, sums of
+    squares and cross products (around a fixed shift for accuracy). Gives
+    the same matrix as `DataFrame.corr()`, and partitions merge by addition.
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.s = np.zeros((k, k))   # s[i, j]: sum of x_i over rows where i and j are present
+        self.q = np.zeros((k, k))   # q[i, j]: sum of x_i ** 2 over the same rows
+        self.p = np.zeros((k, k))   # p[i, j]: sum of x_i * x_j
+
+    def update(self, values: np.ndarray):
+        """`values`: rows x columns float64 matrix, NaN = missing."""
+        present = ~np.isnan(values)
+        if self.shift is None:
+            counts = present.sum(axis=0)
+            self.shift = np.where(counts, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        x = np.where(present, values - self.shift, 0.0)
+        m = present.astype(float)
+        self.n += m.T @ m
+        self.s += x.T @ m
+        self.q += (x * x).T @ m
+        self.p += x.T @ x
+
+    def aligned(self, columns: list) -> "Comoments":
+        """The same sums laid out for `columns` (a superset); columns new to it have no rows yet."""
+        columns = list(columns)
+        if columns == self.columns:
+            return self
+        out = Comoments(columns)
+        at = np.ix_(*[[columns.index(c) for c in self.columns]] * 2)
+        for part in ("n", "s", "q", "p"):
+            getattr(out, part)[at] = getattr(self, part)
+        if self.shift is not None:
+            out.shift = np.zeros(len(columns))
+            out.shift[at[0].ravel()] = self.shift
+        return out
+
+    def merge(self, other: "Comoments"):
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        d = other.shift - self.shift  # re-centre the other side's sums on our shift
+        s = other.s + d[:, None] * other.n
+        self.q += other.q + 2 * d[:, None] * other.s + (d * d)[:, None] * other.n
+        self.p += other.p + other.s * d[None, :] + (other.s * d[None, :]).T + other.n * np.outer(d, d)
+        self.s += s
+        self.n += other.n
+
+    def corr(self) -> pd.DataFrame:
+        n, s, q, p = self.n, self.s, self.q, self.p
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = n * p - s * s.T
+            var = (n * q - s * s) * (n * q - s * s).T
+            corr = cov / np.sqrt(var)
+        corr[(n < 2) | ~(var > 0)] = np.nan
+        corr = np.clip(corr, -1, 1)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class DataProfile:
+    """
+    Column statistics gathered in one pass over a frame or a stream of chunks:
+    null counts, moments, min/max, quantile sketches, approximate distinct
+    counts, top-k values, a pairwise correlation matrix and per-segment null
+    counts for the missing-values heatmap. Every part is mergeable, so
+    profiles of chunks or partitions combine. Visuals, anomaly detection,
+    the run summary and the report all read this instead of the rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+        self.comoments = None
+        self.segment_rows = []
+        self.segment_nulls = []
+
+    def update(self, chunk: pd.DataFrame):
+        if not self.columns:
+            self.columns = {col: ColumnProfile(col, _kind(chunk[col])) for col in chunk.columns}
+            self.comoments = Comoments(self.numeric_columns)
+        for col, profile in self.columns.items():
+            if col in chunk.columns:
+                profile.update(chunk[col])
+        if self.numeric_columns and len(chunk):
+            matrix = np.column_stack([_values(chunk[c]) for c in self.numeric_columns])
+            self.comoments.update(matrix)
+        self._update_segments(chunk)
+        self.rows += len(chunk)
+
+    def _update_segments(self, chunk: pd.DataFrame):
+        if not len(chunk):
+            return
+        na = np.column_stack([chunk[c].isna().to_numpy() if c in chunk.columns else np.ones(len(chunk), bool)
+                              for c in self.columns])
+        size = -(-len(chunk) // MAX_SEGMENTS)
+        starts = np.arange(0, len(chunk), size)
+        self.segment_rows.extend(np.diff(np.append(starts, len(chunk))))
+        self.segment_nulls.extend(np.add.reduceat(na, starts, axis=0))
+        if len(self.segment_rows) > 4 * MAX_SEGMENTS:  # many chunks: halve the resolution
+            rows, nulls = np.asarray(self.segment_rows), np.asarray(self.segment_nulls)
+            pairs = np.arange(0, len(rows), 2)
+            self.segment_rows = list(np.add.reduceat(rows, pairs))
+            self.segment_nulls = list(np.add.reduceat(nulls, pairs, axis=0))
+
+    def merge(self, other: "DataProfile"):
+        """
+        Append the profile of the rows that follow this one's. A column only
+        one side has counts as missing in the other side's rows, as in
+        `pd.concat`; a column of a different kind on each side is an error.
+        """
+        if not other.columns:
+            return
+        if not self.columns:
+            self.columns = other.columns
+            self.comoments = other.comoments
+            self.segment_nulls += other.segment_nulls
+        else:
+            for col, profile in other.columns.items():
+                if col in self.columns and self.columns[col].kind != profile.kind:
+                    raise ValueError(f"Cannot merge profiles: column '{col}' is {self.columns[col].kind} "
+                                     f"in one and {profile.kind} in the other")
+            columns = list(self.columns) + [col for col in other.columns if col not in self.columns]
+            self.segment_nulls = self._segments(columns) + other._segments(columns)
+            for col in columns:
+                if col not in self.columns:
+                    self.columns[col] = ColumnProfile(col, other.columns[col].kind)
+                    self.columns[col].rows = self.columns[col].nulls = self.rows
+                if col in other.columns:
+                    self.columns[col].merge(other.columns[col])
+                else:
+                    self.columns[col].rows += other.rows
+                    self.columns[col].nulls += other.rows
+            self.comoments = self.comoments.aligned(self.numeric_columns)
+            self.comoments.merge(other.comoments.aligned(self.numeric_columns))
+        self.rows += other.rows
+        self.segment_rows += other.segment_rows
+
+    def _segments(self, columns: list) -> list:
+        """Per-segment null counts laid out for `columns`; columns this profile lacks are all missing."""
+        at = {col: i for i, col in enumerate(self.columns)}
+        return [np.array([nulls[at[c]] if c in at else rows for c in columns])
+                for rows, nulls in zip(self.segment_rows, self.segment_nulls)]
+
+    def __getitem__(self, col) -> ColumnProfile:
+        return self.columns[col]
+
+    def _of_kind(self, kind: str) -> list:
+        return [col for col, p in self.columns.items() if p.kind == kind]
+
+    @property
+    def numeric_columns(self) -> list:
+        return self._of_kind("numeric")
+
+    @property
+    def text_columns(self) -> list:
+        return self._of_kind("text")
+
+    @property
+    def null_cells(self) -> int:
+        return sum(p.nulls for p in self.columns.values())
+
+    def corr(self) -> pd.DataFrame:
+        return self.comoments.corr()
+
+    def missing_matrix(self, max_rows: int = MAX_SEGMENTS) -> tuple:
+        """(share of missing cells per column in at most `max_rows` row bins, number of bins)."""
+        rows = np.asarray(self.segment_rows, dtype=float)
+        nulls = np.asarray(self.segment_nulls, dtype=float).reshape(len(rows), len(self.columns))
+        bins = min(len(rows), max_rows)
+        starts = np.cumsum(rows) - rows
+        bin_of = (starts * bins // max(self.rows, 1)).astype(int)
+        sizes = np.bincount(bin_of, weights=rows, minlength=bins)
+        matrix = np.stack([np.bincount(bin_of, weights=nulls[:, j], minlength=bins)
+                           for j in range(len(self.columns))], axis=1)
+        keep = sizes > 0
+        return matrix[keep] / sizes[keep, None], int(keep.sum())
+
+    def table(self) -> list:
+        """Per-column summary rows for the report."""
+        return [p.summary() for p in self.columns.values()]
+
+
+@instrumented("profile")
+def profile_frame(df: pd.DataFrame) -> DataProfile:
+    """Profile a cleaned frame in one pass."""
+    profile = DataProfile()
+    profile.update(df)
+    print(f"🧮 Profiled {len(profile.columns)} columns over {profile.rows} rows")
+    return profile
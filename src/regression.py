@@ -0,0 +1,217 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+OUTLIER_THRESHOLD = 3.0    # residuals beyond this many residual standard errors are outliers
+EXAMPLE_ROWS = 10          # outlier row labels quoted in the insight
+
+# Used when the config has no `regression:` section and the columns exist
+DEFAULT_MODELS = [{"targets": ["Salary"], "features": ["Experience"]}]
+
+
+def _values(series: pd.Series) -> np.ndarray:
+    if series.dtype.kind not in "iuf":
+        series = pd.to_numeric(series, errors="coerce")
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+class NormalEquations:
+    """
+    Sufficient statistics of an ordinary least squares fit of `target` on
+    `features` (plus an intercept): XᵀX, Xᵀy, yᵀy and n over the rows where
+    all of them are present. Accumulated chunk by chunk (only the chunk's
+    rows are ever in memory) and mergeable across partitions, so one
+    streaming pass gives coefficients and R² without the design matrix.
+
+    Values are centred on a fixed shift (the first chunk's means) to keep the
+    sums well conditioned; `merge` re-centres the other side's statistics.
+    """
+
+    def __init__(self, target, features: list):
+        self.target = target
+        self.features = list(features)
+        k = len(self.features) + 1
+        self.n = 0
+        self.shift = None           # feature shifts; the target's is y_shift
+        self.y_shift = 0.0
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+
+    def update(self, chunk: pd.DataFrame):
+        if any(c not in chunk.columns for c in self.features + [self.target]):
+            return
+        X = np.column_stack([_values(chunk[c]) for c in self.features]) if self.features \
+            else np.empty((len(chunk), 0))
+        y = _values(chunk[self.target])
+        keep = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        X, y = X[keep], y[keep]
+        if not len(y):
+            return
+        if self.shift is None:
+            self.shift, self.y_shift = X.mean(axis=0), float(y.mean())
+        X = np.column_stack([np.ones(len(y)), X - self.shift])
+        y = y - self.y_shift
+        self.n += len(y)
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.yty += float(y @ y)
+
+    def merge(self, other: "NormalEquations"):
+        if not other.n:
+            return
+        if not self.n:
+            self.__dict__.update({k: np.copy(v) if isinstance(v, np.ndarray) else v
+                                  for k, v in other.__dict__.items()})
+            return
+        # other's rows are [1, x - a]; ours are [1, x - b] = [1, x - a] @ A with A = [[1, a - b], [0, I]]
+        A = np.eye(len(self.xty))
+        A[0, 1:] = other.shift - self.shift
+        e = self.y_shift - other.y_shift  # y - b_y = (y - a_y) - e
+        xty = A.T @ (other.xty - e * other.xtx[:, 0])
+        sum_y = other.xty[0]
+        self.xtx += A.T @ other.xtx @ A
+        self.xty += xty
+        self.yty += other.yty - 2 * e * sum_y + e * e * other.n
+        self.n += other.n
+
+    def solve(self) -> dict:
+        """{coefficients: {feature: b}, intercept, r2, rmse, n} or None with too few rows."""
+        k = len(self.xty)
+        if self.n <= k:
+            return None
+        beta = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        sse = max(self.yty - 2 * beta @ self.xty + beta @ self.xtx @ beta, 0.0)
+        sst = self.yty - self.xty[0] ** 2 / self.n
+        coefficients = dict(zip(self.features, map(float, beta[1:])))
+        intercept = beta[0] + self.y_shift - float(np.dot(beta[1:], self.shift))
+        return {
+            "coefficients": coefficients,
+            "intercept": float(intercept),
+            "r2": float(1 - sse / sst) if sst > 0 else float("nan"),
+            "rmse": float(np.sqrt(sse / (self.n - k))),
+            "n": self.n,
+        }
+
+
+def residual_outliers(chunks, fits: list, threshold: float = OUTLIER_THRESHOLD) -> list:
+    """
+    Second pass: for each (target, fit), the row labels whose |residual|
+    exceeds `threshold` residual standard errors. All fits share the pass.
+    """
+    rows = [[] for _ in fits]
+    for chunk in chunks:
+        for out, (target, fit) in zip(rows, fits):
+            features = list(fit["coefficients"])
+            X = np.column_stack([_values(chunk[c]) for c in features]) if features else np.empty((len(chunk), 0))
+            coefs = np.array([fit["coefficients"][c] for c in features])
+            with np.errstate(invalid="ignore"):
+                residuals = _values(chunk[target]) - (X @ coefs + fit["intercept"])
+                out.append(chunk.index.to_numpy()[np.abs(residuals) > threshold * fit["rmse"]])
+    return [np.concatenate(r) if r else np.empty(0) for r in rows]
+
+
+def model_specs(config: dict, columns) -> list:
+    """
+    (target, features) pairs from `regression.models` (each with `targets` and
+    `features`, as lists or single names); several targets share one feature
+    set. Without configured models, Experience -> Salary when present.
+    """
+    cfg = (config or {}).get("regression") or {}
+    configured = bool(cfg.get("models"))
+    models = cfg.get("models") if configured else DEFAULT_MODELS
+    specs = []
+    for model in models:
+        targets, features = model.get("targets") or model.get("target"), model.get("features")
+        targets = [targets] if isinstance(targets, str) else list(targets or [])
+        features = [features] if isinstance(features, str) else list(features or [])
+        missing = [c for c in targets + features if c not in columns]
+        if missing:
+            if configured:
+                print(f"⚠️ Skipping regression of {targets} on {features}: columns {missing} not found")
+            continue
+        specs.extend((target, features) for target in targets)
+    return specs
+
+
+def accumulate(chunks, specs: list) -> list:
+    """One pass over `chunks`: a `NormalEquations` per (target, features) spec."""
+    stats = [NormalEquations(target, features) for target, features in specs]
+    for chunk in chunks:
+        for s in stats:
+            s.update(chunk)
+    return stats
+
+
+def _accumulate_files(paths: list, specs: list) -> list:
+    return accumulate((pd.read_pickle(p) for p in paths), specs)
+
+
+def accumulate_parallel(paths: list, specs: list, workers: int) -> list:
+    """`accumulate` over pickled chunk files (a `ChunkSpool`), split across worker processes and merged."""
+    groups = [paths[i::workers] for i in range(workers) if paths[i::workers]]
+    with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+        parts = list(pool.map(_accumulate_files, groups, [specs] * len(groups)))
+    stats = parts[0]
+    for part in parts[1:]:
+        for merged, s in zip(stats, part):
+            merged.merge(s)
+    return stats
+
+
+def _insight_key(target) -> str:
+    return re.sub(r"\W+", "_", str(target)).strip("_").lower() + "_prediction"
+
+
+def _insight(target, fit: dict, outliers: np.ndarray, threshold: float) -> dict:
+    formula = f"{target} ="
+    for i, (term, value) in enumerate([*((f" * {f}", b) for f, b in fit["coefficients"].items()),
+                                       ("", fit["intercept"])]):
+        sign = ("-" if value < 0 else "") if i == 0 else (" -" if value < 0 else " +")
+        formula += f"{sign} {abs(value):.2f}{term}"
+    if len(fit["coefficients"]) == 1:
+        (feature, b), = fit["coefficients"].items()
+        interpretation = (f"Each additional unit of {feature} changes {target} by ≈ {b:.2f}. "
+                          f"{target} starts around {fit['intercept']:.2f} when {feature} is zero. ")
+    else:
+        interpretation = ""
+    interpretation += f"R² = {fit['r2']:.3f} over {fit['n']:,} rows (residual std. error {fit['rmse']:.2f})."
+    if len(outliers):
+        examples = ", ".join(map(str, outliers[:EXAMPLE_ROWS])) + (", …" if len(outliers) > EXAMPLE_ROWS else "")
+        interpretation += f" {len(outliers)} rows are more than {threshold:g} standard errors off the fit (e.g. {examples})."
+    return {"formula": formula, "interpretation": interpretation, "r2": fit["r2"], "n": fit["n"],
+            "coefficients": fit["coefficients"], "intercept": fit["intercept"], "outliers": outliers}
+
+
+def run_regressions(df: pd.DataFrame, config: dict = None, chunks=None) -> dict:
+    """
+    Fit every configured regression in one pass over `chunks` (or `df`), then
+    flag residual outliers in a second pass. With `regression.workers` > 1 and
+    a spool of chunk files, the first pass is split across processes.
+    Returns insight key -> {formula, interpretation, r2, n, coefficients, intercept, outliers}.
+    """
+    cfg = (config or {}).get("regression") or {}
+    source = chunks if chunks is not None else [df]
+    columns = df.columns if df is not None else getattr(chunks, "columns", None) or []
+    specs = model_specs(config, columns)
+    if not specs:
+        return {}
+    threshold = cfg.get("outlier_threshold", OUTLIER_THRESHOLD)
+    workers = cfg.get("workers", 1)
+    paths = getattr(chunks, "paths", None)
+    if workers > 1 and paths and len(paths) > 1:
+        stats = accumulate_parallel(paths, specs, min(workers, len(paths)))
+    else:
+        stats = accumulate(source, specs)
+
+    fits = [(s.target, s.solve()) for s in stats]
+    fits = [(target, fit) for target, fit in fits if fit is not None]
+    insights = {}
+    for (target, fit), outliers in zip(fits, residual_outliers(source, fits, threshold)):
+        key = _insight_key(target)
+        if key in insights:  # same target regressed on another feature set
+            key = _insight_key(f"{target} on {' '.join(map(str, fit['coefficients']))}")
+        insights[key] = _insight(target, fit, outliers, threshold)
+        print(f"📐 {target}: R² {fit['r2']:.3f} on {fit['n']:,} rows, {len(outliers)} residual outliers")
+    return insights
@@ -1,14 +1,60 @@
-from jinja2 import Environment, FileSystemLoader
 import os
+import re
+import base64
+import subprocess
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pdfkit
+from src.instrument import instrumented
 
-def generate_report(validation, anomalies, figures, summary, insights=None, output_path="outputs/report.html"):
-    print("📝 Generating styled HTML + PDF report with Jinja2...")
+DEFAULT_TEMPLATE_DIR = "templates"
+DEFAULT_TEMPLATE = "report_template.html"
+IMAGE_DIR = "report_images"       # linked images are written here, next to the HTML
+
+
+@lru_cache(maxsize=None)
+def _environment(template_dir: str):
+    """One Jinja environment per template folder; it keeps the compiled templates."""
+    from jinja2 import Environment, FileSystemLoader
+    return Environment(loader=FileSystemLoader(template_dir))
+
+
+def _reporting_settings(config: dict) -> dict:
+    """`reporting:` config section with defaults."""
+    cfg = {
+        "template_dir": DEFAULT_TEMPLATE_DIR,
+        "template": DEFAULT_TEMPLATE,
+        "images": "inline",      # inline = base64 in the HTML, link = PNG files next to it
+        "pdf": True,
+        "pdf_workers": 2,        # concurrent wkhtmltopdf processes
+        "pdf_timeout": 120,      # seconds before a PDF conversion is killed
+    }
+    cfg.update((config or {}).get("reporting") or {})
+    if cfg["images"] not in ("inline", "link"):
+        raise ValueError(f"reporting.images must be 'inline' or 'link', got '{cfg['images']}'")
+    return cfg
+
+
+def _image_source(output_dir: str, mode: str):
+    """Return image_src(b64, name) for the template: a data URI, or a relative link to a PNG it writes."""
+    def image_src(encoded: str, name: str) -> str:
+        if mode == "inline":
+            return f"data:image/png;base64,{encoded}"
+        os.makedirs(os.path.join(output_dir, IMAGE_DIR), exist_ok=True)
+        filename = re.sub(r"[^\w.-]+", "_", str(name)) + ".png"
+        with open(os.path.join(output_dir, IMAGE_DIR, filename), "wb") as f:
+            f.write(base64.b64decode(encoded))
+        return f"{IMAGE_DIR}/{filename}"
+    return image_src
 
-    # Load template
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("report_template.html")
+
+def render_report(validation, anomalies, figures, summary, insights=None, output_dir=".", config=None,
+                  profile=None) -> str:
+    """Render the report HTML with the cached template (images inline or linked, see `reporting.images`).
+    A `profiler.DataProfile` adds the per-column statistics table."""
+    cfg = _reporting_settings(config)
+    template = _environment(cfg["template_dir"]).get_template(cfg["template"])
 
     # Add metadata (timestamp + branding footer)
     footer = {
@@ -16,25 +62,127 @@ def generate_report(validation, anomalies, figures, summary, insights=None, outp
         "branding": "Generated by Excel Data Cleaner Bot – Summer Internship Project, 2025"
     }
 
-    # Render HTML
-    html_content = template.render(
+    return template.render(
         validation=validation,
         anomalies=anomalies,
         figures=figures,
         summary=summary,
         insights=insights or {},   # ✅ predictive insights
-        footer=footer
+        profile=profile.table() if profile is not None else [],
+        footer=footer,
+        image_src=_image_source(output_dir, cfg["images"]),
+    )
+
+
+def _wkhtmltopdf() -> str:
+    import pdfkit
+    try:
+        binary = pdfkit.configuration().wkhtmltopdf
+    except OSError:  # pdfkit couldn't locate the binary; let subprocess report it
+        return "wkhtmltopdf"
+    return binary.decode() if isinstance(binary, bytes) else binary
+
+
+def html_to_pdf(html_path: str, pdf_path: str, timeout: float = None) -> str:
+    """Convert a saved HTML file with wkhtmltopdf; relative image links resolve next to it."""
+    subprocess.run(
+        [_wkhtmltopdf(), "--quiet", "--enable-local-file-access", html_path, pdf_path],
+        check=True, timeout=timeout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
     )
+    return pdf_path
+
+
+class ReportService:
+    """
+    Background PDF conversion. At most `max_workers` wkhtmltopdf processes run at
+    once, each killed after `timeout` seconds; further jobs queue. `submit_pdf`
+    returns a Future of the PDF path, and jobs submitted under the same `key`
+    share one conversion.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout: float = 120):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        cfg = _reporting_settings(config)
+        return cls(cfg["pdf_workers"], cfg["pdf_timeout"])
+
+    def submit_pdf(self, html_path: str, pdf_path: str, key: str = None):
+        with self._lock:
+            if key is not None and key in self._jobs:
+                job = self._jobs[key]
+                if not (job.done() and job.exception()):
+                    return job
+            job = self._pool.submit(html_to_pdf, html_path, pdf_path, self.timeout)
+            if key is not None:
+                self._jobs[key] = job
+            return job
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_report_service(config: dict = None) -> ReportService:
+    """Process-wide ReportService for this config's (pdf_workers, pdf_timeout); configs
+    with the same settings share one, so long-lived processes honour every config."""
+    cfg = _reporting_settings(config)
+    key = (cfg["pdf_workers"], cfg["pdf_timeout"])
+    with _services_lock:
+        if key not in _services:
+            _services[key] = ReportService(*key)
+        return _services[key]
+
+
+def wait_for_pdf(job, pdf_path: str):
+    """Block on a PDF job and report the outcome; returns the path or None on failure."""
+    try:
+        job.result()
+    except subprocess.TimeoutExpired:
+        print(f"⚠️ PDF conversion timed out, no PDF written to {pdf_path}")
+        return None
+    except Exception as e:
+        print(f"⚠️ PDF conversion failed: {e}")
+        return None
+    print(f"✅ PDF Report saved to {pdf_path}")
+    return pdf_path
+
+
+@instrumented("report")
+def generate_report(validation, anomalies, figures, summary, insights=None, output_path="outputs/report.html",
+                    config=None, wait=True, key=None, profile=None):
+    """
+    Write the HTML report and queue its PDF conversion on the shared ReportService.
+    With `wait` (default) this returns once the PDF is written; otherwise the HTML
+    is ready on return and the returned Future completes with the PDF path
+    (None if PDFs are disabled in `reporting:`).
+    """
+    print("📝 Generating styled HTML + PDF report with Jinja2...")
 
     # Ensure output folder exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    html_content = render_report(validation, anomalies, figures, summary, insights,
+                                 os.path.dirname(output_path) or ".", config, profile)
 
     # Save HTML
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html_content)
     print(f"✅ HTML Report saved to {output_path}")
 
-    # Save PDF version
+    if not _reporting_settings(config)["pdf"]:
+        return None
+
+    # Save PDF version (background)
     pdf_path = output_path.replace(".html", ".pdf")
-    pdfkit.from_string(html_content, pdf_path)
-    print(f"✅ PDF Report saved to {pdf_path}")
\ No newline at end of file
+    job = get_report_service(config).submit_pdf(output_path, pdf_path, key)
+    if wait:
+        wait_for_pdf(job, pdf_path)
+    return job
@@ -0,0 +1,225 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # optional: RSS is read from /proc on Linux without it
+    psutil = None
+
+RSS_SAMPLE_S = 0.01        # how often the RSS of a running stage is sampled
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class Stage:
+    """
+    One node of the pipeline graph.
+    `func` is called as func(frame, **kwargs, **{dep: dep_result}) — or without
+    the frame if `takes_frame` is False — so it must be a module-level function
+    when the graph runs on a process pool.
+    With a `cache_key` (see `cache.stage_key`) the result is looked up in and
+    stored to the `StageCache` passed to `run_stages`.
+    """
+
+    def __init__(self, name: str, func, deps=(), kwargs: dict = None, takes_frame: bool = True,
+                 cache_key: str = None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.kwargs = kwargs or {}
+        self.takes_frame = takes_frame
+        self.cache_key = cache_key
+
+
+class SharedFrame:
+    """
+    A DataFrame written once as an uncompressed Feather file that worker
+    processes memory-map instead of receiving a pickled copy each.
+    Frames Arrow can't hold (e.g. mixed-type object columns) fall back to one
+    pickle file, which is still written once and read by path.
+    """
+
+    INDEX_COL = "__index__"
+
+    def __init__(self, df: pd.DataFrame, directory: str):
+        self.columns = list(df.columns)
+        self.path = os.path.join(directory, "frame.feather")
+        try:
+            stored = df.copy(deep=False)
+            stored.columns = [f"c{i}" for i in range(df.shape[1])]
+            stored[self.INDEX_COL] = df.index
+            stored.reset_index(drop=True).to_feather(self.path, compression="uncompressed")
+        except Exception:
+            self.path = os.path.join(directory, "frame.pkl")
+            df.to_pickle(self.path)
+
+    def load(self) -> pd.DataFrame:
+        if self.path.endswith(".pkl"):
+            return pd.read_pickle(self.path)
+        import pyarrow.feather as feather
+        df = feather.read_table(self.path, memory_map=True).to_pandas(split_blocks=True)
+        df = df.set_index(self.INDEX_COL)
+        df.index.name = None
+        df.columns = self.columns
+        return df
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB; None where it cannot be read."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    return None
+
+
+class _PeakRSS:
+    """
+    Highest RSS seen while the block runs, sampled every RSS_SAMPLE_S by a
+    background thread. Unlike getrusage's ru_maxrss (the process's lifetime
+    high-water mark) it does not carry over what earlier stages used.
+    """
+
+    def __enter__(self):
+        self.peak = _rss_mb()
+        if self.peak is not None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_S):
+            self.peak = max(self.peak, _rss_mb())
+
+    def __exit__(self, *exc):
+        if self.peak is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, _rss_mb())
+        return False
+
+
+def measure(func, *args, **kwargs):
+    """Run func and return (result, {wall_s, cpu_s, peak_rss_mb}) measured in this process while it ran."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    with _PeakRSS() as rss:
+        result = func(*args, **kwargs)
+    return result, {
+        "wall_s": round(time.perf_counter() - wall, 3),
+        "cpu_s": round(time.process_time() - cpu, 3),
+        "peak_rss_mb": None if rss.peak is None else round(rss.peak, 1),
+    }
+
+
+def _run_stage(stage: Stage, frame, dep_results: dict):
+    if isinstance(frame, SharedFrame):
+        frame = frame.load()
+    args = (frame,) if stage.takes_frame else ()
+    return measure(stage.func, *args, **stage.kwargs, **dep_results)
+
+
+def _check_graph(stages: list):
+    names = {s.name for s in stages}
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s) {missing}")
+    done, pending = set(), list(stages)
+    while pending:
+        ready = [s for s in pending if set(s.deps) <= done]
+        if not ready:
+            raise ValueError(f"Dependency cycle among stages {[s.name for s in pending]}")
+        done.update(s.name for s in ready)
+        pending = [s for s in pending if s.name not in done]
+
+
+def _cached_results(stages: list, cache) -> tuple:
+    results, timings = {}, {}
+    if cache is None:
+        return results, timings
+    missing = object()
+    for stage in stages:
+        if stage.cache_key:
+            value = cache.get(stage.cache_key, missing)
+            if value is not missing:
+                results[stage.name] = value
+                timings[stage.name] = {"wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": None, "cached": True}
+    return results, timings
+
+
+def run_stages(stages: list, frame=None, max_workers: int = None, cache=None):
+    """
+    Run a stage graph, honouring `deps`. Independent stages run concurrently on a
+    process pool of `max_workers` (default: one per stage, capped at CPU count);
+    `max_workers` <= 1 runs them in this process in dependency order.
+    A DataFrame `frame` is shared with the workers through a memory-mapped file.
+    Stages with a `cache_key` found in `cache` (a `StageCache`) are not run.
+
+    Returns (results, timings): stage name -> result, stage name -> {wall_s, cpu_s, peak_rss_mb}
+    (plus `cached: True` for cache hits). peak_rss_mb is the highest RSS of the
+    process that ran the stage, sampled while the stage ran.
+    """
+    _check_graph(stages)
+    results, timings = _cached_results(stages, cache)
+    stages = [s for s in stages if s.name not in results]
+    if not stages:
+        return results, timings
+    if max_workers is None:
+        max_workers = min(len(stages), os.cpu_count() or 1)
+
+    if max_workers <= 1:
+        pending = list(stages)
+        while pending:
+            stage = next(s for s in pending if set(s.deps) <= results.keys())
+            deps = {d: results[d] for d in stage.deps}
+            results[stage.name], timings[stage.name] = _run_stage(stage, frame, deps)
+            pending.remove(stage)
+        _store_results(stages, results, cache)
+        return results, timings
+
+    shared_dir = tempfile.mkdtemp(prefix="datasage_shared_")
+    try:
+        if isinstance(frame, pd.DataFrame):
+            frame = SharedFrame(frame, shared_dir)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            pending, running = list(stages), {}
+            while pending or running:
+                for stage in [s for s in pending if set(s.deps) <= results.keys()]:
+                    deps = {d: results[d] for d in stage.deps}
+                    running[pool.submit(_run_stage, stage, frame, deps)] = stage
+                    pending.remove(stage)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    results[stage.name], timings[stage.name] = future.result()
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+    _store_results(stages, results, cache)
+    return results, timings
+
+
+def _store_results(stages: list, results: dict, cache):
+    if cache is not None:
+        for stage in stages:
+            if stage.cache_key:
+                cache.put(stage.cache_key, results[stage.name])
+
+
+def format_timings(timings: dict) -> dict:
+    """Stage name -> one-line human readable timing (for the report summary)."""
+    lines = {}
+    for name, t in timings.items():
+        if t.get("cached"):
+            lines[name] = "cached"
+            continue
+        rss = f" · peak RSS {t['peak_rss_mb']:.0f} MB" if t.get("peak_rss_mb") is not None else ""
+        lines[name] = f"wall {t['wall_s']:.2f}s · CPU {t['cpu_s']:.2f}s{rss}"
+    return lines
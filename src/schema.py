@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+from src import dates
+
+TYPES = ("int", "float", "string", "date", "datetime", "percent", "category")
+CATEGORY_MAX_RATIO = 0.5      # strings become categoricals when distinct values <= this share of rows
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    if series.dtype.kind in "iuf":
+        return series
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _to_percent(series: pd.Series) -> pd.Series:
+    """'12.5%' -> 0.125; plain numbers (Excel percent cells) are already fractions."""
+    if series.dtype.kind in "iuf":
+        return series.astype("float64")
+    codes, uniques = pd.factorize(series)
+    values = []
+    for v in uniques:
+        if isinstance(v, str) and v.strip().endswith("%"):
+            v = pd.to_numeric(v.strip()[:-1].strip(), errors="coerce") / 100
+        values.append(v)
+    parsed = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype="float64")
+    return pd.Series(np.append(parsed, np.nan).take(codes), index=series.index, name=series.name)
+
+
+def _to_string(series: pd.Series) -> pd.Series:
+    codes, uniques = pd.factorize(series)
+    labels = np.array([v if isinstance(v, str) else str(v) for v in uniques], dtype=object)
+    return pd.Series(np.append(labels, None).take(codes), index=series.index, name=series.name)
+
+
+def downcast(series: pd.Series) -> pd.Series:
+    """int64 -> int32 when the values fit (no narrower: int8 / int16 arithmetic wraps
+    silently); float64 -> float32 only when every value survives the round trip
+    exactly (and there are no gaps to fill later)."""
+    kind = series.dtype.kind
+    if kind in "iu" and len(series) and isinstance(series.dtype, np.dtype) and series.dtype.itemsize > 4:
+        info = np.iinfo(np.int32)
+        if info.min <= series.min() and series.max() <= info.max:
+            return series.astype(np.int32)
+        return series
+    if series.dtype == np.float64 and len(series):
+        values = series.to_numpy()
+        if not np.isnan(values).any() and np.array_equal(values.astype(np.float32).astype(np.float64), values):
+            return series.astype(np.float32)
+    return series
+
+
+def categorize(series: pd.Series, max_ratio: float = CATEGORY_MAX_RATIO) -> pd.Series:
+    """Low-cardinality text column -> categorical (codes + one copy of each distinct value)."""
+    if series.dtype != object or not len(series):
+        return series
+    if not all(isinstance(v, str) for v in series.dropna().iloc[:1000]):
+        return series
+    if series.nunique(dropna=True) > max_ratio * len(series):
+        return series
+    return series.astype("category")
+
+
+class Schema:
+    """
+    Column types from the `columns:` config (`type: int | float | string | date |
+    datetime | percent | category`, dates with optional `format` list) and
+    `date_columns`, applied at load time. With `compact`, every column is then shrunk: integers to
+    int32 when they fit, floats to float32 when that is lossless, and text with
+    few distinct values to categoricals. Values that do not fit the declared
+    type become missing and are counted. Compaction only applies to the working
+    frame: `restore` widens the columns again for the exported files.
+    """
+
+    def __init__(self, types: dict = None, formats: dict = None, compact: bool = True,
+                 category_max_ratio: float = CATEGORY_MAX_RATIO, report: bool = True):
+        self.types = types or {}
+        self.formats = formats or {}
+        self.compact = compact
+        self.category_max_ratio = category_max_ratio
+        self.report = report
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Schema from `columns:` + the `schema:` section; None when disabled."""
+        config = config or {}
+        cfg = config.get("schema") or {}
+        if not cfg.get("enabled", True):
+            return None
+        formats = dates.column_formats(config)
+        types = dict.fromkeys(formats, "date")   # `date_columns` entries are dates too
+        for col, spec in (config.get("columns") or {}).items():
+            if isinstance(spec, dict) and spec.get("type"):
+                if spec["type"] not in TYPES:
+                    print(f"⚠️ Unknown type '{spec['type']}' for column '{col}', expected one of {list(TYPES)}")
+                    continue
+                types[col] = spec["type"]
+        return cls(types, formats, cfg.get("compact", True),
+                   cfg.get("category_max_ratio", CATEGORY_MAX_RATIO), cfg.get("report_memory", True))
+
+    def cast_column(self, col, series: pd.Series):
+        kind = self.types.get(col)
+        if kind in ("int", "float"):
+            return _to_number(series)
+        if kind == "percent":
+            return _to_percent(series)
+        if kind in ("date", "datetime"):
+            return dates.parse_dates(series, self.formats.get(col))[0]
+        if kind == "string":
+            return _to_string(series)
+        if kind == "category":
+            return series.astype("category")
+        return series
+
+    def cast(self, df: pd.DataFrame, compact: bool = None) -> pd.DataFrame:
+        """Declared types (+ compaction) on a copy of `df`."""
+        compact = self.compact if compact is None else compact
+        out = {}
+        for col in df.columns:
+            series = df[col]
+            before = int(series.isna().sum()) if col in self.types else 0
+            series = self.cast_column(col, series)
+            if col in self.types:
+                lost = int(series.isna().sum()) - before
+                if lost > 0:
+                    print(f"⚠️ {lost} values in '{col}' are not {self.types[col]}; set to missing")
+            if compact:
+                series = categorize(downcast(series), self.category_max_ratio)
+            out[col] = series
+        return pd.DataFrame(out, index=df.index)
+
+    def restore(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Undo compaction for export: int64 / float64 again, and categoricals back to
+        their values unless the column is declared `type: category`."""
+        changed = {}
+        for col in chunk.columns:
+            series = chunk[col]
+            dtype = series.dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                if self.types.get(col) != "category":
+                    changed[col] = series.astype(dtype.categories.dtype)
+            elif isinstance(dtype, np.dtype) and dtype.kind in "iuf" and dtype.itemsize < 8:
+                changed[col] = series.astype(np.float64 if dtype.kind == "f" else np.int64)
+        if not changed:
+            return chunk
+        chunk = chunk.copy(deep=False)
+        for col, series in changed.items():
+            chunk[col] = series
+        return chunk
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """`cast` with a memory report."""
+        if not self.report:
+            return self.cast(df)
+        before = memory_mb(df)
+        df = self.cast(df)
+        after = memory_mb(df)
+        ratio = before / after if after else float("inf")
+        print(f"🗜️ Typed load: {before:.1f} MB -> {after:.1f} MB ({ratio:.1f}x smaller)")
+        return df
@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+
+
+class RowSample:
+    """
+    Uniform random sample of at most `size` rows from a stream of chunks.
+
+    Every row gets a random priority and the `size` smallest priorities are
+    kept (bottom-k sampling), so two samples of different partitions can be
+    merged into a sample of the union.
+    """
+
+    def __init__(self, size: int = 100_000, seed: int = 42):
+        self.size = size
+        self.rows_seen = 0
+        self.frame = None
+        self._keys = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows_seen += len(chunk)
+        keys = self._rng.random(len(chunk))
+        self._absorb(chunk, keys)
+
+    def merge(self, other: "RowSample"):
+        self.rows_seen += other.rows_seen
+        if other.frame is not None:
+            self._absorb(other.frame, other._keys)
+
+    def _absorb(self, frame: pd.DataFrame, keys: np.ndarray):
+        if self.frame is not None:
+            frame = pd.concat([self.frame, frame])
+            keys = np.concatenate([self._keys, keys])
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size)[:self.size])
+            frame, keys = frame.iloc[keep], keys[keep]
+        self.frame, self._keys = frame, keys
+
+    def result(self) -> pd.DataFrame:
+        if self.frame is None:
+            return pd.DataFrame()
+        return self.frame.sort_index()
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch in the spirit of KLL.
+
+    Values enter level 0; whenever a level holds more than `k` items it is
+    sorted and every other item (random offset) is promoted to the next level,
+    where each item stands for twice as many values. Memory stays around
+    `k * log2(n / k)` floats and sketches of different partitions merge level
+    by level. Results are exact while fewer than `k` values were seen.
+    """
+
+    def __init__(self, k: int = 4096, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.n += len(values)
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        self.n += other.n
+        for i, level in enumerate(other.levels):
+            if i == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[i] = np.concatenate([self.levels[i], level])
+        self._compress()
+
+    def _compress(self):
+        i = 0
+        while i < len(self.levels):
+            level = self.levels[i]
+            if len(level) > self.k:
+                level = np.sort(level)
+                leftover = level[-1:] if len(level) % 2 else level[:0]
+                paired = level[:len(level) - len(leftover)]
+                promoted = paired[self._rng.integers(2)::2]
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[i] = leftover
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+            i += 1
+
+    def weighted_items(self):
+        """All retained items with the number of values each one stands for."""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** i) for i, level in enumerate(self.levels)])
+        return values, weights
+
+    def quantiles(self, qs):
+        """Approximate quantiles for the probabilities in `qs` (NaN if empty)."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        values, weights = self.weighted_items()
+        if not len(values):
+            return np.full(len(qs), np.nan)
+        return _weighted_quantiles(values, weights, qs)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def deviation_quantile(self, center: float, q: float) -> float:
+        """Approximate `q`-quantile of |x - center| (e.g. the MAD for center=median, q=0.5)."""
+        values, weights = self.weighted_items()
+        if not len(values):
+            return float("nan")
+        return float(_weighted_quantiles(np.abs(values - center), weights, np.array([q]))[0])
+
+
+class Moments:
+    """
+    Count, mean and sum of squared deviations (Welford), folded in chunk by
+    chunk with Chan et al.'s parallel update, so partitions merge exactly.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._combine(len(values), values.mean(), ((values - values.mean()) ** 2).sum())
+
+    def merge(self, other: "Moments"):
+        if other.n:
+            self._combine(other.n, other.mean, other.m2)
+
+    def _combine(self, n_b: int, mean_b: float, m2_b: float):
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.m2 / self.n) if self.n else 0.0  # population std, like scipy.stats.zscore
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count from 64-bit hashes in `2 ** p` one-byte
+    registers (16 KB at p=14, about 0.8% relative error). Each register keeps
+    the longest run of leading zeros seen among the hashes routed to it;
+    merging is an element-wise max, so partitions combine exactly.
+    """
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        buckets = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        # leading zeros of the next 32 bits, + 1 (capped at 33)
+        rest = ((hashes << np.uint64(self.p)) >> np.uint64(32)).astype(np.float64)
+        ranks = (33 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return float(estimate)
+
+
+class TopK:
+    """
+    Heavy hitters as a mergeable Misra-Gries summary: at most `capacity`
+    counters; when more are needed the (capacity+1)-th largest count is
+    subtracted from all and non-positive counters dropped. Counts are exact
+    until that first happens (`exact`), then underestimate by at most `error`.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def update(self, series: pd.Series):
+        counts = series.value_counts(dropna=True)
+        counts = counts[counts > 0]  # categoricals list unused categories
+        counts.index = counts.index.astype(object)
+        self._absorb(counts)
+
+    def merge(self, other: "TopK"):
+        self.error += other.error
+        self._absorb(other.counts)
+
+    def _absorb(self, counts: pd.Series):
+        if not len(counts):
+            return
+        counts = counts if not len(self.counts) else self.counts.add(counts, fill_value=0)
+        counts = counts.astype(np.int64)
+        if len(counts) > self.capacity:
+            cut = int(np.partition(counts.to_numpy(), len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1])
+            counts = counts[counts > cut] - cut
+            self.error += cut
+        self.counts = counts
+
+    def top(self, k: int) -> pd.Series:
+        """The `k` most frequent values with their counts, most frequent first."""
+        return self.counts.sort_values(ascending=False, kind="stable").head(k)
+
+
+def _weighted_quantiles(values: np.ndarray, weights: np.ndarray, qs: np.ndarray) -> np.ndarray:
+    """Quantiles of a weighted sample, interpolated like `np.quantile` when all weights are 1."""
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    # centre of each item's weight on the 0..1 scale; i / (n - 1) for unit weights
+    centres = np.cumsum(weights) - weights / 2
+    if len(values) == 1:
+        return np.full(len(qs), values[0])
+    positions = (centres - centres[0]) / (centres[-1] - centres[0])
+    return np.interp(qs, positions, values)
@@ -1,53 +1,408 @@
 import re
+import numpy as np
 import pandas as pd
+from src import fingerprint, expressions
+from src.instrument import instrumented
 
+# Order matters: a rule's bit in the per-row mask follows its compile order
+SUPPORTED_CHECKS = ("required", "not_null", "min", "max", "regex", "allowed_values", "unique", "duplicate_key",
+                    "expression", "after")
+TOLERANCE_KEYS = ("tolerance", "tolerance_days")
+EXAMPLE_ROWS = 5   # row labels quoted in expression / after messages
 
-def validate_data(df: pd.DataFrame, rules: list) -> dict:
+
+class Rule:
+    """One compiled check on one column; `bit` is its position in the row bitmask."""
+
+    def __init__(self, column, check: str, value, bit: int):
+        self.column = column
+        self.check = check
+        self.value = value
+        self.bit = bit
+        self.pattern = re.compile(value) if check == "regex" else None
+        if check == "duplicate_key":  # value: [key columns] or {columns: [...], normalize: bool}
+            spec = value if isinstance(value, dict) else {"columns": value}
+            self.key_columns = list(spec["columns"])
+            self.normalize = spec.get("normalize", False)
+        if check == "expression":  # value: "a = b + c" or {expression, tolerance}
+            spec = value if isinstance(value, dict) else {"expression": value}
+            self.expression = spec["expression"]
+            self.tolerance = next((spec[k] for k in TOLERANCE_KEYS if spec.get(k) is not None), None)
+        elif check == "after":  # value: the column this one must come after, or {column, tolerance}
+            spec = value if isinstance(value, dict) else {"column": value}
+            self.value = spec["column"]
+            self.expression = None
+            self.tolerance = next((spec[k] for k in TOLERANCE_KEYS if spec.get(k) is not None), None)
+
+    @property
+    def name(self) -> str:
+        if self.check == "expression" and self.column != self.expression:
+            return f"{self.column}:{self.expression}"
+        return f"{self.column}:{self.check}"
+
+    def compile(self, columns) -> expressions.Expression:
+        """The check as an `expressions.Expression` over these columns (parsed once per column set)."""
+        if self.check == "after":  # with a tolerance (days for dates) it may be up to that much earlier
+            if self.tolerance is None:
+                return expressions.compile_expression(f"{self.column} > {self.value}", columns)
+            return expressions.compile_expression(f"{self.column} >= {self.value} - {float(self.tolerance)!r}",
+                                                  columns)
+        return expressions.compile_expression(self.expression, columns, self.tolerance)
+
+    def message(self, count: int) -> str:
+        if self.check == "min":
+            return f"{count} values below {self.value}"
+        if self.check == "max":
+            return f"{count} values above {self.value}"
+        if self.check == "regex":
+            return f"{count} values do not match regex {self.value}"
+        if self.check == "unique":
+            return f"{count} duplicate values found"
+        if self.check == "duplicate_key":
+            return f"{count} rows share a duplicate key ({', '.join(map(str, self.key_columns))})"
+        if self.check == "allowed_values":
+            return f"{count} values not in allowed values {self.value}"
+        if self.check == "not_null":
+            return f"{count} missing values"
+        tolerance = f" (tolerance {self.tolerance})" if self.tolerance is not None else ""
+        if self.check == "expression":
+            return f"{count} rows violate '{self.expression}'{tolerance}"
+        if self.check == "after":
+            return f"{count} values not after '{self.value}'{tolerance}"
+        return "required column is missing"
+
+    def __repr__(self):
+        return f"Rule({self.name}={self.value!r}, bit={self.bit})"
+
+
+def rules_from_config(config: dict) -> list:
     """
-    Validate data against rules defined in config.
-    Returns a dictionary of issues found.
+    Collect validation rules from every place the config declares them:
+    `validation` / `validation_rules` (one dict per column) and the
+    per-column `required` flag and `checks` list under `columns:`. The
+    `dataset.primary_key` / `validations.duplicates.based_on` key becomes a
+    `duplicate_key` rule, and each `validations.consistency_checks` entry an
+    `expression` rule.
     """
-    print("🔎 Starting data validation...")
-    issues = {}
+    config = config or {}
+    rules = list(config.get("validation") or []) + list(config.get("validation_rules") or [])
+    dup_cfg = (config.get("validations") or {}).get("duplicates") or {}
+    keys = fingerprint.key_columns(config)
+    if keys and dup_cfg.get("check", True):
+        rules.append({"column": " + ".join(map(str, keys)),
+                      "duplicate_key": {"columns": keys, "normalize": dup_cfg.get("normalize", False)}})
+    for check in (config.get("validations") or {}).get("consistency_checks") or []:
+        check = {"expression": check} if isinstance(check, str) else check
+        if check.get("expression"):
+            rules.append({"column": check["expression"], **check})
+    for col, spec in (config.get("columns") or {}).items():
+        spec = spec or {}
+        rule, expression_rules = {"column": col}, []
+        if spec.get("required"):
+            rule["required"] = True
+        for key in ("unique", "min", "max", "regex", "allowed_values"):
+            if key in spec:
+                rule[key] = spec[key]
+        for check in spec.get("checks") or []:
+            if isinstance(check, str):
+                rule[check] = True
+            elif isinstance(check, dict) and "expression" in check:
+                expression_rules.append({"column": col, **check})  # a column may carry several
+            elif isinstance(check, dict):
+                rule.update(check)
+        if len(rule) > 1:
+            rules.append(rule)
+        rules.extend(expression_rules)
+    return rules
+
 
+def compile_rules(rules: list) -> list:
+    """Flatten `{column, min, max, ...}` dicts into one `Rule` per check."""
+    compiled = []
     for rule in rules:
         col = rule.get("column")
-        if col not in df.columns:
-            print(f"⚠️ Column '{col}' not found, skipping validation")
-            continue
-
-        col_issues = []
-
-        # Check min
-        if "min" in rule:
-            invalid_rows = df[df[col] < rule["min"]]
-            if not invalid_rows.empty:
-                col_issues.append(f"{len(invalid_rows)} values below {rule['min']}")
-
-        # Check max
-        if "max" in rule:
-            invalid_rows = df[df[col] > rule["max"]]
-            if not invalid_rows.empty:
-                col_issues.append(f"{len(invalid_rows)} values above {rule['max']}")
-
-        # Check regex
-        if "regex" in rule:
-            pattern = re.compile(rule["regex"])
-            invalid_rows = df[~df[col].astype(str).str.match(pattern)]
-            if not invalid_rows.empty:
-                col_issues.append(f"{len(invalid_rows)} values do not match regex {rule['regex']}")
-
-        # Check unique
-        if rule.get("unique", False):
-            duplicates = df[df.duplicated(col, keep=False)]
-            if not duplicates.empty:
-                col_issues.append(f"{len(duplicates)} duplicate values found")
-
-        if col_issues:
-            issues[col] = col_issues
-            print(f"❌ Validation issues in '{col}': {col_issues}")
-
-    if not issues:
+        for check in SUPPORTED_CHECKS:
+            if check not in rule or rule[check] is False:
+                continue
+            value = rule[check]
+            if check in ("expression", "after") and not isinstance(value, dict):
+                value = {"expression" if check == "expression" else "column": value,
+                         **{k: rule[k] for k in TOLERANCE_KEYS if k in rule}}
+            compiled.append(Rule(col, check, value, len(compiled)))
+    return compiled
+
+
+def _mask_dtype(n_rules: int):
+    """Smallest unsigned int holding one bit per rule; beyond 64 rules, one bool column per rule."""
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_rules <= np.iinfo(dtype).bits:
+            return dtype
+    return np.bool_
+
+
+def new_mask(rows: int, n_rules: int, dtype) -> np.ndarray:
+    """All-clear violation mask: rows packed bits, or rows x rules bools for wide rule sets."""
+    return np.zeros((rows, n_rules), dtype=bool) if dtype is np.bool_ else np.zeros(rows, dtype=dtype)
+
+
+def set_rule_rows(mask: np.ndarray, bit: int, violated: np.ndarray, rows=None):
+    """Set rule `bit` of `mask` to `violated`, for the positions `rows` (default: all)."""
+    rows = slice(None) if rows is None else rows
+    if mask.ndim == 2:
+        mask[rows, bit] = violated
+        return
+    one = mask.dtype.type(1) << mask.dtype.type(bit)
+    mask[rows] = (mask[rows] & ~one) | (np.asarray(violated).astype(mask.dtype) << mask.dtype.type(bit))
+
+
+def rule_rows(mask: np.ndarray, bit: int) -> np.ndarray:
+    """Boolean per row: does the row violate rule `bit`?"""
+    if mask.ndim == 2:
+        return mask[:, bit]
+    return (mask >> mask.dtype.type(bit)) & 1 == 1
+
+
+def flagged_rows(mask: np.ndarray) -> np.ndarray:
+    """Boolean per row: does the row violate any rule?"""
+    return mask.any(axis=1) if mask.ndim == 2 else mask != 0
+
+
+class ValidationResult(dict):
+    """
+    Column -> list of issue messages (what the report shows), plus:
+      counts: rule name -> number of violating rows
+      mask:   one unsigned int per row; bit `rule.bit` is set if the row violates that rule
+              (more than 64 rules: a rows x rules bool array; read it via `rule_rows`)
+      index:  row labels matching `mask`
+    """
+
+    def __init__(self, rules: list, counts: np.ndarray, mask: np.ndarray, index, missing_columns=()):
+        super().__init__()
+        self.rules = rules
+        self.counts = {rule.name: int(counts[rule.bit]) for rule in rules}
+        self.mask = mask
+        self.index = index
+        for rule in rules:
+            count = int(counts[rule.bit])
+            if count:
+                message = rule.message(count)
+                if rule.check in ("expression", "after") and len(mask) == len(index):
+                    rows = index[rule_rows(mask, rule.bit)][:EXAMPLE_ROWS]
+                    message += f" (rows {', '.join(map(str, rows))}{', ...' if count > len(rows) else ''})"
+                self.setdefault(rule.column, []).append(message)
+        for col in missing_columns:
+            self.setdefault(col, []).append("required column is missing")
+
+    def violating_rows(self, rule_name: str = None):
+        """Row labels violating `rule_name`, or any rule if not given."""
+        if rule_name is None:
+            return self.index[flagged_rows(self.mask)]
+        rule = next(r for r in self.rules if r.name == rule_name)
+        return self.index[rule_rows(self.mask, rule.bit)]
+
+
+class RuleSet:
+    """
+    Validation rules compiled into vectorized boolean masks.
+
+    Each column is read once: regex and allowed-values checks run on its
+    factorized distinct values and are broadcast back through the codes;
+    min/max compare the raw array; unique counts codes with `bincount`.
+    duplicate_key rules count the 64-bit row fingerprints of their key columns
+    the same way. expression / after rules are compiled once per column set
+    into NumPy programs over whole columns (see `expressions.Expression`).
+    No filtered sub-frames are built.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = compile_rules(rules)
+        self.dtype = _mask_dtype(len(self.rules))
+        self.by_column = {}
+        self.key_rules = []
+        self.expression_rules = []
+        for rule in self.rules:
+            if rule.check == "duplicate_key":
+                self.key_rules.append(rule)
+            elif rule.check in ("expression", "after"):
+                self.expression_rules.append(rule)
+            else:
+                self.by_column.setdefault(rule.column, []).append(rule)
+        self._counts = np.zeros(len(self.rules), dtype=np.int64)
+        self._unique_seen = {}
+        self._repeat_rows = {}
+        self._seen_columns = set()
+        self._skipped = set()
+
+    def _column_masks(self, series: pd.Series, rules: list, running_unique: bool) -> dict:
+        masks = {}
+        codes = uniques = None
+        na = None
+        for rule in rules:
+            if rule.check in ("regex", "allowed_values", "unique", "duplicate_key") and codes is None:
+                codes, uniques = pd.factorize(series, use_na_sentinel=False)
+            if rule.check in ("required", "not_null"):
+                if na is None:
+                    na = series.isna().to_numpy()
+                masks[rule.bit] = na if rule.check == "not_null" else np.zeros(len(series), dtype=bool)
+            elif rule.check in ("min", "max"):
+                if series.dtype.kind == "M":  # date bounds, e.g. min: "2020-01-01"
+                    values, bound = series, pd.Timestamp(rule.value)
+                else:
+                    values = series if series.dtype.kind in "iuf" else pd.to_numeric(series, errors="coerce")
+                    bound = rule.value
+                cmp = values < bound if rule.check == "min" else values > bound
+                masks[rule.bit] = np.asarray(cmp, dtype=bool)
+            elif rule.check == "regex":
+                ok = np.array([rule.pattern.match(str(v)) is not None for v in uniques], dtype=bool)
+                masks[rule.bit] = ~ok[codes]
+            elif rule.check == "allowed_values":
+                ok = pd.Index(uniques).isin(list(rule.value)) | pd.isna(uniques)
+                masks[rule.bit] = ~np.asarray(ok)[codes]
+            elif rule.check in ("unique", "duplicate_key"):
+                counts = np.bincount(codes, minlength=len(uniques))
+                dup = counts[codes] > 1
+                if running_unique:
+                    dup |= self._repeats(rule, uniques, counts)[codes]
+                masks[rule.bit] = dup
+        return masks
+
+    def _repeats(self, rule: Rule, uniques, counts: np.ndarray) -> np.ndarray:
+        """
+        Running `unique` / `duplicate_key` state across chunks: which of this chunk's
+        distinct values were seen in earlier chunks. Only the keys seen once and seen
+        more than once are kept (as `fingerprint.SortedShards`), plus the running
+        number of rows whose value repeats, so each chunk costs a membership test.
+        """
+        # duplicate_key values already are row fingerprints
+        keys = np.asarray(uniques, dtype=np.int64).view(np.uint64) if rule.check == "duplicate_key" \
+            else fingerprint.value_hashes(uniques)
+        seen, repeated = self._unique_seen.setdefault(rule.bit, (fingerprint.SortedShards(),
+                                                                  fingerprint.SortedShards()))
+        before = seen.contains(keys)
+        before_repeated = repeated.contains(keys) & before
+        # rows now counted as repeats: a value seen once before brings its first row along
+        self._repeat_rows[rule.bit] = self._repeat_rows.get(rule.bit, 0) + int(
+            np.where(before, counts + (before & ~before_repeated), np.where(counts > 1, counts, 0)).sum())
+        repeated.add(keys[(before | (counts > 1)) & ~before_repeated])
+        seen.add(keys[~before])
+        return before
+
+    def evaluate(self, df: pd.DataFrame, running_unique: bool = False) -> tuple:
+        """Return (per-rule violation counts, per-row bitmask) for one frame or chunk."""
+        counts = np.zeros(len(self.rules), dtype=np.int64)
+        mask = new_mask(len(df), len(self.rules), self.dtype)
+        for col, rules in self.by_column.items():
+            if col not in df.columns:
+                continue
+            self._seen_columns.add(col)
+            for bit, violated in self._column_masks(df[col], rules, running_unique).items():
+                counts[bit] = int(violated.sum())
+                set_rule_rows(mask, bit, violated)
+        for rule in self.key_rules:
+            if any(c not in df.columns for c in rule.key_columns):
+                continue
+            self._seen_columns.update(rule.key_columns)
+            keys = pd.Series(self.key_fingerprints(df, rule).view(np.int64))  # int64 keeps value-count indexes exact
+            for bit, violated in self._column_masks(keys, [rule], running_unique).items():
+                counts[bit] = int(violated.sum())
+                set_rule_rows(mask, bit, violated)
+        for rule in self.expression_rules:
+            expression = self._expression(rule, df.columns)
+            if expression is None:
+                continue
+            self._seen_columns.update(expression.columns)
+            violated = expression.violations(df)
+            counts[rule.bit] = int(violated.sum())
+            set_rule_rows(mask, rule.bit, violated)
+        return counts, mask
+
+    def _expression(self, rule: Rule, columns):
+        if rule.check == "after" and (rule.column not in columns or rule.value not in columns):
+            return None  # reported by missing_columns
+        try:
+            return rule.compile(columns)
+        except expressions.ExpressionError as e:
+            if rule.bit not in self._skipped:
+                self._skipped.add(rule.bit)
+                print(f"⚠️ Skipping check '{rule.name}': {e}")
+            return None
+
+    @staticmethod
+    def key_fingerprints(df: pd.DataFrame, rule: Rule) -> np.ndarray:
+        return fingerprint.row_fingerprints(df, rule.key_columns, rule.normalize)
+
+    def update(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Accumulate counts for one chunk and return its row bitmask. `unique`
+        bits only mark repeats of values seen so far (earlier chunks are not revisited)."""
+        counts, mask = self.evaluate(chunk, running_unique=True)
+        for rule in self.rules:
+            if rule.check not in ("unique", "duplicate_key"):
+                self._counts[rule.bit] += counts[rule.bit]
+        return mask
+
+    def missing_columns(self, columns) -> tuple:
+        """Columns referenced by rules but absent; required ones are violations."""
+        missing = [c for c in self.by_column if c not in columns]
+        missing += [c for rule in self.key_rules for c in rule.key_columns if c not in columns and c not in missing]
+        missing += [c for rule in self.expression_rules if rule.check == "after"
+                    for c in (rule.column, rule.value) if c not in columns and c not in missing]
+        required = [c for c in missing if any(r.check == "required" for r in self.by_column.get(c, ()))]
+        return missing, required
+
+    def result(self, mask=None, index=None) -> ValidationResult:
+        """Final result of a chunked run (keep=False semantics for `unique`)."""
+        counts = self._counts.copy()
+        for bit, rows in self._repeat_rows.items():
+            counts[bit] = rows
+        _, required = self.missing_columns(self._seen_columns)
+        if mask is None:
+            mask = new_mask(0, len(self.rules), self.dtype)
+        return ValidationResult(self.rules, counts, mask, index if index is not None else pd.RangeIndex(0), required)
+
+
+def _log_result(result: ValidationResult, missing: list):
+    for col in missing:
+        print(f"⚠️ Column '{col}' not found, skipping validation")
+    for col, col_issues in result.items():
+        print(f"❌ Validation issues in '{col}': {col_issues}")
+    if not result:
         print("✅ No validation issues found")
 
-    return issues
+
+@instrumented("validation")
+def validate_data(df: pd.DataFrame, rules: list) -> ValidationResult:
+    """
+    Validate data against rules defined in config.
+    Returns a dictionary of issues found (a `ValidationResult`, which also
+    carries per-rule counts and the per-row violation bitmask).
+    """
+    print("🔎 Starting data validation...")
+    ruleset = RuleSet(rules)
+    counts, mask = ruleset.evaluate(df)
+    missing, required = ruleset.missing_columns(df.columns)
+    result = ValidationResult(ruleset.rules, counts, mask, df.index, required)
+    _log_result(result, missing)
+    return result
+
+
+@instrumented("validation")
+def validate_chunks(chunks, rules: list) -> ValidationResult:
+    """
+    Validate an iterable of DataFrame chunks against the config rules.
+    Counts are summed per chunk; `unique` keeps running value counts so
+    duplicates that span chunks are still found. Same counts as `validate_data`.
+    The per-row masks of all chunks are concatenated into the result.
+    """
+    print("🔎 Starting chunked data validation...")
+    ruleset = RuleSet(rules)
+    masks, indexes = [], []
+    for chunk in chunks:
+        masks.append(ruleset.update(chunk))
+        indexes.append(chunk.index)
+
+    mask = np.concatenate(masks) if masks else None
+    index = indexes[0].append(indexes[1:]) if indexes else None
+    result = ruleset.result(mask, index)
+    missing, _ = ruleset.missing_columns(ruleset._seen_columns)
+    _log_result(result, missing)
+    return result
@@ -1,136 +1,207 @@
 import os
+import re
 import base64
 from io import BytesIO
-import matplotlib.pyplot as plt
-import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from src.instrument import instrumented
+from src.profiler import DataProfile
 
-def _fig_to_base64(fig) -> str:
+MAX_HEATMAP_ROWS = 200     # missing-values heatmap rows are binned down to this many
+MAX_CATEGORIES = 20        # bar chart shows the most frequent categories only
+KDE_SAMPLE = 5_000         # values used to estimate the density curve
+HIST_BINS = 30
+
+
+def _fig_to_png(fig) -> bytes:
     """
-    Convert a matplotlib figure to a base64 string.
+    Render a matplotlib figure to PNG bytes (the only encode per chart).
     """
+    import matplotlib.pyplot as plt
     buf = BytesIO()
     fig.savefig(buf, format="png", bbox_inches="tight", facecolor=fig.get_facecolor())
-    buf.seek(0)
-    img_b64 = base64.b64encode(buf.read()).decode("utf-8")
     plt.close(fig)
-    return img_b64
-
-# def generate_visuals(df: pd.DataFrame, output_dir: str) -> dict:
-#     print("📈 Generating visualizations...")
-#     figs = {}
-#     os.makedirs(output_dir, exist_ok=True)
-
-#     # Apply dark style
-#     plt.style.use('dark_background')
-#     sns.set_style("darkgrid")
-
-#     # 1. Missing values heatmap
-#     if df.isnull().sum().sum() > 0:
-#         fig, ax = plt.subplots(figsize=(8, 5))
-#         sns.heatmap(df.isnull(), cbar=False, cmap="viridis", ax=ax)
-#         ax.set_title("Missing Values Heatmap", color='white')
-#         path = os.path.join(output_dir, "missing_values.png")
-#         fig.savefig(path, facecolor=fig.get_facecolor())
-#         figs["missing_values"] = _fig_to_base64(fig)
-
-#     # 2. Correlation heatmap
-#     numeric_df = df.select_dtypes(include=["number"])
-#     if not numeric_df.empty:
-#         fig, ax = plt.subplots(figsize=(8, 6))
-#         sns.heatmap(numeric_df.corr(), annot=True, cmap="coolwarm", ax=ax)
-#         ax.set_title("Correlation Heatmap", color='white')
-#         path = os.path.join(output_dir, "correlation_matrix.png")
-#         fig.savefig(path, facecolor=fig.get_facecolor())
-#         figs["correlation_matrix"] = _fig_to_base64(fig)
-
-#     # 3. Distribution plots for first 3 numeric columns
-#     for col in numeric_df.columns[:3]:
-#         fig, ax = plt.subplots(figsize=(6, 4))
-#         sns.histplot(numeric_df[col], kde=True, bins=30, color="#1f77b4", ax=ax)
-#         ax.set_title(f"Distribution of {col}", color='white')
-#         path = os.path.join(output_dir, f"dist_{col}.png")
-#         fig.savefig(path, facecolor=fig.get_facecolor())
-#         figs[f"dist_{col}"] = _fig_to_base64(fig)
-
-#     # 4. Bar plot of first categorical column frequencies
-#     cat_df = df.select_dtypes(include=["object"])
-#     if not cat_df.empty:
-#         col = cat_df.columns[0]
-#         fig, ax = plt.subplots(figsize=(7, 4))
-#         df[col].value_counts().plot(kind="bar", color="#ff7f0e", ax=ax)
-#         ax.set_title(f"Frequency of {col}", color='white')
-#         path = os.path.join(output_dir, f"freq_{col}.png")
-#         fig.savefig(path, facecolor=fig.get_facecolor())
-#         figs[f"freq_{col}"] = _fig_to_base64(fig)
-
-#     print(f"✅ Generated {len(figs)} figures")
-#     return figs
+    return buf.getvalue()
 
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 
-def generate_visuals(df: pd.DataFrame, output_dir: str) -> dict:
-    print("📈 Generating visualizations...")
-    figs = {}
-    os.makedirs(output_dir, exist_ok=True)
+def _safe_name(name) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(name))
 
-    # Apply dark style
-    plt.style.use('dark_background')
-    sns.set_style("darkgrid")
+
+# ---------- Chart specs (small aggregates read from the column profile) ----------
+
+def _missing_spec(profile: DataProfile, max_rows: int):
+    """Share of missing cells per column in at most `max_rows` row bins."""
+    matrix, bins = profile.missing_matrix(max_rows)
+    return {"matrix": matrix, "columns": [str(c) for c in profile.columns], "rows": profile.rows,
+            "binned": bins < profile.rows}
+
+
+def _kde_curve(values: np.ndarray, edges: np.ndarray, weights: np.ndarray):
+    """Gaussian KDE (Scott's rule) on a (weighted) sample, scaled to histogram counts."""
+    if len(values) < 2 or values.std() == 0:
+        return None
+    rng = np.random.default_rng(0)
+    total = weights.sum()
+    if (weights != 1).any():
+        sample = rng.choice(values, min(KDE_SAMPLE, len(values)), replace=False, p=weights / total)
+    else:
+        sample = rng.choice(values, KDE_SAMPLE, replace=False) if len(values) > KDE_SAMPLE else values
+    bandwidth = sample.std(ddof=1) * len(sample) ** (-1 / 5)
+    if not bandwidth:
+        return None
+    grid = np.linspace(edges[0], edges[-1], 200)
+    density = np.exp(-0.5 * ((grid[:, None] - sample[None, :]) / bandwidth) ** 2).sum(axis=1)
+    density /= len(sample) * bandwidth * np.sqrt(2 * np.pi)
+    return grid, density * total * (edges[1] - edges[0])
+
+
+def _hist_spec(column):
+    """Histogram over the column's quantile sketch items (exact up to the sketch size)."""
+    values, weights = column.sketch.weighted_items()
+    counts, edges = np.histogram(values, bins=HIST_BINS, range=(column.min, column.max), weights=weights)
+    return {"counts": counts, "edges": edges, "kde": _kde_curve(values, edges, weights)}
+
+
+def build_chart_specs(profile: DataProfile, max_heatmap_rows: int = MAX_HEATMAP_ROWS) -> list:
+    """
+    Turn a `profiler.DataProfile` into small per-chart payloads: binned
+    missingness, the correlation matrix, histograms and top-k category counts.
+    Rendering then never touches the raw rows.
+    """
+    specs = []
 
     # 1. Missing values heatmap
-    if df.isnull().sum().sum() > 0:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.heatmap(df.isnull(), cbar=False, cmap="viridis", ax=ax)
-        ax.set_title("Missing Values Heatmap", color='white')
-        path = os.path.join(output_dir, "missing_values.png")
-        fig.savefig(path, facecolor=fig.get_facecolor())
-        figs["missing_values"] = _fig_to_base64(fig)
-        plt.close(fig)
+    if profile.null_cells:
+        specs.append(("missing_values", "missing_values", _missing_spec(profile, max_heatmap_rows)))
 
     # 2. Correlation heatmap
-    numeric_df = df.select_dtypes(include=["number"])
-    if not numeric_df.empty and numeric_df.shape[1] > 1:
-        fig, ax = plt.subplots(figsize=(8, 6))
-        sns.heatmap(numeric_df.corr(), annot=True, cmap="coolwarm", ax=ax)
-        ax.set_title("Correlation Heatmap", color='white')
-        path = os.path.join(output_dir, "correlation_matrix.png")
-        fig.savefig(path, facecolor=fig.get_facecolor())
-        figs["correlation_matrix"] = _fig_to_base64(fig)
-        plt.close(fig)
+    numeric = profile.numeric_columns
+    if len(numeric) > 1:
+        specs.append(("correlation_matrix", "correlation_matrix", {"corr": profile.corr()}))
 
     # 3. Distribution plots for numeric columns (max 3)
-    if not numeric_df.empty:
-        for col in numeric_df.columns[:3]:
-            if df[col].dropna().empty:  # Skip if all NaN
-                print(f"⚠️ Skipping {col} (no valid numeric data)")
-                continue
-            fig, ax = plt.subplots(figsize=(6, 4))
-            sns.histplot(numeric_df[col].dropna(), kde=True, bins=30, color="#1f77b4", ax=ax)
-            ax.set_title(f"Distribution of {col}", color='white')
-            path = os.path.join(output_dir, f"dist_{col}.png")
-            fig.savefig(path, facecolor=fig.get_facecolor())
-            figs[f"dist_{col}"] = _fig_to_base64(fig)
-            plt.close(fig)
+    for col in numeric[:3]:
+        if not profile[col].count:  # Skip if all NaN
+            print(f"⚠️ Skipping {col} (no valid numeric data)")
+            continue
+        specs.append((f"dist_{col}", "distribution", {"column": str(col), **_hist_spec(profile[col])}))
 
     # 4. Bar plot for first categorical column
-    cat_df = df.select_dtypes(include=["object", "category"])
-    if not cat_df.empty:
-        col = cat_df.columns[0]
-        if df[col].dropna().empty:  # Skip if empty
+    if profile.text_columns:
+        col = profile.text_columns[0]
+        counts = profile[col].top.top(MAX_CATEGORIES)
+        if counts.empty:  # Skip if empty
             print(f"⚠️ Skipping {col} (no categorical values)")
         else:
-            fig, ax = plt.subplots(figsize=(7, 4))
-            df[col].value_counts().plot(kind="bar", color="#ff7f0e", ax=ax)
-            ax.set_title(f"Frequency of {col}", color='white')
-            path = os.path.join(output_dir, f"freq_{col}.png")
-            fig.savefig(path, facecolor=fig.get_facecolor())
-            figs[f"freq_{col}"] = _fig_to_base64(fig)
-            plt.close(fig)
+            specs.append((f"freq_{col}", "frequency", {"column": str(col), "counts": counts,
+                                                       "total_categories": profile[col].distinct_count}))
+    return specs
+
+
+# ---------- Rendering (runs in worker processes on the Agg backend) ----------
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Apply dark style
+    plt.style.use('dark_background')
+    sns.set_style("darkgrid")
+
+
+def _render(kind: str, spec: dict) -> bytes:
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if kind == "missing_values":
+        fig, ax = plt.subplots(figsize=(8, 5))
+        sns.heatmap(spec["matrix"], cbar=spec["binned"], cmap="viridis", ax=ax, vmin=0, vmax=1,
+                    xticklabels=spec["columns"], yticklabels=False)
+        title = "Missing Values Heatmap"
+        if spec["binned"]:
+            title += f" ({spec['rows']:,} rows in {len(spec['matrix'])} bins)"
+        ax.set_title(title, color='white')
+    elif kind == "correlation_matrix":
+        fig, ax = plt.subplots(figsize=(8, 6))
+        sns.heatmap(spec["corr"], annot=True, cmap="coolwarm", ax=ax)
+        ax.set_title("Correlation Heatmap", color='white')
+    elif kind == "distribution":
+        fig, ax = plt.subplots(figsize=(6, 4))
+        edges = spec["edges"]
+        ax.bar(edges[:-1], spec["counts"], width=np.diff(edges), align="edge",
+               color="#1f77b4", alpha=0.75, edgecolor="black")
+        if spec["kde"] is not None:
+            ax.plot(*spec["kde"], color="#1f77b4")
+        ax.set_xlabel(spec["column"])
+        ax.set_ylabel("Count")
+        ax.set_title(f"Distribution of {spec['column']}", color='white')
+    elif kind == "frequency":
+        fig, ax = plt.subplots(figsize=(7, 4))
+        spec["counts"].plot(kind="bar", color="#ff7f0e", ax=ax)
+        title = f"Frequency of {spec['column']}"
+        if spec["total_categories"] > len(spec["counts"]):
+            title += f" (top {len(spec['counts'])} of {spec['total_categories']})"
+        ax.set_title(title, color='white')
+    else:
+        raise ValueError(f"Unknown chart kind '{kind}'")
+    return _fig_to_png(fig)
+
+
+def chart_workers(config: dict) -> int:
+    """`visuals.workers` from config: processes that render the charts (1 = this process)."""
+    return ((config or {}).get("visuals") or {}).get("workers", 1)
+
+
+def render_charts(specs: list, workers: int = 1) -> dict:
+    """
+    Render chart specs to PNG bytes. In this process by default: there are only a
+    handful of small charts, and this often already runs inside a scheduler or batch
+    worker. `workers` > 1 (`visuals.workers`) renders them in that many worker processes.
+    """
+    workers = min(workers or 1, len(specs))
+    if workers <= 1:
+        _init_worker()
+        return {name: _render(kind, spec) for name, kind, spec in specs}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {name: pool.submit(_render, kind, spec) for name, kind, spec in specs}
+        return {name: future.result() for name, future in futures.items()}
+
+
+@instrumented("visuals")
+def generate_visuals(df: pd.DataFrame, output_dir: str, workers: int = 1,
+                     max_heatmap_rows: int = MAX_HEATMAP_ROWS, profile: DataProfile = None) -> dict:
+    """
+    Build the report charts from the column `profile` (profiled from `df` if
+    not given). Each chart is rendered once to PNG bytes, which are both
+    written to `output_dir` and returned base64-encoded (name -> string).
+    """
+    print("📈 Generating visualizations...")
+    os.makedirs(output_dir, exist_ok=True)
+
+    if profile is None:
+        profile = DataProfile()
+        profile.update(df)
+    specs = build_chart_specs(profile, max_heatmap_rows)
+    figs = {}
+    for name, png in render_charts(specs, workers).items():
+        _write_png(png, output_dir, name)
+        figs[name] = base64.b64encode(png).decode("utf-8")
 
     print(f"✅ Generated {len(figs)} figures successfully")
     return figs
 
+
+def _write_png(png: bytes, output_dir: str, name):
+    with open(os.path.join(output_dir, f"{_safe_name(name)}.png"), "wb") as f:
+        f.write(png)
+
+
+def write_figures(figs: dict, output_dir: str):
+    """Write base64 figures from `generate_visuals` (e.g. a cached result) as PNG files."""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, encoded in figs.items():
+        _write_png(base64.b64decode(encoded), output_dir, name)
@@ -0,0 +1,233 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+WRITE_BATCH_ROWS = 50_000   # frames are converted and written this many rows at a time
+
+
+def _slices(frames, rows: int = WRITE_BATCH_ROWS):
+    """Yield the frames (one DataFrame or an iterable of chunks) in slices of at most `rows` rows."""
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    for frame in frames:
+        for start in range(0, len(frame), rows):
+            yield frame.iloc[start:start + rows]
+
+
+class Writer:
+    """
+    Streams DataFrame chunks to one output file. Subclasses implement `open`,
+    `write_chunk` and `close`; `write` drives them over every chunk, so at most
+    `WRITE_BATCH_ROWS` rows are converted at a time. Text formats format
+    datetime64 columns with `dates` (a `dates.DateExport`) on the way out, and
+    with a `schema` (a `schema.Schema`) every format gets its declared dtypes
+    back instead of the compacted in-memory ones.
+    """
+
+    name = None
+    extension = None
+    text = False
+
+    def __init__(self, dates=None, schema=None):
+        self.dates = dates
+        self.schema = schema
+
+    def write(self, frames, path: str) -> str:
+        empty = True
+        for chunk in _slices(frames):
+            if self.schema is not None:
+                chunk = self.schema.restore(chunk)
+            if self.text and self.dates is not None:
+                chunk = self.dates.apply(chunk)
+            if empty:
+                self.open(path, chunk)
+                empty = False
+            self.write_chunk(chunk)
+        if empty:  # still write a file with the header only
+            columns = frames.columns if isinstance(frames, pd.DataFrame) else getattr(frames, "columns", None) or []
+            self.open(path, pd.DataFrame(columns=columns))
+        self.close()
+        return path
+
+    def open(self, path: str, first: pd.DataFrame):
+        raise NotImplementedError
+
+    def write_chunk(self, chunk: pd.DataFrame):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class XlsxWriter(Writer):
+    """Constant-memory .xlsx via openpyxl's write-only workbook (rows go straight to the zip stream)."""
+
+    name = "xlsx"
+    extension = ".xlsx"
+    text = True
+
+    def open(self, path, first):
+        from openpyxl import Workbook
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append([str(c) for c in first.columns])
+
+    def write_chunk(self, chunk):
+        # Column-wise tolist() hands openpyxl plain Python values, which it serializes fastest
+        columns = [s.astype(object).where(s.notna(), None).tolist() for _, s in chunk.items()]
+        for row in zip(*columns):
+            self.ws.append(row)
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+class CsvWriter(Writer):
+    name = "csv"
+    extension = ".csv"
+    text = True
+
+    def open(self, path, first):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        first.iloc[:0].to_csv(self.file, index=False)
+
+    def write_chunk(self, chunk):
+        chunk.to_csv(self.file, index=False, header=False)
+
+    def close(self):
+        self.file.close()
+
+
+def _arrow_table(chunk: pd.DataFrame, schema=None):
+    """Arrow table for a chunk; mixed-type object columns are written as strings."""
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        fixed = chunk.copy()
+        for col in fixed.columns:
+            if fixed[col].dtype == object:
+                fixed[col] = fixed[col].map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+        return pa.Table.from_pandas(fixed, schema=schema, preserve_index=False)
+
+
+def _string_schema(table):
+    """Schema of the first chunk, with all-null columns widened to string so later chunks fit."""
+    import pyarrow as pa
+    return pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
+
+
+class _ArrowWriter(Writer):
+    def open(self, path, first):
+        self.path = path
+        self.first = first
+        self.arrow_schema = None
+        self.sink = None
+
+    def _schema(self, table):
+        return _string_schema(table)
+
+    def write_chunk(self, chunk):
+        table = _arrow_table(chunk, self.arrow_schema)
+        if self.sink is None:
+            self.arrow_schema = self._schema(table)
+            table = table.cast(self.arrow_schema)
+            self.sink = self._open_sink(self.path, self.arrow_schema)
+        self._write_table(table)
+
+    def close(self):
+        if self.sink is None:  # header-only file
+            self.sink = self._open_sink(self.path, self._schema(_arrow_table(self.first)))
+        self.sink.close()
+
+
+class ParquetWriter(_ArrowWriter):
+    """Parquet, one row group per chunk."""
+
+    name = "parquet"
+    extension = ".parquet"
+
+    def _open_sink(self, path, schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema)
+
+    def _write_table(self, table):
+        self.sink.write_table(table)
+
+
+class FeatherWriter(_ArrowWriter):
+    """Feather v2 (Arrow IPC file), streamed record batch by record batch, uncompressed.
+    Categoricals are stored as plain values: an IPC file allows one dictionary per
+    column, and chunks may carry different categories."""
+
+    name = "feather"
+    extension = ".feather"
+
+    def _schema(self, table):
+        import pyarrow as pa
+        schema = _string_schema(table)
+        return pa.schema([pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                          for f in schema])
+
+    def _open_sink(self, path, schema):
+        import pyarrow as pa
+        return pa.ipc.new_file(path, schema)
+
+    def _write_table(self, table):
+        self.sink.write_table(table)
+
+
+WRITERS = {cls.name: cls for cls in (XlsxWriter, CsvWriter, ParquetWriter, FeatherWriter)}
+
+
+def get_writer(fmt: str, dates=None, schema=None) -> Writer:
+    fmt = fmt.lower().lstrip(".")
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {list(WRITERS)}")
+    return WRITERS[fmt](dates, schema)
+
+
+def output_formats(config: dict, formats=None) -> list:
+    """Formats from the CLI (`formats`) or the `output.formats` config list; default xlsx."""
+    formats = formats or ((config or {}).get("output") or {}).get("formats") or ["xlsx"]
+    if isinstance(formats, str):
+        formats = [formats]
+    for fmt in formats:
+        get_writer(fmt)  # fail fast on typos
+    return list(formats)
+
+
+def export(frames, output_dir: str, formats=("xlsx",), basename: str = "cleaned", dates=None,
+           schema=None) -> list:
+    """Write the frames once per format; returns the output paths. xlsx/csv dates are
+    formatted by `dates` (a `dates.DateExport`); parquet/feather keep datetime64.
+    With `schema`, compacted columns are written with their declared dtypes."""
+    paths = []
+    for fmt in formats:
+        writer = get_writer(fmt, dates, schema)
+        path = os.path.join(output_dir, basename + writer.extension)
+        writer.write(frames, path)
+        print(f"💾 Saved {writer.name} file: {path}")
+        paths.append(path)
+    return paths
+
+
+def _timed_export(frames, output_dir, formats, basename, dates, schema):
+    wall, cpu = time.perf_counter(), time.thread_time()
+    paths = export(frames, output_dir, formats, basename, dates, schema)
+    return paths, {"wall_s": round(time.perf_counter() - wall, 3),
+                   "cpu_s": round(time.thread_time() - cpu, 3), "peak_rss_mb": None}
+
+
+def export_in_background(frames, output_dir: str, formats=("xlsx",), basename: str = "cleaned", dates=None,
+                         schema=None):
+    """
+    Start `export` on a background thread and return its Future, which resolves to
+    (paths, timing). Await it before anything that needs the files.
+    """
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+    future = pool.submit(_timed_export, frames, output_dir, list(formats), basename, dates, schema)
+    pool.shutdown(wait=False)
+    return future
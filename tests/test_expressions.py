@@ -0,0 +1,24 @@
+import pytest
+from src import expressions
+
+COLUMNS = ["Total Price", "Qty", "Unit Price"]
+
+
+def test_unknown_column_is_named_with_the_available_columns():
+    with pytest.raises(expressions.ExpressionError) as error:
+        expressions.compile_expression("Totl Price = Qty * Unit Price", COLUMNS)
+    message = str(error.value)
+    assert "Unknown column 'Totl Price'" in message
+    assert "did you mean 'Total Price'?" in message
+    assert "'Total Price', 'Qty', 'Unit Price'" in message
+
+
+def test_unknown_column_inside_the_expression():
+    with pytest.raises(expressions.ExpressionError, match="Unknown column 'Discount'"):
+        expressions.compile_expression("Total Price = Qty * Unit Price - Discount", COLUMNS)
+
+
+def test_long_column_lists_are_cut_short():
+    columns = [f"c{i}" for i in range(expressions.MAX_LISTED_COLUMNS + 5)]
+    with pytest.raises(expressions.ExpressionError, match=r"\(\+5 more\)"):
+        expressions.compile_expression("missing > 1", columns)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from src import fingerprint
+from src.fingerprint import SortedShards, FingerprintIndex, cross_file_duplicates
+
+
+def test_sorted_shards_keep_their_size_invariant_and_membership():
+    rng = np.random.default_rng(0)
+    shards, seen = SortedShards(), set()
+    for size in rng.integers(1, 3000, 60):
+        keys = rng.integers(0, 50_000, size).astype(np.uint64)
+        present = shards.contains(keys)
+        assert present.tolist() == [int(k) in seen for k in keys]
+        shards.add(keys[~present])
+        seen.update(int(k) for k in keys)
+
+        assert len(shards) == len(seen)
+        for shard in shards.shards:
+            assert np.all(shard[1:] > shard[:-1])  # sorted, no repeats
+        for bigger, smaller in zip(shards.shards, shards.shards[1:]):
+            assert len(bigger) >= 2 * len(smaller)
+    assert len(shards.shards) <= int(np.log2(len(seen))) + 1
+
+
+def _config(directory) -> dict:
+    return {"fingerprints": {"enabled": True, "dir": str(directory), "columns": ["id"]}}
+
+
+def _chunks(df: pd.DataFrame, size: int) -> list:
+    return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+
+def test_cross_file_duplicates_across_two_sources(tmp_path, monkeypatch):
+    config = _config(tmp_path)
+    first = pd.DataFrame({"id": np.arange(0, 100), "v": 1.0})
+    second = pd.DataFrame({"id": np.arange(80, 200), "v": 2.0}, index=np.arange(1000, 1120))
+    third = pd.DataFrame({"id": [5, 90, 150, 500, 500], "v": 3.0})
+
+    assert len(cross_file_duplicates(first, config, "a.xlsx")["rows"]) == 0
+    found = cross_file_duplicates(_chunks(second, 30), config, "b.xlsx")
+    assert found["rows"].tolist() == list(range(1000, 1020))  # ids 80..99 came from a.xlsx
+    assert list(found["sources"].values()) == [20]
+
+    loads = []
+    shards = FingerprintIndex.shards
+    monkeypatch.setattr(FingerprintIndex, "shards", lambda self: loads.append(1) or shards(self))
+    found = cross_file_duplicates(_chunks(third, 2), config, "c.xlsx")
+    assert loads == [1]  # the index folder is read once, not per chunk
+    assert found["rows"].tolist() == [0, 1, 2]
+    by_name = {source.rsplit("/", 1)[-1]: count for source, count in found["sources"].items()}
+    assert by_name == {"a.xlsx": 2, "b.xlsx": 2}  # 90 is in both files, 5 only in a, 150 only in b
+
+
+def test_reindexing_a_source_replaces_its_shard(tmp_path):
+    config = _config(tmp_path)
+    cross_file_duplicates(pd.DataFrame({"id": [1, 2, 3]}), config, "a.xlsx")
+    cross_file_duplicates(pd.DataFrame({"id": [7, 8]}), config, "a.xlsx")
+
+    index = FingerprintIndex.from_config(config)
+    assert len(index.shards()) == 1
+    hits = index.lookup(fingerprint.row_fingerprints(pd.DataFrame({"id": [1, 7]}), ["id"]))
+    assert [hit.tolist() for hit in hits.values()] == [[False, True]]
+    assert cross_file_duplicates(pd.DataFrame({"id": [1, 2]}), config, "a.xlsx")["sources"] == {}
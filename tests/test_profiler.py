@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.profiler import DataProfile
+
+QS = [0.01, 0.25, 0.5, 0.75, 0.99]
+
+
+def _frame(rows: int = 30000, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    x = rng.normal(100, 15, rows)
+    df = pd.DataFrame({
+        "x": x,
+        "y": 0.5 * x + rng.normal(0, 5, rows),
+        "n": rng.integers(0, 5000, rows),
+        "t": rng.choice([f"v{i}" for i in range(300)], rows).astype(object),
+        "d": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+    })
+    df.loc[rng.choice(rows, 900), "x"] = np.nan
+    df.loc[rng.choice(rows, 400), "t"] = None
+    return df
+
+
+def _merged(chunks) -> DataProfile:
+    merged = DataProfile()
+    for chunk in chunks:
+        part = DataProfile()
+        part.update(chunk)
+        merged.merge(part)
+    return merged
+
+
+def _assert_rank_close(sketch_values, data, qs, tol=0.01):
+    data = np.sort(data[~np.isnan(data)])
+    ranks = np.searchsorted(data, sketch_values) / len(data)
+    assert np.all(np.abs(ranks - np.asarray(qs)) <= tol)
+
+
+def test_merged_chunk_profiles_match_single_pass():
+    df = _frame()
+    single = DataProfile()
+    single.update(df)
+    merged = _merged(df.iloc[i:i + 7000] for i in range(0, len(df), 7000))
+
+    assert merged.rows == single.rows == len(df)
+    assert list(merged.columns) == list(single.columns)
+    for col, one in single.columns.items():
+        part = merged[col]
+        assert (part.kind, part.rows, part.nulls) == (one.kind, one.rows, one.nulls)
+        assert part.min == one.min and part.max == one.max
+        np.testing.assert_array_equal(part.distinct.registers, one.distinct.registers)
+        assert part.distinct.estimate() == one.distinct.estimate()
+    for col in single.numeric_columns:
+        assert merged[col].moments.n == single[col].moments.n
+        assert merged[col].moments.mean == pytest.approx(single[col].moments.mean)
+        assert merged[col].moments.std == pytest.approx(single[col].moments.std)
+        assert merged[col].sketch.n == single[col].sketch.n
+        _assert_rank_close(merged[col].quantiles(QS), df[col].to_numpy(dtype=float), QS)
+    pd.testing.assert_series_equal(merged["t"].top.counts.sort_index(), single["t"].top.counts.sort_index())
+    assert merged["t"].distinct_count == single["t"].distinct_count
+    pd.testing.assert_frame_equal(merged.corr(), single.corr())
+    pd.testing.assert_frame_equal(merged.corr(), df[single.numeric_columns].corr())
+    assert np.sum(merged.segment_nulls, axis=0).tolist() == [p.nulls for p in single.columns.values()]
+
+
+def test_merge_adds_columns_missing_on_one_side():
+    df = _frame(12000)
+    first, second = df.iloc[:5000].drop(columns=["y", "t"]), df.iloc[5000:]
+    merged = _merged([first, second])
+    combined = pd.concat([first, second])
+    single = DataProfile()
+    single.update(combined)
+
+    assert list(merged.columns) == list(single.columns)
+    for col, one in single.columns.items():
+        assert (merged[col].kind, merged[col].rows, merged[col].nulls) == (one.kind, one.rows, one.nulls)
+    assert merged["y"].moments.mean == pytest.approx(second["y"].mean())
+    pd.testing.assert_frame_equal(merged.corr(), combined[single.numeric_columns].corr())
+    matrix, bins = merged.missing_matrix()
+    assert matrix.shape == (bins, len(single.columns))
+    assert matrix[:, list(merged.columns).index("y")].max() == 1.0
+
+
+def test_merge_rejects_a_column_of_another_kind():
+    left, right = DataProfile(), DataProfile()
+    left.update(pd.DataFrame({"a": [1.0, 2.0]}))
+    right.update(pd.DataFrame({"a": ["x", "y"]}))
+    with pytest.raises(ValueError, match="'a'"):
+        left.merge(right)
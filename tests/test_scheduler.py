@@ -0,0 +1,27 @@
+import time
+import numpy as np
+import pytest
+from src import scheduler
+
+
+def _allocate(mb: int) -> int:
+    block = np.ones(mb * 1024 ** 2 // 8)
+    time.sleep(0.1)
+    return int(block[-1])
+
+
+def _idle(big: int) -> int:
+    time.sleep(0.1)
+    return big - 1
+
+
+@pytest.mark.skipif(scheduler._rss_mb() is None, reason="RSS not readable on this platform")
+def test_peak_rss_is_measured_per_stage_in_process():
+    stages = [scheduler.Stage("big", _allocate, kwargs={"mb": 300}, takes_frame=False),
+              scheduler.Stage("small", _idle, deps=("big",), takes_frame=False)]
+    results, timings = scheduler.run_stages(stages, max_workers=1)
+
+    assert results == {"big": 1, "small": 0}
+    big, small = timings["big"]["peak_rss_mb"], timings["small"]["peak_rss_mb"]
+    assert big - small > 200  # the second stage does not repeat the first one's high-water mark
+    assert "peak RSS" in scheduler.format_timings(timings)["small"]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from src import writers
+from src.schema import Schema
+
+
+def _frame(rows: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({
+        "qty": rng.integers(0, 100, rows),
+        "price": rng.integers(0, 400, rows) / 4,
+        "region": rng.choice(["north", "south", "east"], rows).astype(object),
+        "segment": rng.choice(["a", "b"], rows).astype(object),
+    })
+
+
+def test_compaction_stops_at_int32():
+    compact = Schema({"segment": "category"}).cast(_frame())
+    assert compact["qty"].dtype == np.int32
+    assert (compact["qty"] * 100).max() == _frame()["qty"].max() * 100  # no int8 wrap-around
+    assert compact["price"].dtype == np.float32
+    assert isinstance(compact["region"].dtype, pd.CategoricalDtype)
+
+
+def test_exports_get_the_declared_dtypes_back(tmp_path):
+    schema = Schema({"segment": "category"})
+    df = _frame()
+    paths = writers.export(schema.cast(df), str(tmp_path), ["parquet", "feather", "csv"], schema=schema)
+
+    for table in (pq.read_table(paths[0]), feather.read_table(paths[1])):
+        types = {field.name: str(field.type) for field in table.schema}
+        assert types["qty"] == "int64"
+        assert types["price"] == "double"
+        assert types["region"] == "string"
+    # declared `type: category` stays categorical (Feather stores categoricals as plain values)
+    assert str(pq.read_table(paths[0]).schema.field("segment").type).startswith("dictionary")
+    pd.testing.assert_frame_equal(pd.read_parquet(paths[0]).drop(columns="segment"), df.drop(columns="segment"))
+    pd.testing.assert_frame_equal(pd.read_csv(paths[2]), df)
+
+
+def test_restore_leaves_wide_frames_alone():
+    df = _frame()
+    assert Schema().restore(df) is df
@@ -0,0 +1,29 @@
+import pandas as pd
+from src import validation
+
+
+def _frame() -> pd.DataFrame:
+    start = pd.to_datetime(["2024-01-10", "2024-01-10", "2024-01-10", "2024-01-10", None])
+    end = pd.to_datetime(["2024-01-12", "2024-01-10", "2024-01-09", "2024-01-07", "2024-01-01"])
+    return pd.DataFrame({"Start Date": start, "End Date": end})
+
+
+def _violations(checks: list) -> list:
+    config = {"columns": {"End Date": {"checks": checks}}}
+    result = validation.validate_data(_frame(), validation.rules_from_config(config))
+    return list(result.violating_rows("End Date:after"))
+
+
+def test_after_is_strict_without_a_tolerance():
+    assert _violations([{"after": "Start Date"}]) == [1, 2, 3]
+
+
+def test_after_honours_tolerance_days():
+    assert _violations([{"after": "Start Date", "tolerance_days": 1}]) == [3]
+    assert _violations([{"after": {"column": "Start Date", "tolerance": 3}}]) == []
+
+
+def test_after_message_quotes_the_tolerance():
+    rule = validation.compile_rules([{"column": "End Date", "after": "Start Date", "tolerance_days": 1}])[0]
+    assert (rule.value, rule.tolerance) == ("Start Date", 1)
+    assert rule.message(2) == "2 values not after 'Start Date' (tolerance 1)"
@@ -0,0 +1,29 @@
+import os
+import numpy as np
+import pandas as pd
+from src import visualize
+
+
+def _frame(rows: int = 2000, seed: int = 4) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"amt": rng.normal(100, 20, rows), "qty": rng.integers(0, 50, rows),
+                       "cat": rng.choice(["a", "b", "c"], rows)})
+    df.loc[rng.choice(rows, 100), "amt"] = np.nan
+    return df
+
+
+def test_chart_workers_from_config():
+    assert visualize.chart_workers(None) == 1
+    assert visualize.chart_workers({"visuals": {"workers": 3}}) == 3
+
+
+def test_worker_processes_render_the_same_charts(tmp_path):
+    df = _frame()
+    in_process = visualize.generate_visuals(df, str(tmp_path / "one"), workers=1)
+    pooled = visualize.generate_visuals(df, str(tmp_path / "pool"), workers=3)
+
+    assert list(pooled) == list(in_process)
+    assert len(pooled) >= 4
+    for name, encoded in pooled.items():
+        assert encoded == in_process[name]
+    assert sorted(os.listdir(tmp_path / "pool")) == sorted(os.listdir(tmp_path / "one"))